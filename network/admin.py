@@ -1,8 +1,46 @@
 from django.contrib import admin
+from django.db import transaction
+
 from .models import User, Post, Follower, Like
+from . import postCounts, timeline
+
+
+class PostAdmin(admin.ModelAdmin):
+    """ delivers the posts written here into the timelines, like the index view """
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if change:
+                timeline.touchPost(obj)
+            else:
+                postCounts.postCreated(obj, timeline.fanOutPost(obj))
+
+
+class FollowerAdmin(admin.ModelAdmin):
+    """ backfills and prunes the timelines of the follows written here, like ProfilePage.put """
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                previous = Follower.objects.get(pk=obj.pk)
+                timeline.pruneFollow(previous.user_follower, previous.user_being_followed)
+            super().save_model(request, obj, form, change)
+            timeline.backfillFollow(obj.user_follower, obj.user_being_followed)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            timeline.pruneFollow(obj.user_follower, obj.user_being_followed)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            follows = list(queryset.select_related('user_follower', 'user_being_followed'))
+            super().delete_queryset(request, queryset)
+            for follow in follows:
+                timeline.pruneFollow(follow.user_follower, follow.user_being_followed)
+
 
 # Register your models here.
 admin.site.register(User)
-admin.site.register(Post)
-admin.site.register(Follower)
+admin.site.register(Post, PostAdmin)
+admin.site.register(Follower, FollowerAdmin)
 admin.site.register(Like)
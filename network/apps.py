@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class NetworkConfig(AppConfig):
     name = 'network'
+
+    def ready(self):
+        # connect the signal receivers
+        from . import signals
@@ -0,0 +1,21 @@
+""" ASGI entry point serving the async variants of the JSON API views.
+
+    The URL configuration is picked per request (request.urlconf), so the same process
+    can still run the sync views through WSGI, e.g. for the benchmark_servers command """
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.NETWORK_ASYNC_URLCONF
+        return request, error_response
+
+
+def getAsgiApplication():
+    """ django.core.asgi.get_asgi_application, with the async views """
+    django.setup(set_prefix=False)
+    return AsyncViewsASGIHandler()
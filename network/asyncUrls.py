@@ -0,0 +1,6 @@
+""" The URLs of the network app, with the async variants of the API views """
+from . import asyncViews
+from .urls import buildUrlpatterns
+
+
+urlpatterns = buildUrlpatterns(asyncViews)
@@ -0,0 +1,268 @@
+""" Async variants of the JSON API views, served under ASGI (see network/asgi.py).
+
+    The reads go through the async ORM, so a request waiting on the database doesn't
+    hold a worker thread. The transactional writes reuse the sync code of views.py,
+    since transaction.atomic() isn't supported in async code, in a single sync_to_async hop.
+    The responses are the same as the ones of the sync views. """
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import User, Post, Like
+from . import events, export, feedCache, likeBuffer, pagination, renderers, routers, search, serializers, timeline, utils, views
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _resolveUser(request):
+    """ the lazy request.user would hit the database from the event loop """
+    request.user = await request.auser()
+    return request.user
+
+
+async def _readPostsPageEtag(request, templatePageName=None, pageNumber=1, filterUserId=None):
+    """ reads the ETag of views._postsPageEtag ahead of @condition, which calls its
+        (sync) etag function without awaiting it """
+    query = views._postsPageEtagQuery(request, templatePageName, pageNumber, filterUserId)
+    views._readPostsPageRows(request, [row async for row in query] if query is not None else [])
+
+
+async def _buildPostsPage(request, templatePageName, pageNumber, filterUserId):
+    """ views._buildPostsPage through the async ORM """
+    if filterUserId:
+        if not await User.objects.filter(id=filterUserId).aexists():
+            return None, JsonResponse({'msg': 'This user doesn\'t exist'}, status=404)
+    elif templatePageName == 'following':
+        if not request.user.is_authenticated:
+            return None, JsonResponse({'msg': 'You must be logged in to see this page'}, status=403)
+
+    posts, id_field = views._postsPageRows(request, templatePageName, filterUserId)
+
+    if 'cursor' in request.GET:
+        try:
+            page = await pagination.acursorPaginate(posts, request.GET['cursor'], views.POSTS_PER_PAGE, idField=id_field)
+        except pagination.InvalidCursor:
+            return None, JsonResponse({'msg': 'Invalid cursor'}, status=400)
+
+        page_rows = page.object_list
+        has_next, has_previous = page.hasNext, page.hasPrevious
+        next_cursor, prev_cursor = page.nextCursor, page.prevCursor
+    else:
+        # the Paginator of the sync view counts the rows, reading one extra row answers the same questions
+        if pageNumber < 1:
+            return None, JsonResponse({'msg': 'This page doesn\'t exist'}, status=404)
+
+        first_row = (pageNumber - 1) * views.POSTS_PER_PAGE
+
+        page_rows = [row async for row in posts[first_row:first_row + views.POSTS_PER_PAGE + 1]]
+        if not page_rows and pageNumber > 1:
+            return None, JsonResponse({'msg': 'This page doesn\'t exist'}, status=404)
+
+        has_next, has_previous = len(page_rows) > views.POSTS_PER_PAGE, pageNumber > 1
+        page_rows = page_rows[:views.POSTS_PER_PAGE]
+        next_cursor, prev_cursor = pagination.cursorsForPage(page_rows, has_next, has_previous, idField=id_field)
+
+    current_page_posts = await serializers.aserializePosts(
+        views._rowsPosts(page_rows, id_field), utils.shouldIncludeLikesList(request)
+    )
+    return views._postsPageDict(has_next, has_previous, next_cursor, prev_cursor, current_page_posts), None
+
+
+@condition(etag_func=views._postsPageEtag)
+async def _getPostsPage(request, templatePageName=None, pageNumber=1, filterUserId=None):
+    posts_page = None
+    cache_key = None
+
+    scope_page = views._postsPageFeedScope(request, templatePageName, pageNumber, filterUserId)
+    if scope_page is not None:
+        cache_key = await feedCache.apageKey(*scope_page, utils.shouldIncludeLikesList(request))
+        posts_page = await feedCache.agetPage(cache_key, request._posts_page_rows_digest)
+
+    if posts_page is None:
+        posts_page, error_response = await _buildPostsPage(request, templatePageName, pageNumber, filterUserId)
+        if error_response is not None:
+            return error_response
+
+        if cache_key is not None:
+            await feedCache.asetPage(cache_key, posts_page, request._posts_page_rows_digest)
+
+    post_ids = [post['id'] for post in posts_page['currentPagePosts']]
+    views._overlayVisitorLikes(posts_page, await utils.agetLikedPostIds(request.user, post_ids), request.user)
+
+    return renderers.respond(request, posts_page)
+
+
+@routers.readsFromReplica
+async def getPostsPage(request, templatePageName=None, pageNumber=1, filterUserId=None):
+    """ views.getPostsPage """
+    await _resolveUser(request)
+    await _readPostsPageEtag(request, templatePageName, pageNumber, filterUserId)
+
+    return await _getPostsPage(request, templatePageName, pageNumber, filterUserId)
+
+
+def _likesChanged(post):
+    feedCache.bumpFeedVersion()
+    post.refresh_from_db(fields=['like_count'])
+    events.likeCountChanged(post.id, post.like_count)
+
+
+async def handleLikeDislike(request, postId):
+    """ views.handleLikeDislike """
+    try:
+        post = await Post.objects.select_related('poster').aget(id=postId)
+    except ObjectDoesNotExist:
+        return JsonResponse({'msg': 'No post found with this id'}, status=404)
+
+    data = json.loads(request.body)
+    visitor = await _resolveUser(request)
+
+    if likeBuffer.enabled():
+        return await _bufferLikeDislike(request, post, data)
+
+    if data['does_current_visitor_like_this_post']:
+        try:
+            await sync_to_async(views._likePost)(visitor, post)
+        except IntegrityError:
+            return JsonResponse({'msg': 'Error: You can\'t like the same post two times'}, status=400)
+    else:
+        # dislike
+        if not await sync_to_async(views._dislikePost)(visitor, post):
+            return JsonResponse({'msg': 'Error: You tried to dislike someone you don\'t like'}, status=400)
+
+    await sync_to_async(_likesChanged)(post)
+
+    serialized_post = (await serializers.aserializePosts([post], utils.shouldIncludeLikesList(request)))[0]
+    serialized_post['does_current_visitor_like_this_post'] = bool(data['does_current_visitor_like_this_post'])
+    return renderers.respond(request, serialized_post)
+
+
+async def _bufferLikeDislike(request, post, data):
+    """ views._bufferLikeDislike """
+    visitor = request.user
+    if not visitor.is_authenticated:
+        return JsonResponse({'msg': 'You must be logged in to do this'}, status=403)
+
+    wants_like = bool(data['does_current_visitor_like_this_post'])
+    liked = likeBuffer.currentIntent(visitor.id, post.id)
+    if liked is None:
+        liked = await Like.objects.filter(liker=visitor, post=post).aexists()
+
+    error_response = views._bufferedIntentError(wants_like, liked)
+    if error_response is not None:
+        return error_response
+
+    # the journal is fsync'ed
+    await sync_to_async(likeBuffer.recordIntent)(visitor.id, post.id, wants_like, liked)
+
+    serialized_post = (await serializers.aserializePosts([post], utils.shouldIncludeLikesList(request)))[0]
+    likeBuffer.overlay([serialized_post], visitor)
+    events.likeCountBuffered(post.id, serialized_post['number_likes'])
+    serialized_post['does_current_visitor_like_this_post'] = wants_like
+    return renderers.respond(request, serialized_post)
+
+
+def _savePostContent(post):
+    post.save(update_fields=['content', 'timestamp'])
+    timeline.touchPost(post)
+    search.indexPost(post)
+    feedCache.bumpFeedVersion()
+    events.postEdited(post)
+
+
+async def handleSaveNewPostContent(request, postId):
+    """ views.handleSaveNewPostContent """
+    try:
+        post = await Post.objects.select_related('poster').aget(id=postId)
+    except ObjectDoesNotExist:
+        return JsonResponse({'msg': 'No post found with this id'}, status=404)
+
+    visitor = await _resolveUser(request)
+    if visitor.username != post.poster.username:
+        return JsonResponse({'msg': 'This user is not allowed to change this post'}, status=302)
+
+    data = json.loads(request.body)
+
+    if data['newContent']:
+        try:
+            post.content = data['newContent']
+            await sync_to_async(_savePostContent)(post)
+            return renderers.respond(request, (await serializers.aserializePosts([post], utils.shouldIncludeLikesList(request)))[0])
+        except Exception:
+            logger.exception('Saving the new content of post %s failed', post.id)
+            return JsonResponse({'msg': 'Something went wrong...'}, status=500)
+    else:
+        return JsonResponse({'msg': 'The new content is blank'}, status=400)
+
+
+@routers.readsFromReplica
+async def exportPosts(request):
+    """ views.exportPosts, streamed from an async iterator, which Django doesn't read
+        whole into memory first """
+    if request.method != 'GET':
+        return JsonResponse({'msg': 'Only GET is allowed'}, status=405)
+
+    posts = Post.objects.using(routers.currentReadDatabase())
+    return views._exportResponse(export.andjsonLines(export.exportedPosts(posts)), 'posts.ndjson')
+
+
+@routers.readsFromReplica
+async def exportProfilePosts(request, profileId):
+    """ views.exportProfilePosts, see exportPosts """
+    if request.method != 'GET':
+        return JsonResponse({'msg': 'Only GET is allowed'}, status=405)
+    if not await User.objects.filter(id=profileId).aexists():
+        return JsonResponse({'msg': 'This user doesn\'t exist'}, status=404)
+
+    posts = Post.objects.using(routers.currentReadDatabase()).filter(poster_id=profileId)
+    return views._exportResponse(export.andjsonLines(export.exportedPosts(posts)), f'posts-{profileId}.ndjson')
+
+
+async def streamEvents(request):
+    """ Streams the new posts, the edits and the like counts as server-sent events (see
+        events.py), for as long as the client stays connected """
+    if request.method != 'GET':
+        return JsonResponse({'msg': 'Only GET is allowed'}, status=405)
+
+    response = StreamingHttpResponse(events.stream(), content_type=events.CONTENT_TYPE)
+    response['Cache-Control'] = 'no-cache'
+    # nginx would buffer the events otherwise
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class ProfilePage(views.ProfilePage):
+    """ views.ProfilePage with an async follow put. A View is either all sync or all
+        async, so the page itself is the sync one, in a thread """
+    @method_decorator(routers.readsFromReplica)
+    async def get(self, request, profileId):
+        await _resolveUser(request)
+        return await sync_to_async(super().get)(request, profileId)
+
+    async def put(self, request, profileId):
+        try:
+            profile = await User.objects.aget(id=profileId)
+        except ObjectDoesNotExist:
+            return HttpResponse(status=404)
+
+        data = json.loads(request.body)
+        visitor = await _resolveUser(request)
+
+        if data['visitor_is_following']:
+            try:
+                await sync_to_async(self._follow)(profile, visitor)
+            except IntegrityError:
+                return JsonResponse({'msg': 'This visitor is already following this profile!'}, status=400)
+            return JsonResponse({'msg': 'Success! Now the visitor is following this profile'}, status=200)
+        else:
+            if not await sync_to_async(self._unfollow)(profile, visitor):
+                return JsonResponse({'msg': 'Error: the object does not exist'}, status=400)
+            return JsonResponse({'msg': 'Success! Now the visitor is no longer following this profile'}, status=200)
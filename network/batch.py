@@ -0,0 +1,147 @@
+""" Batches of like, unlike, follow and unfollow operations.
+
+    The operations are played in order against the likes and follows of the visitor read
+    up front, which gives each one the answer its single endpoint would have given.
+    Only the net changes are then written, with bulk inserts and deletes, a recount of
+    the touched counters and one timeline backfill and prune, in a single transaction. """
+from django.db import transaction
+
+from .models import User, Post, Follower, Like
+from . import counters, feedCache, graph, likeBuffer, timeline
+
+
+LIKE = 'like'
+UNLIKE = 'unlike'
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
+
+# the key holding the id of the object of each kind of operation
+OPERATION_TARGETS = {LIKE: 'postId', UNLIKE: 'postId', FOLLOW: 'profileId', UNFOLLOW: 'profileId'}
+
+MAX_OPERATIONS = 100
+
+
+class InvalidBatch(Exception):
+    pass
+
+
+def _targetId(operation):
+    """ returns the id of the post or profile of a valid operation, None otherwise """
+    if not isinstance(operation, dict) or operation.get('op') not in OPERATION_TARGETS:
+        return None
+
+    target_id = operation.get(OPERATION_TARGETS[operation['op']])
+    return target_id if isinstance(target_id, int) and not isinstance(target_id, bool) else None
+
+
+def _targetIds(operations, ops):
+    return {_targetId(operation) for operation in operations if isinstance(operation, dict) and operation.get('op') in ops} - {None}
+
+
+def _result(status, **fields):
+    return {'status': status, **fields}
+
+
+def applyOperations(visitor, operations):
+    """ applies the operations of visitor, returns one compact result per operation.
+        Raises InvalidBatch when operations isn't a list of at most MAX_OPERATIONS """
+    if not isinstance(operations, list) or len(operations) > MAX_OPERATIONS:
+        raise InvalidBatch(f'operations must be a list of at most {MAX_OPERATIONS} operations')
+
+    # the batch reads the likes from the database, so the write-behind likes go first
+    if likeBuffer.enabled():
+        likeBuffer.flush()
+
+    post_ids = _targetIds(operations, (LIKE, UNLIKE))
+    profile_ids = _targetIds(operations, (FOLLOW, UNFOLLOW))
+
+    with transaction.atomic():
+        like_counts = dict(Post.objects.filter(id__in=post_ids).values_list('id', 'like_count'))
+        followers_counts = dict(User.objects.filter(id__in=profile_ids).values_list('id', 'followers_count'))
+
+        initially_liked = set(
+            Like.objects.filter(liker=visitor, post_id__in=like_counts).values_list('post_id', flat=True)
+        )
+        initially_followed = set(Follower.objects.filter(
+            user_follower=visitor, user_being_followed_id__in=followers_counts
+        ).values_list('user_being_followed_id', flat=True))
+
+        liked, followed = set(initially_liked), set(initially_followed)
+        results = [
+            _play(operation, liked, followed, like_counts, followers_counts) for operation in operations
+        ]
+
+        _write(visitor, initially_liked, liked, initially_followed, followed)
+
+    return results
+
+
+def _play(operation, liked, followed, like_counts, followers_counts):
+    """ plays one operation against the in memory state, returns its result """
+    target_id = _targetId(operation)
+    if target_id is None:
+        return _result(400, msg='Invalid operation')
+
+    op = operation['op']
+
+    if op in (LIKE, UNLIKE):
+        if target_id not in like_counts:
+            return _result(404, msg='No post found with this id')
+
+        if op == LIKE:
+            if target_id in liked:
+                return _result(400, msg='Error: You can\'t like the same post two times')
+            liked.add(target_id)
+            like_counts[target_id] += 1
+        else:
+            if target_id not in liked:
+                return _result(400, msg='Error: You tried to dislike someone you don\'t like')
+            liked.discard(target_id)
+            like_counts[target_id] = max(like_counts[target_id] - 1, 0)
+
+        return _result(200, number_likes=like_counts[target_id])
+
+    if target_id not in followers_counts:
+        return _result(404, msg='No user found with this id')
+
+    if op == FOLLOW:
+        if target_id in followed:
+            return _result(400, msg='This visitor is already following this profile!')
+        followed.add(target_id)
+        followers_counts[target_id] += 1
+    else:
+        if target_id not in followed:
+            return _result(400, msg='Error: the object does not exist')
+        followed.discard(target_id)
+        followers_counts[target_id] = max(followers_counts[target_id] - 1, 0)
+
+    return _result(200, n_of_followers=followers_counts[target_id])
+
+
+def _write(visitor, initially_liked, liked, initially_followed, followed):
+    """ writes the net changes of a batch """
+    liked_post_ids, unliked_post_ids = liked - initially_liked, initially_liked - liked
+    followed_ids, unfollowed_ids = followed - initially_followed, initially_followed - followed
+
+    if liked_post_ids or unliked_post_ids:
+        # a like or follow made meanwhile by a concurrent request is already there
+        Like.objects.bulk_create(
+            [Like(liker=visitor, post_id=post_id) for post_id in liked_post_ids], ignore_conflicts=True
+        )
+        Like.objects.filter(liker=visitor, post_id__in=unliked_post_ids).delete()
+
+        counters.recountLikes(Post.objects.filter(id__in=liked_post_ids | unliked_post_ids))
+        feedCache.bumpFeedVersion()
+
+    if followed_ids or unfollowed_ids:
+        Follower.objects.bulk_create([
+            Follower(user_follower=visitor, user_being_followed_id=profile_id) for profile_id in followed_ids
+        ], ignore_conflicts=True)
+        Follower.objects.filter(user_follower=visitor, user_being_followed_id__in=unfollowed_ids).delete()
+
+        counters.recountFollows(User.objects.filter(id__in=followed_ids | unfollowed_ids | {visitor.id}))
+        timeline.backfillFollows(visitor, followed_ids)
+        timeline.pruneFollows(visitor, unfollowed_ids)
+        # bulk_create sends no post_save signal
+        for profile_id in followed_ids:
+            graph.followChanged(visitor.id, profile_id, True)
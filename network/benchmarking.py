@@ -0,0 +1,129 @@
+""" Measuring helpers for the benchmark_endpoints command: latency percentiles,
+    SQL queries, rows fetched and response bytes of a request """
+import math
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.backends.utils import CursorWrapper
+from django.test.utils import CaptureQueriesContext
+
+
+# the metrics compared against a baseline, and the slack allowed on top of the tolerance,
+# so a 0.1ms jitter on a 0.5ms endpoint isn't reported as a regression
+COMPARED_METRICS = {
+    'p50_ms': 1.0,
+    'p95_ms': 2.0,
+    'p99_ms': 5.0,
+    'queries': 0,
+    'rows_fetched': 0,
+    'response_bytes': 64,
+}
+
+
+def percentile(values, p):
+    """ nearest-rank percentile of values, p between 0 and 100 """
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+class _RowCounter:
+    def __init__(self):
+        self.rows = 0
+
+
+@contextmanager
+def countFetchedRows():
+    """ counts the rows the ORM fetches from the database while active """
+    counter = _RowCounter()
+
+    def fetchone(self):
+        with self.db.wrap_database_errors:
+            row = self.cursor.fetchone()
+        counter.rows += row is not None
+        return row
+
+    def fetchmany(self, *args):
+        with self.db.wrap_database_errors:
+            rows = self.cursor.fetchmany(*args)
+        counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        with self.db.wrap_database_errors:
+            rows = self.cursor.fetchall()
+        counter.rows += len(rows)
+        return rows
+
+    # CursorWrapper hands these to the driver cursor through __getattr__, so
+    # defining them on the class takes over while the context is active
+    CursorWrapper.fetchone, CursorWrapper.fetchmany, CursorWrapper.fetchall = fetchone, fetchmany, fetchall
+    try:
+        yield counter
+    finally:
+        del CursorWrapper.fetchone, CursorWrapper.fetchmany, CursorWrapper.fetchall
+
+
+def _responseBytes(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def measure(makeRequest, iterations, warmup=0):
+    """ calls makeRequest(iteration) warmup + iterations times, returns the metrics
+        of the measured calls. Queries, rows and bytes are the worst of all calls """
+    for iteration in range(warmup):
+        makeRequest(iteration)
+
+    latencies = []
+    queries = rows_fetched = response_bytes = 0
+    statuses = set()
+
+    for iteration in range(warmup, warmup + iterations):
+        with CaptureQueriesContext(connection) as captured, countFetchedRows() as counter:
+            started_at = time.perf_counter()
+            response = makeRequest(iteration)
+            size = _responseBytes(response)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+        queries = max(queries, len(captured))
+        rows_fetched = max(rows_fetched, counter.rows)
+        response_bytes = max(response_bytes, size)
+        statuses.add(response.status_code)
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries': queries,
+        'rows_fetched': rows_fetched,
+        'response_bytes': response_bytes,
+        'statuses': sorted(statuses),
+    }
+
+
+def compareWithBaseline(results, baseline, tolerance):
+    """ returns a description of each metric that got worse than its baseline value
+        by more than tolerance (0.2 = 20%) plus the metric slack """
+    regressions = []
+
+    for endpoint, metrics in results.items():
+        baseline_metrics = baseline.get(endpoint)
+        if baseline_metrics is None:
+            continue
+
+        for metric, slack in COMPARED_METRICS.items():
+            before, after = baseline_metrics.get(metric), metrics.get(metric)
+            if before is None or after is None:
+                continue
+
+            if after > before * (1 + tolerance) + slack:
+                regressions.append(f'{endpoint}: {metric} went from {before} to {after}')
+
+    return regressions
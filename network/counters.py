@@ -0,0 +1,68 @@
+""" Denormalized counters, updated with atomic F() expressions by the write paths
+    and repaired from the source tables by the recount_counters command """
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import User, Post, Follower, Like
+from . import feedCache, userCache
+
+
+def _add(field, delta):
+    # never below zero, even if the counter has drifted before a recount
+    return Greatest(F(field) + delta, 0)
+
+
+def incrementLikeCount(post, delta):
+    """ adds delta to the like counter of post without a read-modify-write race """
+    Post.objects.filter(id=post.id).update(like_count=_add('like_count', delta))
+
+
+def incrementFollowCounts(follower, followed, delta):
+    """ adds delta to the following counter of follower and to the followers counter of followed """
+    User.objects.filter(id=follower.id).update(following_count=_add('following_count', delta))
+    User.objects.filter(id=followed.id).update(followers_count=_add('followers_count', delta))
+    # update() sends no post_save
+    userCache.invalidate(follower.id, followed.id)
+
+
+def recountLikes(posts=None):
+    """ recomputes like_count from the Like table, returns how many posts were wrong """
+    if posts is None:
+        posts = Post.objects.all()
+
+    actual_like_count = Coalesce(Subquery(
+        Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('id')).values('n')
+    ), 0)
+
+    # a single UPDATE of the wrong rows only, however big the table is
+    n_fixed = posts.exclude(like_count=actual_like_count).update(like_count=actual_like_count)
+    if n_fixed:
+        # the cached feed pages hold the drifted counts
+        feedCache.bumpFeedVersion()
+    return n_fixed
+
+
+def _countFollowersBy(field):
+    return Coalesce(Subquery(
+        Follower.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('id')).values('n')
+    ), 0)
+
+
+def recountFollows(users=None):
+    """ recomputes followers_count and following_count from the Follower table,
+        returns how many users were wrong """
+    if users is None:
+        users = User.objects.all()
+
+    actual_followers_count = _countFollowersBy('user_being_followed')
+    actual_following_count = _countFollowersBy('user_follower')
+
+    n_fixed = users.exclude(
+        followers_count=actual_followers_count,
+        following_count=actual_following_count
+    ).update(
+        followers_count=actual_followers_count,
+        following_count=actual_following_count
+    )
+    userCache.invalidateAll()
+    return n_fixed
@@ -0,0 +1,143 @@
+""" In-process pub/sub of the changes to the posts, pushed to the browsers as server-sent events.
+
+    The views publish 'newPost' (index POST), 'postEdited' (handleSaveNewPostContent) and
+    'likeCountChanged' (handleLikeDislike) once their transaction commits. Each open stream
+    (asyncViews.streamEvents, served under ASGI) subscribes with its own queue, read on its
+    event loop. An event is encoded once, only when some stream is open, and handed to the
+    loop of every subscriber, so a publishing worker thread never waits on a client.
+
+    Backpressure: the queue of a stream holds at most NETWORK_EVENTS_QUEUE_SIZE events.
+    When a client doesn't read fast enough to keep up, its pending events are dropped and
+    replaced by a single 'resync' event, which makes the client reload its current page.
+    A stalled connection holds a bounded amount of memory and never slows down the
+    publishers or the other streams.
+
+    The subscribers live in the process: a stream only sees the writes served by its own
+    process. Under WSGI there is no stream, views.streamEvents answers 204, which tells the
+    browser not to reconnect. """
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from . import renderers, serializers
+
+
+CONTENT_TYPE = 'text/event-stream'
+
+NEW_POST = 'newPost'
+POST_EDITED = 'postEdited'
+LIKE_COUNT_CHANGED = 'likeCountChanged'
+RESYNC = 'resync'
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_KEEPALIVE = 15
+# how long the browser waits before reconnecting a dropped stream
+RECONNECT_DELAY_MS = 3000
+# a comment, ignored by EventSource, that keeps proxies from closing an idle stream
+KEEPALIVE_FRAME = b': keepalive\n\n'
+
+_lock = threading.Lock()
+_subscribers = set()
+
+
+def _encode(event, data):
+    # the compact JSON of the data never holds a newline, so it fits in one data line
+    return b'event: ' + event.encode() + b'\ndata: ' + renderers.JsonRenderer().render(data) + b'\n\n'
+
+
+class Subscription:
+    """ the queue of one stream, only touched from its event loop """
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def _offer(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # the client can't keep up: whatever it missed, a reload of its page catches up
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_encode(RESYNC, {}))
+
+    def deliver(self, frame):
+        """ thread-safe, returns right away """
+        self.loop.call_soon_threadsafe(self._offer, frame)
+
+    async def frames(self, keepalive):
+        """ yields the encoded events, and a keepalive comment after keepalive idle seconds """
+        while True:
+            try:
+                yield await asyncio.wait_for(self.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE_FRAME
+
+
+def subscribe():
+    """ a new Subscription, on the running event loop """
+    subscription = Subscription(asyncio.get_running_loop(), getattr(settings, 'NETWORK_EVENTS_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+    with _lock:
+        _subscribers.add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        _subscribers.discard(subscription)
+
+
+async def stream():
+    """ the body of an event stream, subscribed for as long as it is read """
+    subscription = subscribe()
+    try:
+        yield f'retry: {RECONNECT_DELAY_MS}\n\n'.encode()
+        async for frame in subscription.frames(getattr(settings, 'NETWORK_EVENTS_KEEPALIVE', DEFAULT_KEEPALIVE)):
+            yield frame
+    finally:
+        # the client went away, the stream is cancelled
+        unsubscribe(subscription)
+
+
+def broadcast(event, payload):
+    """ hands the event to every open stream right away, from any thread. payload() returns
+        its data and is only called when some stream is open """
+    with _lock:
+        subscribers = list(_subscribers)
+    if not subscribers:
+        return
+
+    frame = _encode(event, payload())
+    for subscription in subscribers:
+        try:
+            subscription.deliver(frame)
+        except RuntimeError:
+            # its event loop is closed
+            unsubscribe(subscription)
+
+
+def publish(event, payload):
+    """ broadcast, once the current transaction commits. Sync code only """
+    transaction.on_commit(lambda: broadcast(event, payload))
+
+
+def _likeCount(post_id, number_likes):
+    return {'id': post_id, 'number_likes': number_likes}
+
+
+def postCreated(post):
+    publish(NEW_POST, lambda: serializers.serializePosts([post], includeLikes=False)[0])
+
+
+def postEdited(post):
+    publish(POST_EDITED, lambda: {'id': post.id, 'content': post.content, 'timestamp': post.timestamp.isoformat()})
+
+
+def likeCountChanged(post_id, number_likes):
+    publish(LIKE_COUNT_CHANGED, lambda: _likeCount(post_id, number_likes))
+
+
+def likeCountBuffered(post_id, number_likes):
+    """ likeCountChanged of a write-behind like, which has no transaction to wait for """
+    broadcast(LIKE_COUNT_CHANGED, lambda: _likeCount(post_id, number_likes))
@@ -0,0 +1,61 @@
+""" NDJSON export of the posts, one JSON object per line, in constant memory.
+
+    The rows are read with QuerySet.iterator(chunk_size=EXPORT_CHUNK_SIZE), as tuples
+    rather than model instances, and each line is yielded as soon as it is encoded, so
+    an export of millions of posts never holds more than one chunk. It is used by the
+    streaming views and by the export_posts command.
+
+    Under ASGI Django reads a sync iterator whole before sending it, so the async views
+    stream andjsonLines(), which reads and encodes each chunk in a thread. """
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import Post
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+_FIELDS = ('id', 'poster_id', 'poster__username', 'content', 'timestamp', 'like_count')
+
+
+def exportedPosts(posts=None):
+    """ the posts of a queryset (every post by default) in the order of their ids,
+        restricted to the exported fields """
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.order_by('id').values_list(*_FIELDS)
+
+
+def _line(row):
+    post_id, poster_id, poster_username, content, timestamp, like_count = row
+    return json.dumps({
+        'id': post_id,
+        'poster': {'id': poster_id, 'username': poster_username},
+        'content': content,
+        'timestamp': timestamp.isoformat(),
+        'like_count': like_count
+    }) + '\n'
+
+
+def ndjsonLines(posts, chunk_size=EXPORT_CHUNK_SIZE):
+    """ yields one NDJSON line per post of exportedPosts() """
+    for row in posts.iterator(chunk_size=chunk_size):
+        yield _line(row)
+
+
+async def andjsonLines(posts, chunk_size=EXPORT_CHUNK_SIZE):
+    """ ndjsonLines, as an async iterator. QuerySet.aiterator() can't be used, it runs
+        the query of a values_list() from the event loop """
+    lines = ndjsonLines(posts, chunk_size)
+    nextChunk = sync_to_async(lambda: list(islice(lines, chunk_size)))
+
+    while True:
+        chunk = await nextChunk()
+        for line in chunk:
+            yield line
+        if len(chunk) < chunk_size:
+            break
@@ -0,0 +1,104 @@
+""" Versioned cache of the public feed pages.
+
+    The index and profile pages of getPostsPage are the same for every visitor, so
+    their JSON (without the per-visitor fields) is cached under a key holding a global
+    feed version. Any write that can change a page (new post, edit, like, unlike,
+    delete) bumps the version, which orphans every cached page at once.
+
+    The key also holds the database the page is read from: a page built from the lagging
+    replica is never served to a browser pinned to the primary after its own write.
+
+    A write that doesn't bump the version (a lagging replica, another process with its
+    own LocMemCache, the admin, recount_counters) would leave a stale page behind, served
+    under the ETag of the newer rows and then kept by every 304. So each page is cached
+    with the digest of the rows it was built from, and only served for those rows. """
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import routers
+
+
+FEED_VERSION_KEY = 'network:feed:version'
+FEED_PAGE_KEY = 'network:feed:{version}:{digest}'
+FEED_PAGE_TIMEOUT = 60 * 5
+
+
+def getFeedVersion():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+async def agetFeedVersion():
+    version = await cache.aget(FEED_VERSION_KEY)
+    if version is None:
+        await cache.aadd(FEED_VERSION_KEY, uuid.uuid4().hex, None)
+        version = await cache.aget(FEED_VERSION_KEY)
+    return version
+
+
+def _setFeedVersion():
+    # a random token, so a cleared or restarted cache never hands out an old version again
+    cache.set(FEED_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def bumpFeedVersion():
+    """ invalidates every cached page. Bumped right away and again on commit, so no
+        other request caches a page read before the write was committed """
+    _setFeedVersion()
+    transaction.on_commit(_setFeedVersion)
+
+
+def _pageDigest(scope, page, includeLikes):
+    database = routers.currentReadDatabase()
+    return hashlib.md5(f'{database}|{scope}|{page}|{includeLikes}'.encode()).hexdigest()
+
+
+def pageKey(scope, page, includeLikes):
+    """ scope is the feed ('index' or 'profile:<id>'), page is the page number or cursor """
+    return FEED_PAGE_KEY.format(version=getFeedVersion(), digest=_pageDigest(scope, page, includeLikes))
+
+
+async def apageKey(scope, page, includeLikes):
+    return FEED_PAGE_KEY.format(version=await agetFeedVersion(), digest=_pageDigest(scope, page, includeLikes))
+
+
+def rowsDigest(rows):
+    """ rows are the (id, timestamp, like count) of the rows of a page """
+    return hashlib.md5(repr(rows).encode()).hexdigest()
+
+
+def _pageOf(entry, rows_digest):
+    if entry is None or entry[0] != rows_digest:
+        return None
+    return entry[1]
+
+
+def getPage(key, rows_digest):
+    """ the page cached under key, None unless it was built from the rows of rows_digest """
+    return _pageOf(cache.get(key), rows_digest)
+
+
+async def agetPage(key, rows_digest):
+    return _pageOf(await cache.aget(key), rows_digest)
+
+
+def _pageTimeout():
+    # a page read from a lagging replica may miss the write that bumped the version
+    if routers.readingFromReplica():
+        return getattr(settings, 'NETWORK_REPLICA_PAGE_TIMEOUT', FEED_PAGE_TIMEOUT)
+    return FEED_PAGE_TIMEOUT
+
+
+def setPage(key, posts_page, rows_digest):
+    cache.set(key, (rows_digest, posts_page), _pageTimeout())
+
+
+async def asetPage(key, posts_page, rows_digest):
+    await cache.aset(key, (rows_digest, posts_page), _pageTimeout())
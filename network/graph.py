@@ -0,0 +1,265 @@
+""" In-process index of the follower graph.
+
+    The whole Follower table is kept as two adjacency lists in compressed sparse row
+    form (one array of offsets indexed by user id plus one array of neighbour ids, both
+    compact C int arrays), so "is following" is a binary search inside one user's slice,
+    the counts are O(1) and followers/followees are O(k) slices.
+
+    Each process keeps the graph in memory. A snapshot is also stored in Django's cache
+    under a version token, so with a shared cache backend the worker processes build it
+    once. A follow or unfollow (signals.py) doesn't throw it away: once committed it is
+    appended to a numbered log of changes in the cache, and each process applies the
+    changes it hasn't seen to its graph, copying the arrays without reading or sorting
+    the Follower table again. Changes are idempotent, so a graph built while they were
+    logged can replay them safely. A process that fell more than MAX_CHANGES behind,
+    or finds a change evicted from the cache, rebuilds the graph from the database, as
+    does everyone after invalidate(), for the writes in bulk.
+
+    The changes only reach the other processes through a cache they share. With a cache
+    of the process itself (LocMemCache, the default) a follow served by one worker would
+    never reach the graph of another, so isShared() is False and the callers read the
+    database instead. """
+import threading
+import uuid
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import Follower
+from . import routers
+
+
+GRAPH_VERSION_KEY = 'network:follower-graph:version'
+GRAPH_SNAPSHOT_KEY = 'network:follower-graph:snapshot:{version}'
+GRAPH_CHANGE_COUNT_KEY = 'network:follower-graph:changes:{version}'
+GRAPH_CHANGE_KEY = 'network:follower-graph:change:{version}:{n}'
+GRAPH_SNAPSHOT_TIMEOUT = 60 * 60
+# past this many changes to replay, reading the table again is cheaper
+MAX_CHANGES = 1000
+
+_local_graph = {'version': None, 'changes': 0, 'graph': None}
+_local_graph_lock = threading.Lock()
+
+
+class _Adjacency:
+    """ compressed sparse row adjacency: the neighbours of user u are
+        targets[offsets[u]:offsets[u + 1]], sorted ascending """
+    def __init__(self, edges, max_user_id):
+        self.offsets = array('l', [0]) * (max_user_id + 2)
+        self.targets = array('l')
+
+        # edges come sorted by source then target
+        for source, target in edges:
+            self.offsets[source + 1] += 1
+            self.targets.append(target)
+
+        for user_id in range(1, max_user_id + 2):
+            self.offsets[user_id] += self.offsets[user_id - 1]
+
+    def _start(self, user_id):
+        return self.offsets[min(user_id, len(self.offsets) - 1)]
+
+    def _starts(self, start_user_id, end_user_id, shift):
+        """ the offsets of the users in [start_user_id, end_user_id), plus shift """
+        n_users = len(self.offsets) - 1
+        starts = self.offsets[start_user_id:min(end_user_id, n_users)]
+        starts.extend(array('l', [len(self.targets)]) * max(end_user_id - max(start_user_id, n_users), 0))
+        return array('l', map(shift.__add__, starts))
+
+    def withChanges(self, changes):
+        """ a copy with the edges of changes, {user id: {neighbour id: whether the edge
+            exists}}, added or removed. The rows of the other users are copied as is """
+        n_users = max(len(self.offsets) - 1, max(changes) + 1)
+        adjacency = _Adjacency.__new__(_Adjacency)
+        adjacency.offsets = array('l')
+        adjacency.targets = array('l')
+
+        # the users before next_user_id are copied, their rows moved by shift
+        next_user_id, shift = 0, 0
+        for user_id in sorted(changes):
+            adjacency.offsets.extend(self._starts(next_user_id, user_id, shift))
+            adjacency.targets.extend(self.targets[self._start(next_user_id):self._start(user_id)])
+
+            neighbours = set(self.neighbours(user_id))
+            for neighbour_id, exists in changes[user_id].items():
+                if exists:
+                    neighbours.add(neighbour_id)
+                else:
+                    neighbours.discard(neighbour_id)
+            adjacency.offsets.append(len(adjacency.targets))
+            adjacency.targets.extend(sorted(neighbours))
+
+            next_user_id = user_id + 1
+            shift = len(adjacency.targets) - self._start(next_user_id)
+
+        adjacency.offsets.extend(self._starts(next_user_id, n_users + 1, shift))
+        adjacency.targets.extend(self.targets[self._start(next_user_id):])
+        return adjacency
+
+    def _bounds(self, user_id):
+        if not 0 <= user_id < len(self.offsets) - 1:
+            return 0, 0
+        return self.offsets[user_id], self.offsets[user_id + 1]
+
+    def neighbours(self, user_id):
+        start, end = self._bounds(user_id)
+        return self.targets[start:end]
+
+    def count(self, user_id):
+        start, end = self._bounds(user_id)
+        return end - start
+
+    def contains(self, user_id, neighbour_id):
+        start, end = self._bounds(user_id)
+        i = bisect_left(self.targets, neighbour_id, start, end)
+        return i < end and self.targets[i] == neighbour_id
+
+
+class FollowerGraph:
+    def __init__(self, edges):
+        """ edges is a list of (follower id, followed id) pairs """
+        max_user_id = max((max(edge) for edge in edges), default=0)
+
+        self._followees = _Adjacency(sorted(set(edges)), max_user_id)
+        self._followers = _Adjacency(sorted({(followed, follower) for follower, followed in edges}), max_user_id)
+
+    def withChanges(self, changes):
+        """ a copy with changes applied, a list of (follower id, followed id, whether following) """
+        followees, followers = {}, {}
+        # the last change of an edge wins
+        for follower_id, followed_id, following in changes:
+            followees.setdefault(follower_id, {})[followed_id] = following
+            followers.setdefault(followed_id, {})[follower_id] = following
+
+        graph = FollowerGraph.__new__(FollowerGraph)
+        graph._followees = self._followees.withChanges(followees)
+        graph._followers = self._followers.withChanges(followers)
+        return graph
+
+    @classmethod
+    def fromDatabase(cls):
+        return cls(list(Follower.objects.values_list('user_follower_id', 'user_being_followed_id')))
+
+    def isFollowing(self, follower_id, followed_id):
+        return self._followees.contains(follower_id, followed_id)
+
+    def followersOf(self, user_id):
+        return self._followers.neighbours(user_id)
+
+    def followeesOf(self, user_id):
+        return self._followees.neighbours(user_id)
+
+    def countFollowers(self, user_id):
+        return self._followers.count(user_id)
+
+    def countFollowing(self, user_id):
+        return self._followees.count(user_id)
+
+
+def isShared():
+    """ whether the follows logged by every process reach the graph of this one """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _version():
+    version = cache.get(GRAPH_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(GRAPH_CHANGE_COUNT_KEY.format(version=version), 0, None)
+        cache.add(GRAPH_VERSION_KEY, version, None)
+        version = cache.get(GRAPH_VERSION_KEY)
+    return version
+
+
+def _changeCount(version):
+    return cache.get(GRAPH_CHANGE_COUNT_KEY.format(version=version))
+
+
+def _build(version):
+    """ the graph read from the database, and the number of changes it holds """
+    # counted first: the changes logged while the table is read are replayed on top
+    n_changes = _changeCount(version) or 0
+    # from the primary, a snapshot built from a lagging replica would outlive the lag
+    with routers.readFromPrimary():
+        graph = FollowerGraph.fromDatabase()
+    cache.set(GRAPH_SNAPSHOT_KEY.format(version=version), (n_changes, graph), GRAPH_SNAPSHOT_TIMEOUT)
+    return n_changes, graph
+
+
+def _catchUp(version, n_applied, graph, n_changes):
+    """ graph with the logged changes n_applied + 1 to n_changes applied """
+    if not 0 <= n_changes - n_applied <= MAX_CHANGES:
+        return _build(version)
+
+    keys = [GRAPH_CHANGE_KEY.format(version=version, n=n) for n in range(n_applied + 1, n_changes + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys):
+        # evicted, or counted but not stored yet
+        return _build(version)
+    return n_changes, graph.withChanges([changes[key] for key in keys])
+
+
+def getGraph():
+    """ returns the current FollowerGraph, built at most once per invalidate() and
+        brought up to date with the follows and unfollows logged since """
+    version = _version()
+    n_changes = _changeCount(version)
+    if n_changes is None:
+        # evicted, which changes a graph holds can't be told anymore
+        _bumpVersion()
+        version, n_changes = _version(), 0
+
+    with _local_graph_lock:
+        local_graph = dict(_local_graph)
+    if local_graph['version'] == version and local_graph['changes'] == n_changes:
+        return local_graph['graph']
+
+    if local_graph['version'] == version:
+        n_applied, graph = local_graph['changes'], local_graph['graph']
+    else:
+        snapshot = cache.get(GRAPH_SNAPSHOT_KEY.format(version=version))
+        n_applied, graph = snapshot if snapshot is not None else _build(version)
+    if n_applied != n_changes:
+        n_applied, graph = _catchUp(version, n_applied, graph, n_changes)
+
+    with _local_graph_lock:
+        _local_graph['version'] = version
+        _local_graph['changes'] = n_applied
+        _local_graph['graph'] = graph
+    return graph
+
+
+def _logChange(follower_id, followed_id, following):
+    version = _version()
+    try:
+        n = cache.incr(GRAPH_CHANGE_COUNT_KEY.format(version=version))
+    except ValueError:
+        # evicted, every process rebuilds its graph
+        _bumpVersion()
+        return
+    cache.set(GRAPH_CHANGE_KEY.format(version=version, n=n), (follower_id, followed_id, following), GRAPH_SNAPSHOT_TIMEOUT)
+
+
+def followChanged(follower_id, followed_id, following):
+    """ applies a follow or unfollow to the graph of every process, once the current
+        transaction commits """
+    transaction.on_commit(lambda: _logChange(follower_id, followed_id, following))
+
+
+def _bumpVersion():
+    # a random token, so a cleared or restarted cache never hands out an old version again
+    version = uuid.uuid4().hex
+    cache.set(GRAPH_CHANGE_COUNT_KEY.format(version=version), 0, None)
+    cache.set(GRAPH_VERSION_KEY, version, None)
+
+
+def invalidate():
+    """ drops the graph after Follower rows were written in bulk, without signals. Bumped
+        right away, so this process sees its own writes, and again on commit, so no other
+        process keeps a graph built from the data as it was before the commit """
+    _bumpVersion()
+    transaction.on_commit(_bumpVersion)
@@ -0,0 +1,302 @@
+""" Write-behind buffer of likes, for posts that get liked faster than SQLite can write.
+
+    With settings.NETWORK_LIKE_WRITE_BEHIND, handleLikeDislike doesn't write. It records
+    the visitor's intent (like or unlike a post) in this in-process buffer and answers
+    right away. A background thread flushes the buffer every NETWORK_LIKE_FLUSH_INTERVAL
+    seconds. A flush collapses the toggles of each (liker, post) to its last intent and
+    applies them in one transaction: one bulk insert, one bulk delete and one recount of
+    the touched like counters. Until then the pages of this process show the merged state:
+    the counts, the likes lists and the visitor's own likes have the pending intents
+    laid over them.
+
+    Idempotency: an intent is a desired state, not a toggle. Applying it means inserting
+    the like (ignoring an existing one) or deleting it, and the counters are recounted
+    from the Like table. Applying an intent twice, or replaying it after a crash, can't
+    double count.
+
+    Durability: every intent is appended to a journal file in NETWORK_LIKE_JOURNAL_DIR
+    (one per process, fsync'ed unless NETWORK_LIKE_JOURNAL_FSYNC is off) before the
+    request is answered. The file is deleted once its intents are committed. A process
+    dying with unflushed intents leaves its journal behind. Its lock is released, and the
+    next process to start flushing (or the flush_likes command) replays it.
+    Without the fsync an OS crash can lose the last intents, a process crash can't.
+    The journals are locked with fcntl, imported only once a journal is used: the
+    journal is POSIX only, the app imports and runs without it elsewhere.
+
+    With more than one process, an intent is visible to the other processes only once
+    flushed, so for up to one interval they show the previous count, and a like sent
+    twice to two processes is applied once. """
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from .models import User, Post, Like
+from . import counters, feedCache
+
+
+WRITE_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# {post id: {liker id: (liked in the database, liked)}}, the intents not flushed yet
+_pending = {}
+# the intents being flushed, still laid over the pages until they are committed
+_flushing = {}
+_journal = {'file': None, 'sealed': []}
+_flusher = {'thread': None}
+
+
+def enabled():
+    return getattr(settings, 'NETWORK_LIKE_WRITE_BEHIND', False)
+
+
+def _journalDir():
+    return getattr(settings, 'NETWORK_LIKE_JOURNAL_DIR', None)
+
+
+def _openJournal():
+    """ a new journal file of this process, locked for as long as the process holds it """
+    directory = _journalDir()
+    if not directory:
+        return None
+    import fcntl
+
+    os.makedirs(directory, exist_ok=True)
+    journal = open(os.path.join(directory, f'{os.getpid()}-{uuid.uuid4().hex}.log'), 'a')
+    fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return journal
+
+
+def _appendToJournal(liker_id, post_id, liked):
+    if _journal['file'] is None:
+        _journal['file'] = _openJournal()
+        if _journal['file'] is None:
+            return
+
+    _journal['file'].write(json.dumps([liker_id, post_id, liked]) + '\n')
+    _journal['file'].flush()
+    if getattr(settings, 'NETWORK_LIKE_JOURNAL_FSYNC', True):
+        os.fsync(_journal['file'].fileno())
+
+
+def currentIntent(liker_id, post_id):
+    """ returns whether liker likes post according to the buffer, None if the buffer
+        holds no intent of liker about post """
+    with _lock:
+        for intents in (_pending, _flushing):
+            if liker_id in intents.get(post_id, {}):
+                return intents[post_id][liker_id][1]
+    return None
+
+
+def recordIntent(liker_id, post_id, liked, liked_before):
+    """ records that liker likes (or doesn't like anymore) post. liked_before is whether
+        liker liked post before, according to currentIntent() or else the database """
+    _ensureFlusher()
+
+    with _lock:
+        _appendToJournal(liker_id, post_id, liked)
+
+        post_intents = _pending.setdefault(post_id, {})
+        if liker_id in post_intents:
+            liked_in_db = post_intents[liker_id][0]
+        elif liker_id in _flushing.get(post_id, {}):
+            # the database has the flushed intent as soon as it's committed
+            liked_in_db = _flushing[post_id][liker_id][1]
+        else:
+            # also right when the intent liked_before came from was flushed meanwhile
+            liked_in_db = liked_before
+
+        post_intents[liker_id] = (liked_in_db, liked)
+
+
+def _mergedIntents(post_id):
+    """ {liker id: (liked in the database, liked)} of the buffered intents about post """
+    return {**_flushing.get(post_id, {}), **_pending.get(post_id, {})}
+
+
+def pendingState(post_ids, user_id):
+    """ the buffered state of the posts, as seen by user, for the ETag of a page """
+    with _lock:
+        state = []
+        for post_id in post_ids:
+            intents = _mergedIntents(post_id)
+            if intents:
+                delta = sum(liked - liked_in_db for liked_in_db, liked in intents.values())
+                state.append((post_id, delta, intents.get(user_id, (None, None))[1]))
+        return tuple(state)
+
+
+def overlay(serialized_posts, user):
+    """ lays the buffered intents over serialized posts: their number_likes, their likes
+        lists and whether user likes them """
+    with _lock:
+        for post in serialized_posts:
+            intents = _mergedIntents(post['id'])
+            if not intents:
+                continue
+
+            post['number_likes'] = max(0, post['number_likes'] + sum(
+                liked - liked_in_db for liked_in_db, liked in intents.values()
+            ))
+
+            if 'likes' in post:
+                likers = {like['liker_id'] for like in post['likes']}
+                post['likes'] = [like for like in post['likes'] if intents.get(like['liker_id'], (None, True))[1]]
+                post['likes'] += [
+                    {'liker_id': liker_id, 'post_id': post['id']}
+                    for liker_id, (_, liked) in intents.items() if liked and liker_id not in likers
+                ]
+
+            if user.is_authenticated and user.id in intents:
+                post['does_current_visitor_like_this_post'] = intents[user.id][1]
+
+
+def _apply(intents):
+    """ applies {(liker id, post id): liked} in one transaction """
+    if not intents:
+        return
+
+    # the intents about posts or users deleted meanwhile are dropped
+    post_ids = set(Post.objects.filter(id__in={post_id for _, post_id in intents}).values_list('id', flat=True))
+    liker_ids = set(User.objects.filter(id__in={liker_id for liker_id, _ in intents}).values_list('id', flat=True))
+    intents = {
+        (liker_id, post_id): liked for (liker_id, post_id), liked in intents.items()
+        if liker_id in liker_ids and post_id in post_ids
+    }
+
+    unliked = [pair for pair, liked in intents.items() if not liked]
+
+    with transaction.atomic():
+        Like.objects.bulk_create(
+            [Like(liker_id=liker_id, post_id=post_id) for (liker_id, post_id), liked in intents.items() if liked],
+            batch_size=WRITE_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        for start in range(0, len(unliked), WRITE_BATCH_SIZE):
+            Like.objects.filter(reduce(or_, (
+                Q(liker_id=liker_id, post_id=post_id) for liker_id, post_id in unliked[start:start + WRITE_BATCH_SIZE]
+            ))).delete()
+
+        counters.recountLikes(Post.objects.filter(id__in={post_id for _, post_id in intents}))
+        feedCache.bumpFeedVersion()
+
+
+def flush():
+    """ applies the buffered intents, returns how many (liker, post) pairs were written """
+    global _pending, _flushing
+
+    with _lock:
+        if not _pending:
+            return 0
+
+        _flushing, _pending = _pending, {}
+        # the new intents go to a new journal, the sealed ones are deleted once committed
+        if _journal['file'] is not None:
+            _journal['sealed'].append(_journal['file'])
+            _journal['file'] = None
+
+        intents = {
+            (liker_id, post_id): liked
+            for post_id, post_intents in _flushing.items()
+            for liker_id, (_, liked) in post_intents.items()
+        }
+
+    try:
+        _apply(intents)
+    except Exception:
+        with _lock:
+            # kept for the next flush, behind the intents recorded meanwhile
+            for post_id, post_intents in _flushing.items():
+                _pending[post_id] = {**post_intents, **_pending.get(post_id, {})}
+            _flushing = {}
+        raise
+
+    with _lock:
+        _flushing = {}
+        sealed, _journal['sealed'] = _journal['sealed'], []
+
+    for journal in sealed:
+        os.remove(journal.name)
+        journal.close()
+    return len(intents)
+
+
+def replayJournals():
+    """ applies the journals left behind by dead processes, returns how many were replayed """
+    directory = _journalDir()
+    if not directory:
+        return 0
+    import fcntl
+
+    own = {journal.name for journal in _journal['sealed'] + [_journal['file']] if journal is not None}
+    replayed = 0
+
+    for path in sorted(glob.glob(os.path.join(directory, '*.log'))):
+        if path in own:
+            continue
+
+        with open(path) as journal:
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # a live process holds it
+                continue
+
+            intents = {}
+            for line in journal:
+                try:
+                    liker_id, post_id, liked = json.loads(line)
+                except ValueError:
+                    # a line cut short by the crash
+                    continue
+                intents[(liker_id, post_id)] = liked
+
+            _apply(intents)
+            os.remove(path)
+            replayed += 1
+
+    return replayed
+
+
+def _flushForever(interval):
+    try:
+        replayJournals()
+    finally:
+        close_old_connections()
+
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logger.exception('Flushing the buffered likes failed, retrying in %ss', interval)
+        finally:
+            close_old_connections()
+
+
+def _ensureFlusher():
+    """ starts the background flusher of this process, unless the interval is None
+        (the buffer is then flushed by calling flush()) """
+    interval = getattr(settings, 'NETWORK_LIKE_FLUSH_INTERVAL', 1.0)
+    if interval is None or _flusher['thread'] is not None:
+        return
+
+    with _lock:
+        if _flusher['thread'] is None:
+            _flusher['thread'] = threading.Thread(target=_flushForever, args=(interval,), name='like-flusher', daemon=True)
+            _flusher['thread'].start()
+            # what is left at a clean shutdown is written right away
+            atexit.register(flush)
@@ -0,0 +1,157 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from ...models import User, Post
+from ... import benchmarking, feedCache, graph, postCounts, urls, userCache
+
+
+class Command(BaseCommand):
+    help = ('Drives every URL of the network app through the test client against the current '
+            '(seeded) database and reports latency percentiles, SQL queries, rows fetched and '
+            'response bytes per endpoint, optionally compared against a stored baseline. '
+            'Writes are rolled back at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', help='only the endpoints whose name contains this')
+        parser.add_argument('--json', dest='json_path', help='write the results to this file')
+        parser.add_argument('--baseline', help='compare the results with this file')
+        parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression, 0.2 = 20%%')
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline needs --baseline')
+
+        # the test client talks to 'testserver'
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+
+        # the cached feed pages, post counts, follower graph and users may hold the rolled back writes
+        graph.invalidate()
+        feedCache.bumpFeedVersion()
+        postCounts.resetCounts()
+        userCache.clear()
+
+        self.printTable(results)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Baseline saved to {options["baseline"]}')
+        elif options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+            regressions = benchmarking.compareWithBaseline(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def run(self, options):
+        scenarios = self.scenarios()
+
+        url_names = {pattern.name for pattern in urls.urlpatterns}
+        missing = url_names - {url_name for url_name, _, _ in scenarios}
+        if missing:
+            raise CommandError(f'No benchmark scenario for the URL(s): {", ".join(sorted(missing))}')
+
+        results = {}
+        for url_name, label, makeRequest in scenarios:
+            name = f'{url_name}[{label}]'
+            if options['only'] and options['only'] not in name:
+                continue
+
+            results[name] = benchmarking.measure(makeRequest, options['iterations'], options['warmup'])
+        return results
+
+    def printTable(self, results):
+        columns = ['p50_ms', 'p95_ms', 'p99_ms', 'queries', 'rows_fetched', 'response_bytes', 'statuses']
+        width = max([len(name) for name in results] + [8])
+
+        self.stdout.write(f'{"endpoint":<{width}}  ' + '  '.join(f'{column:>14}' for column in columns))
+        for name, metrics in results.items():
+            self.stdout.write(f'{name:<{width}}  ' + '  '.join(f'{str(metrics[column]):>14}' for column in columns))
+
+    def scenarios(self):
+        """ returns (url name, label, makeRequest(iteration)) for each benchmarked request """
+        viewer = User.objects.order_by('-following_count', 'id').first()
+        profile = User.objects.order_by('-followers_count', 'id').first()
+        if viewer is None or not Post.objects.exists():
+            raise CommandError('The database is empty, seed it first (manage.py seed_network)')
+
+        own_post = viewer.posts.order_by('-id').first() or Post.objects.create(poster=viewer, content='benchmark post')
+        liked_post = Post.objects.exclude(likes__liker=viewer).order_by('-timestamp', '-id').first()
+        batch_post_ids = list(Post.objects.exclude(likes__liker=viewer).exclude(id=liked_post.id).order_by('-id').values_list('id', flat=True)[:10])
+        followed_profile = User.objects.exclude(id=viewer.id).exclude(followers__user_follower=viewer).order_by('-followers_count').first()
+
+        anonymous = Client()
+        client = Client()
+        client.force_login(viewer)
+
+        n_pages = max(1, Post.objects.count() // 10)
+        index_page = lambda pageNumber: reverse('getPostsPageGivenTemplate', kwargs={
+            'templatePageName': 'index', 'pageNumber': pageNumber
+        })
+        first_page = client.get(index_page(1), {'cursor': ''}).json()
+        search_page = client.get(reverse('searchPosts'), {'q': 'post number'}).json()
+
+        def toggle(url, field):
+            # odd iterations undo the even ones, so every request succeeds
+            return lambda iteration: client.put(url, json.dumps({field: iteration % 2 == 0}))
+
+        def logout(iteration):
+            response = client.get(reverse('logout'))
+            client.force_login(viewer)
+            return response
+
+        return [
+            ('getPostsPageGivenTemplate', 'index page 1', lambda i: client.get(index_page(1))),
+            ('getPostsPageGivenTemplate', 'index page 1 anonymous', lambda i: anonymous.get(index_page(1))),
+            ('getPostsPageGivenTemplate', f'index page {n_pages // 2}', lambda i: client.get(index_page(n_pages // 2))),
+            ('getPostsPageGivenTemplate', 'index page 2 by cursor',
+                lambda i: client.get(index_page(2), {'cursor': first_page['nextCursor'] or ''})),
+            ('getPostsPageGivenTemplate', 'following page 1', lambda i: client.get(reverse('getPostsPageGivenTemplate', kwargs={
+                'templatePageName': 'following', 'pageNumber': 1
+            }))),
+            ('getPostsPageGivenUserId', 'profile page 1', lambda i: client.get(reverse('getPostsPageGivenUserId', kwargs={
+                'filterUserId': profile.id, 'pageNumber': 1
+            }))),
+            ('handleLikeDislike', 'like/unlike',
+                toggle(reverse('handleLikeDislike', kwargs={'postId': liked_post.id}), 'does_current_visitor_like_this_post')),
+            ('handleSaveNewPostContent', 'edit', lambda i: client.put(
+                reverse('handleSaveNewPostContent', kwargs={'postId': own_post.id}),
+                json.dumps({'newContent': f'benchmark edit {i}'})
+            )),
+            ('handleBatch', 'like/unlike 10 posts', lambda i: client.post(reverse('handleBatch'), json.dumps({
+                'operations': [{'op': 'like' if i % 2 == 0 else 'unlike', 'postId': post_id} for post_id in batch_post_ids]
+            }), content_type='application/json')),
+            ('searchPosts', 'one term', lambda i: client.get(reverse('searchPosts'), {'q': 'post'})),
+            ('searchPosts', 'two terms, page 2', lambda i: client.get(reverse('searchPosts'), {
+                'q': 'post number', 'cursor': search_page['nextCursor'] or ''
+            })),
+            ('exportPosts', 'every post', lambda i: client.get(reverse('exportPosts'))),
+            ('exportProfilePosts', 'most followed profile',
+                lambda i: client.get(reverse('exportProfilePosts', kwargs={'profileId': profile.id}))),
+            # the stream itself is served under ASGI only
+            ('streamEvents', 'without ASGI', lambda i: client.get(reverse('streamEvents'))),
+            ('index', 'get', lambda i: client.get(reverse('index'))),
+            ('index', 'new post', lambda i: client.post(reverse('index'), {'newPostContent': f'benchmark post {i}'})),
+            ('profilePage', 'get', lambda i: client.get(reverse('profilePage', kwargs={'profileId': profile.id}))),
+            ('profilePage', 'follow/unfollow',
+                toggle(reverse('profilePage', kwargs={'profileId': followed_profile.id}), 'visitor_is_following')),
+            ('followingPage', 'get', lambda i: client.get(reverse('followingPage'))),
+            ('login', 'get', lambda i: anonymous.get(reverse('login'))),
+            ('logout', 'get', logout),
+            ('register', 'get', lambda i: anonymous.get(reverse('register'))),
+        ]
@@ -0,0 +1,160 @@
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from ...asgi import AsyncViewsASGIHandler
+from ...benchmarking import percentile
+from ...models import User
+
+
+class Command(BaseCommand):
+    help = ('Sends the same GET request many times, with many requests in flight, straight to '
+            'the WSGI application (sync views, one thread per request in flight) and to the ASGI '
+            'application (async views, one event loop), and reports requests/s and latencies. '
+            'The applications are called in process, so the numbers leave out the HTTP server '
+            'and the network, which are the same for both')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='defaults to the first page of the index feed')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=64, help='requests in flight')
+        parser.add_argument('--login', action='store_true', help='send the requests as the user following the most profiles')
+        parser.add_argument('--only', choices=['wsgi', 'asgi'])
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+
+        path = options['path'] or reverse('getPostsPageGivenTemplate', kwargs={'templatePageName': 'index', 'pageNumber': 1})
+        path, _, query_string = path.partition('?')
+        session = self.createSession() if options['login'] else None
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}' if session else ''
+
+        runs = {'wsgi': self.runWsgi, 'asgi': self.runAsgi}
+        if options['only']:
+            runs = {options['only']: runs[options['only']]}
+
+        try:
+            with override_settings(ALLOWED_HOSTS=['localhost']):
+                for name, run in runs.items():
+                    started_at = time.perf_counter()
+                    statuses, latencies = run(path, query_string, cookie, options)
+                    elapsed = time.perf_counter() - started_at
+
+                    self.report(name, statuses, latencies, elapsed)
+        finally:
+            if session is not None:
+                session.delete()
+
+    def createSession(self):
+        user = User.objects.order_by('-following_count', 'id').first()
+        if user is None:
+            raise CommandError('The database is empty, seed it first (manage.py seed_network)')
+
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    def report(self, name, statuses, latencies, elapsed):
+        errors = sum(status != 200 for status in statuses)
+        self.stdout.write(
+            f'{name}: {len(statuses) / elapsed:8.1f} requests/s   '
+            f'p50 {percentile(latencies, 50):7.2f}ms   p99 {percentile(latencies, 99):7.2f}ms   '
+            f'{errors} non 200 response(s)'
+        )
+
+    def runWsgi(self, path, query_string, cookie, options):
+        application = WSGIHandler()
+
+        def request(_):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'QUERY_STRING': query_string,
+                'SCRIPT_NAME': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie,
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            status = []
+
+            started_at = time.perf_counter()
+            response = application(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+            b''.join(response)
+            response.close()
+            return int(status[0].split()[0]), (time.perf_counter() - started_at) * 1000
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(request, range(options['requests'])))
+        return [status for status, _ in results], [latency for _, latency in results]
+
+    def runAsgi(self, path, query_string, cookie, options):
+        application = AsyncViewsASGIHandler()
+        headers = [(b'host', b'localhost')] + ([(b'cookie', cookie.encode())] if cookie else [])
+
+        async def request(semaphore):
+            async with semaphore:
+                scope = {
+                    'type': 'http',
+                    'asgi': {'version': '3.0'},
+                    'http_version': '1.1',
+                    'method': 'GET',
+                    'scheme': 'http',
+                    'path': path,
+                    'raw_path': path.encode(),
+                    'query_string': query_string.encode(),
+                    'root_path': '',
+                    'headers': headers,
+                    'server': ('localhost', 80),
+                }
+                request_sent = False
+                done = asyncio.Event()
+                status = []
+
+                async def receive():
+                    nonlocal request_sent
+                    if not request_sent:
+                        request_sent = True
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    # the handler listens for a disconnect while the response is built
+                    await done.wait()
+                    return {'type': 'http.disconnect'}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+                    elif not message.get('more_body'):
+                        done.set()
+
+                started_at = time.perf_counter()
+                await application(scope, receive, send)
+                return status[0], (time.perf_counter() - started_at) * 1000
+
+        async def main():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            return await asyncio.gather(*(request(semaphore) for _ in range(options['requests'])))
+
+        results = asyncio.run(main())
+        return [status for status, _ in results], [latency for _, latency in results]
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import User, Post
+from ... import export
+
+
+class Command(BaseCommand):
+    help = ('Writes every post, or the posts of one profile, as NDJSON (one JSON object per '
+            'line: the post, its poster and its like_count), reading the posts chunk by chunk '
+            'so the memory used doesn\'t grow with the number of posts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', type=int, help='only the posts of the user with this id')
+        parser.add_argument('--output', help='write to this file instead of the standard output')
+        parser.add_argument('--chunk-size', type=int, default=export.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        posts = Post.objects.all()
+        if options['profile'] is not None:
+            if not User.objects.filter(id=options['profile']).exists():
+                raise CommandError(f'No user with the id {options["profile"]}')
+            posts = posts.filter(poster_id=options['profile'])
+
+        lines = export.ndjsonLines(export.exportedPosts(posts), options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
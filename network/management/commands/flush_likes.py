@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from ... import likeBuffer
+
+
+class Command(BaseCommand):
+    help = ('Writes the likes journaled by processes that died before flushing them '
+            '(see network/likeBuffer.py). Safe to run at any time, the journals of live '
+            'processes are left alone')
+
+    def handle(self, *args, **options):
+        n_replayed = likeBuffer.replayJournals()
+        self.stdout.write(f'{n_replayed} journal(s) replayed')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import timeline
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the timelines of the following feed from the Follower and Post tables, '
+            'fixing the posts and follows written without fanning them out')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            n_entries = timeline.rebuildTimelines()
+        self.stdout.write(f'{n_entries} timeline entries written')
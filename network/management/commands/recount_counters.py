@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ... import counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized counters from the source tables, fixing any drift'
+
+    def handle(self, *args, **options):
+        fixed_posts = counters.recountLikes()
+        self.stdout.write(f'like_count fixed on {fixed_posts} post(s)')
+
+        fixed_users = counters.recountFollows()
+        self.stdout.write(f'followers_count/following_count fixed on {fixed_users} user(s)')
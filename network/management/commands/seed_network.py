@@ -0,0 +1,168 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from ...models import User, Post, Follower, Like
+from ... import counters, feedCache, graph, postCounts, search, timeline
+
+
+@contextmanager
+def _explicitPostTimestamps():
+    """ Post.timestamp is auto_now, which would stamp every seeded post with the same
+        instant. Turned off while seeding, so posts can be spread over time """
+    timestamp_field = Post._meta.get_field('timestamp')
+    timestamp_field.auto_now = False
+    try:
+        yield
+    finally:
+        timestamp_field.auto_now = True
+
+
+def _zipfCumWeights(n, exponent):
+    """ cumulative weights of a Zipf (power law) distribution over n ranks """
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Creates a synthetic network of users, posts, a power-law follower graph and a skewed '
+            'distribution of likes, deterministic for a given seed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--likes', type=int, default=30000, help='likes to try to create (duplicates are dropped)')
+        parser.add_argument('--follows-per-user', type=float, default=20, help='mean number of profiles followed')
+        parser.add_argument('--exponent', type=float, default=1.1, help='exponent of the power laws')
+        parser.add_argument('--days', type=int, default=365, help='the posts are spread over this many days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='usernames are <prefix>_<n>')
+        parser.add_argument('--password', default='password', help='password of every seeded user')
+        parser.add_argument('--no-timelines', action='store_true', help='don\'t build the following timelines')
+
+    def log(self, message):
+        self.stdout.write(f'[{time.monotonic() - self.started_at:7.1f}s] {message}')
+
+    def bulkCreate(self, model, objects):
+        """ creates the objects of an iterable chunk by chunk, so only one chunk of model
+            instances is ever in memory. Returns the ids of the new rows """
+        objects = iter(objects)
+        ids = []
+
+        while chunk := list(islice(objects, self.options['chunk_size'])):
+            ids.extend(obj.pk for obj in model.objects.bulk_create(chunk))
+        return ids
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.started_at = time.monotonic()
+        rng = random.Random(options['seed'])
+
+        if options['users'] < 2:
+            raise CommandError('At least two users are needed')
+        if User.objects.filter(username__startswith=f'{options["prefix"]}_').exists():
+            raise CommandError(f'There are users named {options["prefix"]}_* already, choose another --prefix')
+
+        with transaction.atomic():
+            user_ids = self.createUsers(options)
+            self.createFollows(rng, user_ids, options)
+            post_ids = self.createPosts(rng, user_ids, options)
+            self.createLikes(rng, user_ids, post_ids, options)
+
+            counters.recountLikes()
+            counters.recountFollows()
+            self.log('counters recounted')
+
+            search.rebuildIndex()
+            self.log('search index rebuilt')
+
+            if not options['no_timelines']:
+                timeline.rebuildTimelines()
+                self.log('timelines rebuilt')
+
+        graph.invalidate()
+        feedCache.bumpFeedVersion()
+        postCounts.resetCounts()
+        self.log('done')
+
+    def createUsers(self, options):
+        password = make_password(options['password'])
+        users = [
+            User(username=f'{options["prefix"]}_{i}', email=f'{options["prefix"]}_{i}@example.com', password=password)
+            for i in range(options['users'])
+        ]
+        user_ids = self.bulkCreate(User, users)
+
+        self.log(f'{len(user_ids)} users')
+        return user_ids
+
+    def createFollows(self, rng, user_ids, options):
+        """ everyone follows a heavy tailed number of profiles, picked with a power law
+            on popularity, so a few profiles gather most of the followers """
+        cum_weights = _zipfCumWeights(len(user_ids), options['exponent'])
+        # the mean of a Pareto(2) variate is 2
+        mean_follows = options['follows_per_user'] / 2
+
+        def follows():
+            for follower_id in user_ids:
+                n_follows = min(len(user_ids) - 1, int(mean_follows * rng.paretovariate(2)))
+                followed_ids = set(rng.choices(user_ids, cum_weights=cum_weights, k=n_follows))
+                followed_ids.discard(follower_id)
+
+                for followed_id in sorted(followed_ids):
+                    yield Follower(user_follower_id=follower_id, user_being_followed_id=followed_id)
+
+        n_follows = len(self.bulkCreate(Follower, follows()))
+        self.log(f'{n_follows} follows')
+
+    def createPosts(self, rng, user_ids, options):
+        """ the posters follow a power law too, and the posts are spread over options['days'].
+            The most active posters aren't the most followed profiles, or the fan-out of the
+            timelines would explode """
+        cum_weights = _zipfCumWeights(len(user_ids), options['exponent'])
+        poster_ids = list(user_ids)
+        rng.shuffle(poster_ids)
+        now = timezone.now()
+        period = timedelta(days=options['days']).total_seconds()
+
+        def posts():
+            for i in range(options['posts']):
+                yield Post(
+                    poster_id=rng.choices(poster_ids, cum_weights=cum_weights)[0],
+                    content=f'Seeded post number {i}',
+                    timestamp=now - timedelta(seconds=rng.random() * period)
+                )
+
+        with _explicitPostTimestamps():
+            post_ids = self.bulkCreate(Post, posts())
+
+        self.log(f'{len(post_ids)} posts')
+        return post_ids
+
+    def createLikes(self, rng, user_ids, post_ids, options):
+        """ a few posts go viral: the liked posts follow a power law, the likers are uniform """
+        if not post_ids:
+            return
+
+        cum_weights = _zipfCumWeights(len(post_ids), options['exponent'])
+        # the most liked posts are spread at random over time, not just the oldest ones
+        shuffled_post_ids = list(post_ids)
+        rng.shuffle(shuffled_post_ids)
+
+        likes = {
+            (liker_id, post_id)
+            for liker_id, post_id in zip(
+                rng.choices(user_ids, k=options['likes']),
+                rng.choices(shuffled_post_ids, cum_weights=cum_weights, k=options['likes'])
+            )
+        }
+
+        self.bulkCreate(Like, (Like(liker_id=liker_id, post_id=post_id) for liker_id, post_id in sorted(likes)))
+        self.log(f'{len(likes)} likes')
@@ -0,0 +1,42 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Copies the SQLite primary database into the SQLite file of the replica alias, a '
+            'local stand-in for replication (see network/routers.py). With --interval it keeps '
+            'copying, which also reproduces the replication lag')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', help='DATABASES alias of the replica, defaults to NETWORK_REPLICA_DATABASE or "replica"')
+        parser.add_argument('--interval', type=float, help='copy again every this many seconds, until interrupted')
+
+    def handle(self, *args, **options):
+        replica = options['replica'] or getattr(settings, 'NETWORK_REPLICA_DATABASE', None) or 'replica'
+        if replica not in settings.DATABASES:
+            raise CommandError(f'No database named {replica} in DATABASES')
+
+        databases = [settings.DATABASES['default'], settings.DATABASES[replica]]
+        if any(database['ENGINE'] != 'django.db.backends.sqlite3' for database in databases):
+            raise CommandError('Only SQLite databases can be copied, use the replication of the database otherwise')
+
+        while True:
+            self.copy(*(database['NAME'] for database in databases))
+            self.stdout.write(f'{replica} is a copy of default as of {time.strftime("%H:%M:%S")}')
+
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, primary_path, replica_path):
+        # the backup API copies a consistent snapshot, even while the primary is written to
+        primary = sqlite3.connect(primary_path)
+        replica = sqlite3.connect(replica_path)
+        try:
+            primary.backup(replica)
+        finally:
+            replica.close()
+            primary.close()
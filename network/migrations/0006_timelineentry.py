@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfillTimelines(apps, schema_editor):
+    TimelineEntry = apps.get_model('network', 'TimelineEntry')
+    Follower = apps.get_model('network', 'Follower')
+    Post = apps.get_model('network', 'Post')
+
+    schema_editor.execute(f'''
+        INSERT INTO {TimelineEntry._meta.db_table} (owner_id, post_id, timestamp)
+        SELECT DISTINCT follow.user_follower_id, post.id, post.timestamp
+        FROM {Follower._meta.db_table} follow
+        INNER JOIN {Post._meta.db_table} post ON post.poster_id = follow.user_being_followed_id
+    ''')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0005_auto_20201123_1434'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='network.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-timestamp', '-post'], name='timeline_owner_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'post'), name='unique_timeline_entry')],
+            },
+        ),
+        migrations.RunPython(backfillTimelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def countLikes(apps, schema_editor):
+    Post = apps.get_model('network', 'Post')
+    Like = apps.get_model('network', 'Like')
+
+    like_count = Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('id')).values('n')
+    Post.objects.update(like_count=Coalesce(Subquery(like_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0007_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(countLikes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def countFollows(apps, schema_editor):
+    User = apps.get_model('network', 'User')
+    Follower = apps.get_model('network', 'Follower')
+
+    def countBy(field):
+        return Coalesce(Subquery(
+            Follower.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('id')).values('n')
+        ), 0)
+
+    User.objects.update(
+        followers_count=countBy('user_being_followed'),
+        following_count=countBy('user_follower')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0008_post_like_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(countFollows, migrations.RunPython.noop),
+    ]
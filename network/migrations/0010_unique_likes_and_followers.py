@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:28
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def deleteDuplicates(apps, schema_editor):
+    """ keeps the oldest row of each duplicated like or follow, so the unique constraints
+        can be created, and recounts the counters the duplicates were part of """
+    User = apps.get_model('network', 'User')
+    Post = apps.get_model('network', 'Post')
+    Follower = apps.get_model('network', 'Follower')
+    Like = apps.get_model('network', 'Like')
+
+    def deleteAllButOldest(model, fields):
+        oldest_ids = model.objects.values(*fields).annotate(oldest_id=Min('id')).values('oldest_id')
+        return model.objects.exclude(id__in=oldest_ids).delete()[0]
+
+    def countBy(model, field):
+        return Coalesce(Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('id')).values('n')
+        ), 0)
+
+    if deleteAllButOldest(Like, ['liker', 'post']):
+        Post.objects.update(like_count=countBy(Like, 'post'))
+
+    if deleteAllButOldest(Follower, ['user_follower', 'user_being_followed']):
+        User.objects.update(
+            followers_count=countBy(Follower, 'user_being_followed'),
+            following_count=countBy(Follower, 'user_follower')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0009_user_follow_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(deleteDuplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follower',
+            index=models.Index(fields=['user_being_followed', 'user_follower'], name='follower_followed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'liker'], name='like_post_liker_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follower',
+            constraint=models.UniqueConstraint(fields=('user_follower', 'user_being_followed'), name='unique_follower'),
+        ),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('liker', 'post'), name='unique_like'),
+        ),
+    ]
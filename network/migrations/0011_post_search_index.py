@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:02
+
+import sqlite3
+
+from django.db import migrations
+
+
+def _hasFts5(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+
+    with sqlite3.connect(':memory:') as probe:
+        return any(option == 'ENABLE_FTS5' for option, in probe.execute('PRAGMA compile_options'))
+
+
+def createSearchIndex(apps, schema_editor):
+    """ the FTS5 index of search.py, filled with the existing posts. Other backends search
+        without an index """
+    if not _hasFts5(schema_editor):
+        return
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE network_post_search USING fts5(content, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute('INSERT INTO network_post_search (rowid, content) SELECT id, content FROM network_post')
+
+
+def dropSearchIndex(apps, schema_editor):
+    if _hasFts5(schema_editor):
+        schema_editor.execute('DROP TABLE IF EXISTS network_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0010_unique_likes_and_followers'),
+    ]
+
+    operations = [
+        migrations.RunPython(createSearchIndex, dropSearchIndex),
+    ]
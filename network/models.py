@@ -5,6 +5,10 @@ from django.forms.widgets import Textarea
 # adicional models: posts, likes, and followers
 
 class User(AbstractUser):
+    # denormalized follow counters, kept by the follow/unfollow of ProfilePage.put
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
     def serialize(self):
         return {
             'id': self.id,
@@ -25,36 +29,84 @@ class Follower(models.Model):
         related_name='users_being_followed'
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_follower', 'user_being_followed'], name='unique_follower')
+        ]
+        indexes = [
+            # the followers of a profile, the fan-out of a new post
+            models.Index(fields=['user_being_followed', 'user_follower'], name='follower_followed_idx')
+        ]
+
 
 class Post(models.Model):
     poster = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now=True)
+    # denormalized number of likes, kept by handleLikeDislike with atomic increments
+    like_count = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the global and profile feeds
+            models.Index(fields=['-timestamp', '-id'], name='post_timestamp_idx'),
+            models.Index(fields=['poster', '-timestamp', '-id'], name='post_poster_ts_idx')
+        ]
 
     def __str__(self):
         return f'Auth {self.poster.username}: {self.content[:30]}... Timestamp: {self.timestamp}'
 
-    def serialize(self):
+    def serialize(self, likes=None):
+        """ likes can be given when already loaded, see serializers.serializePosts """
+        if likes is None:
+            likes = self.likes.all()
+
         serialized_poster = self.poster.serialize()
-        serialized_likes = [like.serialize() for like in self.likes.all()]
+        serialized_likes = [like.serialize() for like in likes]
 
         return {
             'id': self.id,
             'poster': serialized_poster,
             'content': self.content,
-            'timestamp': self.timestamp.strftime('%b %d %Y, %I:%M %p'),
-            'number_likes': len(self.likes.all()),
+            # ISO 8601, formatted by the client
+            'timestamp': self.timestamp.isoformat(),
+            'number_likes': self.like_count,
             'likes': serialized_likes
         }
 
 
+class TimelineEntry(models.Model):
+    """ A post delivered (fan-out-on-write) to the home timeline of one of its
+        poster's followers, so the following feed is read from a single index """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # copy of post.timestamp, kept in sync when the post is edited
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-timestamp', '-post'], name='timeline_owner_ts_idx')
+        ]
+
+
 class Like(models.Model):
     liker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['liker', 'post'], name='unique_like')
+        ]
+        indexes = [
+            # the likes of a page of posts
+            models.Index(fields=['post', 'liker'], name='like_post_liker_idx')
+        ]
+
     def serialize(self):
         return {
-            'liker_id': self.liker.id,
-            'post_id': self.post.id
+            'liker_id': self.liker_id,
+            'post_id': self.post_id
         }
@@ -0,0 +1,110 @@
+""" Keyset (cursor) pagination for querysets ordered newest first by (timestamp, id).
+
+    A cursor is an opaque, url safe token holding the (timestamp, id) of the last
+    (or first) row of a page plus the direction to walk, so every page is one
+    indexed range read of perPage + 1 rows, no matter how deep it is. """
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    def __init__(self, object_list, hasNext, hasPrevious, nextCursor, prevCursor):
+        self.object_list = object_list
+        self.hasNext = hasNext
+        self.hasPrevious = hasPrevious
+        self.nextCursor = nextCursor
+        self.prevCursor = prevCursor
+
+
+def encodeCursor(timestamp, pk, direction):
+    raw = json.dumps([timestamp.isoformat(), pk, direction]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decodeCursor(cursor):
+    """ returns the (timestamp, id, direction) stored in a cursor """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, pk, direction = json.loads(raw)
+        timestamp = parse_datetime(timestamp)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+    if timestamp is None or not isinstance(pk, int) or direction not in (NEXT, PREVIOUS):
+        raise InvalidCursor(cursor)
+    return timestamp, pk, direction
+
+
+def cursorsForPage(object_list, hasNext, hasPrevious, timestampField='timestamp', idField='id'):
+    """ returns the (nextCursor, prevCursor) pointing around a page of rows """
+    if not object_list:
+        return None, None
+
+    first, last = object_list[0], object_list[-1]
+    nextCursor = encodeCursor(getattr(last, timestampField), getattr(last, idField), NEXT) if hasNext else None
+    prevCursor = encodeCursor(getattr(first, timestampField), getattr(first, idField), PREVIOUS) if hasPrevious else None
+    return nextCursor, prevCursor
+
+
+def keysetQueryset(queryset, cursor, timestampField='timestamp', idField='id'):
+    """ returns queryset restricted to the rows after (or before) cursor, in the
+        order they must be read. An empty cursor means the first page.
+        Raises InvalidCursor for a malformed one """
+    if not cursor:
+        return queryset.order_by(f'-{timestampField}', f'-{idField}')
+
+    timestamp, pk, direction = decodeCursor(cursor)
+
+    if direction == NEXT:
+        # written as "ts <= t AND (ts < t OR id < pk)" so the index range starts at t
+        return queryset.filter(
+            Q(**{f'{timestampField}__lte': timestamp}),
+            Q(**{f'{timestampField}__lt': timestamp}) | Q(**{f'{idField}__lt': pk})
+        ).order_by(f'-{timestampField}', f'-{idField}')
+
+    return queryset.filter(
+        Q(**{f'{timestampField}__gte': timestamp}),
+        Q(**{f'{timestampField}__gt': timestamp}) | Q(**{f'{idField}__gt': pk})
+    ).order_by(timestampField, idField)
+
+
+def cursorPaginate(queryset, cursor, perPage, timestampField='timestamp', idField='id'):
+    """ returns the CursorPage of queryset that starts right after (or ends right before) cursor.
+        An empty cursor means the first page. Raises InvalidCursor for a malformed one """
+    rows = list(keysetQueryset(queryset, cursor, timestampField, idField)[:perPage + 1])
+    return _cursorPage(rows, cursor, perPage, timestampField, idField)
+
+
+async def acursorPaginate(queryset, cursor, perPage, timestampField='timestamp', idField='id'):
+    """ cursorPaginate for async views """
+    rows = [row async for row in keysetQueryset(queryset, cursor, timestampField, idField)[:perPage + 1]]
+    return _cursorPage(rows, cursor, perPage, timestampField, idField)
+
+
+def _cursorPage(rows, cursor, perPage, timestampField, idField):
+    """ rows are the perPage + 1 rows read after (or before) cursor """
+    hasMore = len(rows) > perPage
+    rows = rows[:perPage]
+
+    direction = decodeCursor(cursor)[2] if cursor else NEXT
+
+    if direction == NEXT:
+        hasNext, hasPrevious = hasMore, bool(cursor)
+    else:
+        rows.reverse()
+        hasNext, hasPrevious = True, hasMore
+
+    nextCursor, prevCursor = cursorsForPage(rows, hasNext, hasPrevious, timestampField, idField)
+    return CursorPage(rows, hasNext, hasPrevious, nextCursor, prevCursor)
@@ -0,0 +1,139 @@
+""" Cached numbers of posts, for the page links of the HTML pages.
+
+    Three scopes are counted: every post, the posts of a poster and the following
+    timeline of a viewer. A count is read with COUNT(*) on a cache miss only, and then
+    kept in Django's cache. A new post increments the global and poster counts, a
+    deleted one decrements them, on commit. The following counts of the poster's
+    followers (the ones timeline.fanOutPost delivered the post to) are dropped instead, as are
+    the counts of a viewer who follows or unfollows someone, and recounted from the
+    timeline index on the next page view.
+
+    The counts read from the replica are kept under their own keys, and dropped rather
+    than incremented by the writes, so a browser pinned to the primary after its write
+    never gets a count of the lagging replica.
+
+    The keys hold a version token, which resetCounts() bumps after the posts or the
+    timelines were written in bulk (seed_network, rolled back benchmarks). A count cached
+    by a reader racing a write can be off by one until POST_COUNT_TIMEOUT (or the shorter
+    NETWORK_REPLICA_PAGE_TIMEOUT when it was read from the replica). """
+import math
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follower, Post, TimelineEntry
+from . import routers
+
+
+POST_COUNT_VERSION_KEY = 'network:post-count:version'
+POST_COUNT_KEY = 'network:post-count:{version}:{database}:{scope}'
+POST_COUNT_TIMEOUT = 60 * 60
+
+
+def _version():
+    version = cache.get(POST_COUNT_VERSION_KEY)
+    if version is None:
+        cache.add(POST_COUNT_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(POST_COUNT_VERSION_KEY)
+    return version
+
+
+def _key(scope, version=None, database=None):
+    """ database defaults to the one the current request reads from """
+    return POST_COUNT_KEY.format(
+        version=version or _version(), database=database or routers.currentReadDatabase(), scope=scope
+    )
+
+
+def _replicaKeys(scopes, version=None):
+    replica = routers.replicaAlias()
+    if not replica:
+        return []
+    return [_key(scope, version, replica) for scope in scopes]
+
+
+def _posterScope(poster_id):
+    return f'poster:{poster_id}'
+
+
+def _followingScope(viewer_id):
+    return f'following:{viewer_id}'
+
+
+def _timeout():
+    # a count read from a lagging replica may miss the write that updated it
+    if routers.readingFromReplica():
+        return getattr(settings, 'NETWORK_REPLICA_PAGE_TIMEOUT', POST_COUNT_TIMEOUT)
+    return POST_COUNT_TIMEOUT
+
+
+def _cachedCount(scope, count):
+    key = _key(scope)
+    n_posts = cache.get(key)
+    if n_posts is None:
+        n_posts = count()
+        cache.add(key, n_posts, _timeout())
+    return n_posts
+
+
+def countPosts():
+    return _cachedCount('all', lambda: Post.objects.count())
+
+
+def countPostsBy(poster_id):
+    return _cachedCount(_posterScope(poster_id), lambda: Post.objects.filter(poster_id=poster_id).count())
+
+
+def countFollowingPosts(viewer):
+    return _cachedCount(_followingScope(viewer.id), lambda: TimelineEntry.objects.filter(owner=viewer).count())
+
+
+def pageRange(n_posts, perPage):
+    """ the page numbers of n_posts, like Paginator(...).page_range: there is always a first page """
+    return range(1, max(1, math.ceil(n_posts / perPage)) + 1)
+
+
+def _add(scopes, delta):
+    version = _version()
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope, version, routers.PRIMARY_DATABASE), delta)
+        except ValueError:
+            # not cached, the next read counts
+            pass
+    # the replica may not have the write yet, its counts are read again
+    cache.delete_many(_replicaKeys(scopes, version))
+
+
+def _drop(scopes):
+    version = _version()
+    cache.delete_many([_key(scope, version, routers.PRIMARY_DATABASE) for scope in scopes] + _replicaKeys(scopes, version))
+
+
+def _changed(post, delta, follower_ids):
+    _add(['all', _posterScope(post.poster_id)], delta)
+    _drop([_followingScope(follower_id) for follower_id in follower_ids])
+
+
+def postCreated(post, follower_ids):
+    """ follower_ids are the followers of the poster, the timelines timeline.fanOutPost wrote to """
+    transaction.on_commit(lambda: _changed(post, 1, follower_ids))
+
+
+def postDeleted(post):
+    follower_ids = list(Follower.objects.filter(
+        user_being_followed_id=post.poster_id
+    ).values_list('user_follower_id', flat=True))
+    transaction.on_commit(lambda: _changed(post, -1, follower_ids))
+
+
+def followsChanged(viewer_id):
+    """ the timeline of viewer gained or lost the posts of a profile """
+    transaction.on_commit(lambda: _drop([_followingScope(viewer_id)]))
+
+
+def resetCounts():
+    """ drops every cached count, after posts or timelines were written in bulk """
+    cache.set(POST_COUNT_VERSION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,80 @@
+""" Pluggable renderers of the API responses, chosen by the Accept header.
+
+    settings.NETWORK_API_RENDERERS lists the renderer classes, the first one being the
+    default when the client accepts none of them in particular. JsonRenderer encodes
+    with orjson when it is installed, with the stdlib json module and
+    DjangoJSONEncoder otherwise. MsgpackRenderer answers 'application/msgpack', when the
+    msgpack package is installed. The posts carry ISO 8601 timestamps, so every format
+    holds plain strings and the client formats them itself. """
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+from .instrumentation import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+DEFAULT_RENDERERS = ['network.renderers.JsonRenderer', 'network.renderers.MsgpackRenderer']
+
+
+class JsonRenderer:
+    content_type = 'application/json'
+
+    def isAvailable(self):
+        return True
+
+    def render(self, data):
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class MsgpackRenderer:
+    content_type = 'application/msgpack'
+
+    def isAvailable(self):
+        return msgpack is not None
+
+    def render(self, data):
+        return msgpack.packb(data, use_bin_type=True)
+
+
+def _renderers():
+    renderers = [import_string(path)() for path in getattr(settings, 'NETWORK_API_RENDERERS', DEFAULT_RENDERERS)]
+    return [renderer for renderer in renderers if renderer.isAvailable()]
+
+
+def negotiate(request):
+    """ returns the renderer of request, memoized on it (the ETag of a page depends on it) """
+    if not hasattr(request, '_network_renderer'):
+        renderers = _renderers()
+        preferred_type = request.get_preferred_type([renderer.content_type for renderer in renderers])
+        request._network_renderer = next(
+            (renderer for renderer in renderers if renderer.content_type == preferred_type), renderers[0]
+        )
+    return request._network_renderer
+
+
+def respond(request, data, status=200):
+    """ the response holding data, in the format negotiated for request """
+    renderer = negotiate(request)
+
+    with timed('encode'):
+        content = renderer.render(data)
+
+    response = HttpResponse(content, content_type=renderer.content_type, status=status)
+    patch_vary_headers(response, ['Accept'])
+    return response
@@ -0,0 +1,108 @@
+""" Read/write splitting between the primary database and a read replica.
+
+    The read-only views decorated with @readsFromReplica send their reads to the
+    settings.NETWORK_REPLICA_DATABASE alias, every other read and every write goes to
+    the primary ('default'). After a successful write request (POST, PUT, PATCH, DELETE)
+    ReplicaStickinessMiddleware sets a signed cookie, and for the next
+    NETWORK_REPLICA_STICKY_SECONDS that browser reads from the primary, so its own new
+    post, like or follow doesn't vanish behind the replication lag.
+
+    Locally the replica is a second SQLite file, refreshed by the sync_replica command. """
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+
+PRIMARY_DATABASE = 'default'
+STICKY_COOKIE = 'network_read_primary'
+STICKY_COOKIE_SALT = 'network.routers'
+
+_replica_alias = ContextVar('network_replica_alias', default=None)
+
+
+def replicaAlias():
+    return getattr(settings, 'NETWORK_REPLICA_DATABASE', None)
+
+
+def currentReadDatabase():
+    """ the alias the reads of the current request go to, for querysets evaluated after
+        the view returns (e.g. by a streaming response) """
+    return _replica_alias.get() or PRIMARY_DATABASE
+
+
+def readingFromReplica():
+    """ whether the reads of the current request go to the replica """
+    return _replica_alias.get() is not None
+
+
+@contextmanager
+def readFromPrimary():
+    """ sends the reads of the block to the primary, e.g. to build data that outlives the request """
+    token = _replica_alias.set(None)
+    try:
+        yield
+    finally:
+        _replica_alias.reset(token)
+
+
+def _isPinnedToPrimary(request):
+    sticky_seconds = getattr(settings, 'NETWORK_REPLICA_STICKY_SECONDS', 0)
+    return request.get_signed_cookie(STICKY_COOKIE, default=None, salt=STICKY_COOKIE_SALT, max_age=sticky_seconds) is not None
+
+
+def _replicaFor(request):
+    """ the replica alias the reads of request may go to, None for the primary """
+    if request.method not in ('GET', 'HEAD') or _isPinnedToPrimary(request):
+        return None
+    return replicaAlias()
+
+
+def readsFromReplica(view):
+    """ decorates a read-only view (sync or async) so its reads go to the replica """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _replica_alias.set(_replicaFor(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_alias.reset(token)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _replica_alias.set(_replicaFor(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _replica_alias.reset(token)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return currentReadDatabase()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+
+class ReplicaStickinessMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        sticky_seconds = getattr(settings, 'NETWORK_REPLICA_STICKY_SECONDS', 0)
+
+        if (replicaAlias() and sticky_seconds and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+                and response.status_code < 400):
+            response.set_signed_cookie(
+                STICKY_COOKIE, '1', salt=STICKY_COOKIE_SALT, max_age=sticky_seconds, httponly=True, samesite='Lax'
+            )
+        return response
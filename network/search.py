@@ -0,0 +1,138 @@
+""" Full-text search over the content of the posts.
+
+    On SQLite the posts are indexed in an FTS5 table, network_post_search, whose rowid is
+    the post id. The index is kept in sync incrementally: index indexes a new post,
+    handleSaveNewPostContent re-indexes an edited one and a deleted post is dropped by
+    signals.py. Results are ranked by bm25, best match first, and paginated by a keyset
+    cursor over (rank, post id). Ranking scores every post matching the query before the
+    page is cut, so a page costs in proportion to the number of matches, not to its size:
+    a common term over a big site is slow, whichever page is read. Terms are whole words;
+    the last one is only read as the beginning of a word (prefix=1, for type-ahead) when
+    asked for, since a short prefix matches far more posts.
+
+    Other backends, and an SQLite built without FTS5, fall back to requiring each term
+    with icontains, newest first, with the cursors of the feeds. That scans the posts
+    table, which is fine for a small site only. """
+import base64
+import binascii
+import functools
+import json
+import re
+import sqlite3
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Post
+from . import pagination
+
+
+SEARCH_TABLE = 'network_post_search'
+# the terms after these are ignored
+MAX_TERMS = 10
+
+
+@functools.cache
+def _sqliteHasFts5():
+    with sqlite3.connect(':memory:') as probe:
+        return any(option == 'ENABLE_FTS5' for option, in probe.execute('PRAGMA compile_options'))
+
+
+def _usesFts(connection):
+    return connection.vendor == 'sqlite' and _sqliteHasFts5()
+
+
+def terms(query):
+    """ the words of a search query, the punctuation and FTS5 operators are dropped """
+    return re.findall(r'\w+', query)[:MAX_TERMS]
+
+
+def _matchExpression(query_terms, prefix):
+    """ every term is required, with prefix the last one may be the beginning of a word
+        still being typed """
+    return ' '.join(f'"{term}"' for term in query_terms) + ('*' if prefix else '')
+
+
+def _encodeCursor(rank, post_id):
+    raw = json.dumps([rank, post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decodeCursor(cursor):
+    """ returns the (rank, post id) stored in a cursor """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        rank, post_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise pagination.InvalidCursor(cursor)
+
+    if not isinstance(rank, (int, float)) or not isinstance(post_id, int):
+        raise pagination.InvalidCursor(cursor)
+    return rank, post_id
+
+
+def indexPost(post):
+    """ (re-)indexes the content of a new or edited post """
+    connection = connections[router.db_for_write(Post)]
+    if not _usesFts(connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'REPLACE INTO {SEARCH_TABLE} (rowid, content) VALUES (%s, %s)', [post.id, post.content])
+
+
+def unindexPost(post_id):
+    connection = connections[router.db_for_write(Post)]
+    if not _usesFts(connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuildIndex():
+    """ re-indexes every post, after posts were written without the views (bulk_create) """
+    connection = connections[router.db_for_write(Post)]
+    if not _usesFts(connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(f'INSERT INTO {SEARCH_TABLE} (rowid, content) SELECT id, content FROM {Post._meta.db_table}')
+
+
+def findPosts(query, cursor, perPage, prefix=False):
+    """ returns the CursorPage of the ids of the posts matching query, best match first,
+        that starts right after cursor (empty for the first page). Only next cursors are
+        handed out. Raises InvalidCursor for a malformed one """
+    query_terms = terms(query)
+    connection = connections[router.db_for_read(Post)]
+
+    if not _usesFts(connection):
+        return _findPostsWithoutIndex(query_terms, cursor, perPage)
+
+    sql = f'SELECT rowid, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    params = [_matchExpression(query_terms, prefix)]
+
+    if cursor:
+        # bm25 ranks are negative, the best match has the lowest
+        rank, post_id = _decodeCursor(cursor)
+        sql += ' AND (rank > %s OR (rank = %s AND rowid < %s))'
+        params += [rank, rank, post_id]
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql + ' ORDER BY rank, rowid DESC LIMIT %s', params + [perPage + 1])
+        rows = db_cursor.fetchall()
+
+    hasNext = len(rows) > perPage
+    rows = rows[:perPage]
+    nextCursor = _encodeCursor(rows[-1][1], rows[-1][0]) if hasNext else None
+    return pagination.CursorPage([post_id for post_id, _ in rows], hasNext, bool(cursor), nextCursor, None)
+
+
+def _findPostsWithoutIndex(query_terms, cursor, perPage):
+    posts = Post.objects.filter(*(Q(content__icontains=term) for term in query_terms)).only('id', 'timestamp')
+    page = pagination.cursorPaginate(posts, cursor, perPage)
+    return pagination.CursorPage(
+        [post.id for post in page.object_list], page.hasNext, page.hasPrevious, page.nextCursor, page.prevCursor
+    )
@@ -0,0 +1,63 @@
+""" Serialization of whole pages of posts in a constant number of queries """
+from django.db.models import QuerySet, prefetch_related_objects
+
+from .instrumentation import timed
+from .models import Post, Like
+
+
+def _loadPosts(posts):
+    """ returns a list of Post objects, with their posters, given a queryset,
+        a list of Post objects or a list of post ids (kept in the given order) """
+    if isinstance(posts, QuerySet):
+        return list(posts.select_related('poster'))
+
+    posts = list(posts)
+    if posts and not isinstance(posts[0], Post):
+        posts_by_id = Post.objects.select_related('poster').in_bulk(posts)
+        return [posts_by_id[post_id] for post_id in posts if post_id in posts_by_id]
+
+    # posters already loaded by select_related are not fetched again
+    prefetch_related_objects(posts, 'poster')
+    return posts
+
+
+def serializePosts(posts, includeLikes=True):
+    """ Same output as [post.serialize() for post in posts], but with one query for
+        the posts and their posters and one for the likes of the whole page.
+        Without includeLikes the 'likes' lists, and their query, are left out """
+    with timed('serialize'):
+        return _serializePosts(posts, includeLikes)
+
+
+def _serializePosts(posts, includeLikes):
+    posts = _loadPosts(posts)
+    likes = Like.objects.filter(post_id__in=[post.id for post in posts]).order_by('id') if includeLikes else None
+    return _serializeLoadedPosts(posts, likes)
+
+
+async def aserializePosts(posts, includeLikes=True):
+    """ serializePosts for async views, given a queryset or a list of Post objects
+        whose posters are already loaded """
+    with timed('serialize'):
+        if isinstance(posts, QuerySet):
+            posts = [post async for post in posts.select_related('poster')]
+
+        likes = None
+        if includeLikes:
+            likes = [like async for like in Like.objects.filter(post_id__in=[post.id for post in posts]).order_by('id')]
+        return _serializeLoadedPosts(posts, likes)
+
+
+def _serializeLoadedPosts(posts, likes):
+    """ likes are the likes of the posts, None to leave out the 'likes' lists """
+    if likes is None:
+        serialized_posts = [post.serialize(likes=[]) for post in posts]
+        for serialized_post in serialized_posts:
+            del serialized_post['likes']
+        return serialized_posts
+
+    likes_by_post = {post.id: [] for post in posts}
+    for like in likes:
+        likes_by_post[like.post_id].append(like)
+
+    return [post.serialize(likes=likes_by_post[post.id]) for post in posts]
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User, Follower, Post
+from . import feedCache, graph, postCounts, search, userCache
+
+
+@receiver(post_save, sender=Follower)
+def addToFollowerGraph(sender, instance, created, **kwargs):
+    if created:
+        graph.followChanged(instance.user_follower_id, instance.user_being_followed_id, True)
+
+
+@receiver(post_delete, sender=Follower)
+def removeFromFollowerGraph(sender, instance, **kwargs):
+    graph.followChanged(instance.user_follower_id, instance.user_being_followed_id, False)
+
+
+@receiver(post_delete, sender=Post)
+def invalidateFeedCache(sender, **kwargs):
+    # new posts, edits and likes bump the version from the views, deletes have no view
+    feedCache.bumpFeedVersion()
+
+
+@receiver(post_delete, sender=Post)
+def unindexPost(sender, instance, **kwargs):
+    search.unindexPost(instance.id)
+
+
+@receiver(post_delete, sender=Post)
+def countDeletedPost(sender, instance, **kwargs):
+    postCounts.postDeleted(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidateCachedUser(sender, instance, **kwargs):
+    userCache.invalidate(instance.id)
@@ -0,0 +1,107 @@
+/* MESSAGEPACK DECODING OF THE API RESPONSES */
+// the formats the API can answer in, MessagePack first (see network/renderers.py)
+const API_ACCEPT = 'application/msgpack, application/json;q=0.9';
+
+function decodeMsgpack(arrayBuffer) {
+	/* decodes the MessagePack types the server sends: nil, booleans, numbers, strings, binaries, arrays and maps */
+	const view = new DataView(arrayBuffer);
+	const bytes = new Uint8Array(arrayBuffer);
+	const textDecoder = new TextDecoder();
+	let offset = 0;
+
+	function readString(length) {
+		const string = textDecoder.decode(bytes.subarray(offset, offset + length));
+		offset += length;
+		return string;
+	}
+
+	function readBinary(length) {
+		const binary = bytes.slice(offset, offset + length);
+		offset += length;
+		return binary;
+	}
+
+	function readArray(length) {
+		const array = [];
+		for (let i = 0; i < length; i++)
+			array.push(read());
+		return array;
+	}
+
+	function readMap(length) {
+		const map = {};
+		for (let i = 0; i < length; i++) {
+			const key = read();
+			map[key] = read();
+		}
+		return map;
+	}
+
+	function readUint(size) {
+		let value;
+		if (size === 1) value = view.getUint8(offset);
+		else if (size === 2) value = view.getUint16(offset);
+		else if (size === 4) value = view.getUint32(offset);
+		else value = Number(view.getBigUint64(offset));
+		offset += size;
+		return value;
+	}
+
+	function readInt(size) {
+		let value;
+		if (size === 1) value = view.getInt8(offset);
+		else if (size === 2) value = view.getInt16(offset);
+		else if (size === 4) value = view.getInt32(offset);
+		else value = Number(view.getBigInt64(offset));
+		offset += size;
+		return value;
+	}
+
+	function read() {
+		const type = bytes[offset++];
+
+		if (type <= 0x7f) return type;
+		if (type >= 0xe0) return type - 0x100;
+		if ((type & 0xf0) === 0x80) return readMap(type & 0x0f);
+		if ((type & 0xf0) === 0x90) return readArray(type & 0x0f);
+		if ((type & 0xe0) === 0xa0) return readString(type & 0x1f);
+
+		switch (type) {
+			case 0xc0: return null;
+			case 0xc2: return false;
+			case 0xc3: return true;
+			case 0xc4: return readBinary(readUint(1));
+			case 0xc5: return readBinary(readUint(2));
+			case 0xc6: return readBinary(readUint(4));
+			case 0xca: { const value = view.getFloat32(offset); offset += 4; return value; }
+			case 0xcb: { const value = view.getFloat64(offset); offset += 8; return value; }
+			case 0xcc: return readUint(1);
+			case 0xcd: return readUint(2);
+			case 0xce: return readUint(4);
+			case 0xcf: return readUint(8);
+			case 0xd0: return readInt(1);
+			case 0xd1: return readInt(2);
+			case 0xd2: return readInt(4);
+			case 0xd3: return readInt(8);
+			case 0xd9: return readString(readUint(1));
+			case 0xda: return readString(readUint(2));
+			case 0xdb: return readString(readUint(4));
+			case 0xdc: return readArray(readUint(2));
+			case 0xdd: return readArray(readUint(4));
+			case 0xde: return readMap(readUint(2));
+			case 0xdf: return readMap(readUint(4));
+		}
+		throw `Unsupported MessagePack type 0x${type.toString(16)}`;
+	}
+
+	return read();
+}
+
+function readApiResponse(response) {
+	/* the body of an API response, in whichever format the server picked */
+	const contentType = response.headers.get('Content-Type') || '';
+
+	if (contentType.startsWith('application/msgpack'))
+		return response.arrayBuffer().then(decodeMsgpack);
+	return response.json();
+}
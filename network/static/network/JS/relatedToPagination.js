@@ -22,7 +22,8 @@ function handlePaginationByNumbers() {
 
 function handlePaginateToPreviousPage() {
 	currentNavigationPage--;
-	navigateTo(currentNavigationPage);
+	// previousPageCursor is from 'relatedToPosts.js'
+	navigateTo(currentNavigationPage, previousPageCursor);
 
 	deactivateAllFromPagination('.page-item');
 	markAsActiveForPagination(currentNavigationPage);
@@ -30,15 +31,16 @@ function handlePaginateToPreviousPage() {
 
 function handlePaginateToNextPage() {
 	currentNavigationPage++;
-	navigateTo(currentNavigationPage);
+	// nextPageCursor is from 'relatedToPosts.js'
+	navigateTo(currentNavigationPage, nextPageCursor);
 
 	deactivateAllFromPagination('.page-item');
 	markAsActiveForPagination(currentNavigationPage);
 }
 
-function navigateTo(pageNumber) {
+function navigateTo(pageNumber, cursor = null) {
 	// fetchPostsPage is from 'relatedToPosts.js'
-	fetchPostsPage(pageNumber);
+	fetchPostsPage(pageNumber, cursor);
 	currentNavigationPage = pageNumber;
 	goToTheTop();
 }
@@ -1,97 +1,146 @@
 /* JAVASCRIPT RELATED TO POSTS STUFF */
-function fetchPostsPage(pageNumber) {
-	let fetchPromise;
-
+// opaque keyset cursors around the current page, given by the server
+var nextPageCursor = null;
+var previousPageCursor = null;
+// pages already downloaded and their ETag, revalidated with 'If-None-Match'
+const postsPagesCache = new Map();
+// the posts on screen by id, kept up to date by the server-sent events
+const displayedPosts = new Map();
+var currentPagePostsCount = 0;
+var currentPageHasNext = false;
+
+function postsPageUrl(pageNumber) {
 	try {
-		// fetch posts for profile page, global variable 'profileId' from django
-		fetchPromise = fetch(`/getPostsProfilePage/${profileId}/${pageNumber}`);
+		// posts for profile page, global variable 'profileId' from django
+		return `/getPostsProfilePage/${profileId}/${pageNumber}`;
 	} catch(err) {
 		if (err.name === 'ReferenceError') {
 			// If the 'profileId' wasn't defined it means we're on another page, given a template page name
-			fetchPromise = fetch(`/getPostsPage/${templatePageName}/${pageNumber}`);
-		} else {
-			console.log(err);
+			return `/getPostsPage/${templatePageName}/${pageNumber}`;
 		}
+		throw err;
 	}
+}
+
+function fetchPostsPage(pageNumber, cursor = null) {
+	/* with a cursor the server reads the page by keyset, which costs the same for any page */
+	// the full list of likes of each post isn't needed, just its number
+	let url = `${postsPageUrl(pageNumber)}?includeLikes=0`;
 
-	fetchPromise
-	.then(response => response.json())
+	if (cursor !== null)
+		url += `&cursor=${encodeURIComponent(cursor)}`;
+
+	fetchRevalidatingPostsPage(url)
 	.then(postsPage => {
 		generatePosts(postsPage.currentPagePosts);
 
+		nextPageCursor = postsPage.nextCursor;
+		previousPageCursor = postsPage.prevCursor;
+		currentPageHasNext = postsPage.hasNext;
+
 		handleHideShowNavigationButton(postsPage.hasPrevious, 'previousPage');
 		handleHideShowNavigationButton(postsPage.hasNext, 'nextPage');
 	})
 	.catch(err => console.log(err));
 }
 
+function fetchRevalidatingPostsPage(url) {
+	/* sends the ETag of the copy we already have, an unchanged page comes back as an empty 304 */
+	const cachedPage = postsPagesCache.get(url);
+	const headers = { 'Accept': API_ACCEPT };
+
+	if (cachedPage !== undefined)
+		headers['If-None-Match'] = cachedPage.etag;
+
+	// 'no-store' keeps the browser from answering the 304 for us
+	return fetch(url, { headers: headers, cache: 'no-store' })
+	.then(response => {
+		if (response.status === 304)
+			return structuredClone(cachedPage.postsPage);
+
+		return readApiResponse(response).then(postsPage => {
+			const etag = response.headers.get('ETag');
+
+			if (response.ok && etag !== null)
+				postsPagesCache.set(url, { etag: etag, postsPage: structuredClone(postsPage) });
+			return postsPage;
+		});
+	});
+}
+
 function generatePosts(currentPagePostsData) {
 	const postsContainer = document.querySelector('#postsWrapper');
 	
 	postsContainer.innerHTML = '';
-	currentPagePostsData.forEach(postData => {
-		const post = document.createElement('div');
-		
-		post.setAttribute('class', 'post');
-		post.setAttribute('id', `post${postData.id}`);
-		post.innerHTML = `
-			<h3>
-				<a href="/profile/${postData.poster.id}">${postData.poster.username}</a> says
-			</h3>
-			<div class="contentContainer">
-				<p>${postData.content}</p>
-				<p class="timestamp">${postData.timestamp}</p>
+	displayedPosts.clear();
+	currentPagePostsData.forEach(postData => postsContainer.append(generatePost(postData)));
+	currentPagePostsCount = currentPagePostsData.length;
+}
+
+function generatePost(postData) {
+	/* returns the element of a post, the like and edit icons wired */
+	const post = document.createElement('div');
+	displayedPosts.set(postData.id, postData);
+	
+	post.setAttribute('class', 'post');
+	post.setAttribute('id', `post${postData.id}`);
+	post.innerHTML = `
+		<h3>
+			<a href="/profile/${postData.poster.id}">${postData.poster.username}</a> says
+		</h3>
+		<div class="contentContainer">
+			<p>${postData.content}</p>
+			<p class="timestamp">${formatTimestamp(postData.timestamp)}</p>
+		</div>
+		<div class="icons">
+			<div class="likeContainer">
 			</div>
-			<div class="icons">
-				<div class="likeContainer">
-				</div>
 
-				<div class="actionsContainer">
-				</div>
+			<div class="actionsContainer">
 			</div>
-		`;
+		</div>
+	`;
+	
+	if (isUserAuthenticated) {
+		const likeIcon = generateIcon('likeIcon', postData.id);
 		
-		if (isUserAuthenticated) {
-			const likeIcon = generateIcon('likeIcon', postData.id);
-			
-			if (postData.does_current_visitor_like_this_post) {
-				// global icon source variables
-				likeIcon.setAttribute('src', solidHeartIconSource);
-			} else {
-				likeIcon.setAttribute('src', openHeartIconSource);
-			}
+		if (postData.does_current_visitor_like_this_post) {
+			// global icon source variables
+			likeIcon.setAttribute('src', solidHeartIconSource);
+		} else {
+			likeIcon.setAttribute('src', openHeartIconSource);
+		}
 
-			const likeContainer = post.querySelector('.likeContainer');
-			likeContainer.append(likeIcon);
-			
-			const numLikes = document.createElement('strong');
-			numLikes.setAttribute('class', 'numLikes');
-			numLikes.innerHTML = postData.number_likes;
+		const likeContainer = post.querySelector('.likeContainer');
+		likeContainer.append(likeIcon);
+		
+		const numLikes = document.createElement('strong');
+		numLikes.setAttribute('class', 'numLikes');
+		numLikes.innerHTML = postData.number_likes;
 
-			likeContainer.append(numLikes);
+		likeContainer.append(numLikes);
 
-			// add the event handler when the like icon is available
-			observeElementResolveWhenAvailable(`#likeIcon${postData.id}`)
-			.then(likeIcon => likeIcon.onclick = () => handleLikeDislike(postData))
-			.catch(err => console.log(err));
-		} else {
-			post.querySelector('.likeContainer').innerHTML += `
-				Likes <strong class="numLikes">${postData.number_likes}</strong>
-			`;
-		}
+		// add the event handler when the like icon is available
+		observeElementResolveWhenAvailable(`#likeIcon${postData.id}`)
+		.then(likeIcon => likeIcon.onclick = () => handleLikeDislike(postData))
+		.catch(err => console.log(err));
+	} else {
+		post.querySelector('.likeContainer').innerHTML += `
+			Likes <strong class="numLikes">${postData.number_likes}</strong>
+		`;
+	}
 
 
-		if (isUserAuthenticated && isUserThePoster(postData.poster)) {
-			const editIcon = generateIcon('editIcon', postData.id);
+	if (isUserAuthenticated && isUserThePoster(postData.poster)) {
+		const editIcon = generateIcon('editIcon', postData.id);
 
-			// global icon source variable
-			editIcon.setAttribute('src', editIconSource);
-			editIcon.addEventListener('click', () => handleEditPost(postData));
-			post.querySelector('.actionsContainer').append(editIcon);
-		}
+		// global icon source variable
+		editIcon.setAttribute('src', editIconSource);
+		editIcon.addEventListener('click', () => handleEditPost(postData));
+		post.querySelector('.actionsContainer').append(editIcon);
+	}
 
-		postsContainer.append(post);
-	});
+	return post;
 }
 
 function handleHideShowNavigationButton(hasThisPage, navigationButtonId) {
@@ -143,7 +192,7 @@ function handleLikeDislike(postData) {
 	
 	postData.does_current_visitor_like_this_post = ! postData.does_current_visitor_like_this_post;
 
-	fetch(`/handleLikeDislike/${postData.id}`, {
+	fetch(`/handleLikeDislike/${postData.id}?includeLikes=0`, {
 		method: 'PUT',
 		body: JSON.stringify({
 			does_current_visitor_like_this_post: postData.does_current_visitor_like_this_post,
@@ -151,10 +200,11 @@ function handleLikeDislike(postData) {
 		}),
 		headers: {
 			// getCookie from utility functions
-			'X-CSRFToken': getCookie('csrftoken')
+			'X-CSRFToken': getCookie('csrftoken'),
+			'Accept': API_ACCEPT
 		}
 	})
-	.then(response => response.json())
+	.then(readApiResponse)
 	.then(data => {
 		const post = document.querySelector(`#post${data.id}`);
 		post.querySelector('.numLikes').innerHTML = data.number_likes;
@@ -206,23 +256,24 @@ function handleSaveNewPostContent(postData) {
 	const post = document.querySelector(`#post${postData.id}`);
 	const newContent = post.querySelector(`#editArea${postData.id}`).value;
 
-	fetch(`/handleSaveNewPostContent/${postData.id}`, {
+	fetch(`/handleSaveNewPostContent/${postData.id}?includeLikes=0`, {
 		method: 'PUT',
 		body: JSON.stringify({
 			newContent: newContent
 		}),
 		headers: {
 			// getCookie from utility functions
-			'X-CSRFToken': getCookie('csrftoken')
+			'X-CSRFToken': getCookie('csrftoken'),
+			'Accept': API_ACCEPT
 		}
 	})
-	.then(response => response.json())
+	.then(readApiResponse)
 	.then(data => {
 		console.log(data);
 
 		post.querySelector('.contentContainer').innerHTML = `<p>${newContent}</p>`;
 
-		post.querySelector('.contentContainer').innerHTML += `<p class="timestamp">${data.timestamp}</p>`;
+		post.querySelector('.contentContainer').innerHTML += `<p class="timestamp">${formatTimestamp(data.timestamp)}</p>`;
 
 		const editIcon = post.querySelector(`#editIcon${postData.id}`);
 		editIcon.style.display = 'block';
@@ -236,7 +287,7 @@ function handleCancelEditPost(postData, editIcon) {
 	const post = document.querySelector(`#post${postData.id}`);
 	const contentContainer = post.querySelector('.contentContainer');
 	const postContent = contentContainer.querySelector(`#editArea${postData.id}`).innerHTML;
-	const postTimestamp = `<p class="timestamp">${postData.timestamp}</p>`;
+	const postTimestamp = `<p class="timestamp">${formatTimestamp(postData.timestamp)}</p>`;
 	
 	contentContainer.innerHTML = `<p>${postContent}</p>`;
 	contentContainer.innerHTML += postTimestamp;
@@ -249,3 +300,77 @@ function handleCancelEditPost(postData, editIcon) {
 function isUserThePoster(poster) {
 	return poster.username === userUsername;
 }
+
+
+/* LIVE UPDATES, server-sent events of network/events.py */
+document.addEventListener('DOMContentLoaded', function() {
+	if (typeof EventSource === 'undefined')
+		return;
+
+	// outside ASGI the server answers 204 and EventSource doesn't reconnect
+	const liveEvents = new EventSource('/events');
+
+	liveEvents.addEventListener('newPost', event => handleLiveNewPost(JSON.parse(event.data)));
+	liveEvents.addEventListener('postEdited', event => handleLivePostEdited(JSON.parse(event.data)));
+	liveEvents.addEventListener('likeCountChanged', event => handleLiveLikeCount(JSON.parse(event.data)));
+	// the server dropped events we were too slow to read, the page is read again
+	liveEvents.addEventListener('resync', () => fetchPostsPage(currentNavigationPage));
+});
+
+function showsNewPostsOf(poster) {
+	/* only the first page of the index and of the poster's profile shows a new post right
+	   away, the following page can't tell whether the visitor follows the poster */
+	if (currentNavigationPage != 1)
+		return false;
+
+	try {
+		// global variable 'profileId' from django, on the profile page
+		return profileId == poster.id;
+	} catch(err) {
+		if (err.name === 'ReferenceError')
+			return templatePageName === 'index';
+		throw err;
+	}
+}
+
+function handleLiveNewPost(postData) {
+	if (displayedPosts.has(postData.id) || !showsNewPostsOf(postData.poster))
+		return;
+
+	const postsContainer = document.querySelector('#postsWrapper');
+	postData.does_current_visitor_like_this_post = false;
+	postsContainer.prepend(generatePost(postData));
+
+	// a full page keeps its size, its last post moves to the next page
+	if (currentPageHasNext && postsContainer.children.length > currentPagePostsCount) {
+		const lastPost = postsContainer.lastElementChild;
+		displayedPosts.delete(Number(lastPost.id.replace('post', '')));
+		lastPost.remove();
+	}
+}
+
+function handleLivePostEdited(data) {
+	const postData = displayedPosts.get(data.id);
+	if (postData === undefined)
+		return;
+
+	postData.content = data.content;
+	postData.timestamp = data.timestamp;
+
+	const contentContainer = document.querySelector(`#post${data.id} .contentContainer`);
+	// not while the visitor is editing it
+	if (contentContainer.querySelector(`#editArea${data.id}`) !== null)
+		return;
+
+	contentContainer.querySelector('p').textContent = data.content;
+	contentContainer.querySelector('.timestamp').innerHTML = formatTimestamp(data.timestamp);
+}
+
+function handleLiveLikeCount(data) {
+	const postData = displayedPosts.get(data.id);
+	if (postData === undefined)
+		return;
+
+	postData.number_likes = data.number_likes;
+	document.querySelector(`#post${data.id} .numLikes`).innerHTML = data.number_likes;
+}
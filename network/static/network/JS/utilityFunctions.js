@@ -27,4 +27,13 @@ function convertPythonBooleanToJsBoolean(input) {
 	} catch(err) {
 		console.log(`Error: ${err}`);
 	}
-}
\ No newline at end of file
+}
+
+function formatTimestamp(isoTimestamp) {
+	/* the API sends ISO 8601 timestamps, shown like 'Oct 18 2026, 09:22 PM' in the visitor's time zone */
+	const date = new Date(isoTimestamp);
+	const day = date.toLocaleDateString('en-US', { month: 'short', day: '2-digit', year: 'numeric' }).replace(',', '');
+	const time = date.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' });
+
+	return `${day}, ${time}`;
+}
@@ -0,0 +1,182 @@
+""" Fingerprinted, bundled and precompressed static files.
+
+    BundlingManifestStaticFilesStorage is the staticfiles storage. At collectstatic time it
+    concatenates the scripts of each page into one bundle (settings.NETWORK_STATIC_BUNDLES),
+    hashes every file name through the manifest of ManifestStaticFilesStorage and writes a
+    gzip (and, with the brotli package installed, a brotli) variant of each text file.
+    The scriptBundle template tag (templatetags/bundles.py) loads a page's bundle, or its
+    separate scripts in development and the tests.
+
+    StaticFilesMiddleware serves the collected files from STATIC_ROOT, picking the
+    precompressed variant the browser accepts. The fingerprinted names never change content,
+    so they are cached for a year as immutable, and the browser doesn't revalidate them on
+    every navigation. Enabled by settings.NETWORK_SERVE_STATIC. """
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+BUNDLES_DIR = 'network/JS/bundles'
+COMPRESSED_EXTENSIONS = ('.js', '.css', '.map', '.svg', '.json', '.txt', '.html', '.xml')
+# a variant is only written when it saves at least this fraction of the file
+MIN_COMPRESSION_SAVING = 0.05
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATED_CACHE_CONTROL = 'no-cache'
+
+
+def bundles():
+    """ {bundle name: [static paths of its scripts, in order]} """
+    return getattr(settings, 'NETWORK_STATIC_BUNDLES', {})
+
+
+def bundlePath(name):
+    return f'{BUNDLES_DIR}/{name}.js'
+
+
+def _hashedFiles():
+    """ {path: fingerprinted path} of the manifest written by collectstatic """
+    return getattr(staticfiles_storage, 'hashed_files', {})
+
+
+def pageScripts(name):
+    """ the static paths of the scripts of page name: its bundle once collected, its
+        separate scripts before collectstatic and while DEBUG, when runserver serves
+        the source files """
+    bundle_path = bundlePath(name)
+    if not settings.DEBUG and staticfiles_storage.hash_key(bundle_path) in _hashedFiles():
+        return [bundle_path]
+    return bundles()[name]
+
+
+class BundlingManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # without a manifest (collectstatic never ran) the files are served by their names
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name, scripts in bundles().items():
+                path = bundlePath(name)
+                self._writeBundle(path, scripts)
+                paths[path] = (self, path)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        if not dry_run:
+            for hashed_path in set(self.hashed_files.values()):
+                self._writeCompressed(hashed_path)
+
+    def _writeBundle(self, path, scripts):
+        sources = []
+        for script in scripts:
+            with self.open(script) as f:
+                sources.append(f'/* {script} */\n' + f.read().decode())
+
+        if self.exists(path):
+            self.delete(path)
+        # the empty statement keeps a file not ending with a semicolon from running into the next
+        self._save(path, ContentFile('\n;\n'.join(sources).encode()))
+
+    def _writeCompressed(self, path):
+        if not path.endswith(COMPRESSED_EXTENSIONS):
+            return
+
+        with self.open(path) as f:
+            content = f.read()
+
+        variants = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+        for suffix, compress in variants:
+            compressed = compress(content)
+            if len(compressed) <= len(content) * (1 - MIN_COMPRESSION_SAVING):
+                if self.exists(path + suffix):
+                    self.delete(path + suffix)
+                self._save(path + suffix, ContentFile(compressed))
+
+
+class StaticFilesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    # the precompressed variants, best first
+    ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NETWORK_SERVE_STATIC', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.hashed_paths = set(_hashedFiles().values())
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+
+        response = self.serve(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def _acall(self, request):
+        # serve() only stats and opens a file for the static URLs, the other requests
+        # go on without a hop to a thread
+        response = self.serve(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def _encoding(self, request, file_path):
+        """ returns (encoding, path of its variant), (None, file_path) for the file itself """
+        accepted = {
+            encoding.split(';')[0].strip() for encoding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        for encoding, suffix in self.ENCODINGS:
+            if encoding in accepted and os.path.isfile(file_path + suffix):
+                return encoding, file_path + suffix
+        return None, file_path
+
+    def serve(self, request):
+        """ the response serving a collected static file, None when request isn't for one """
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(settings.STATIC_URL):
+            return None
+
+        path = posixpath.normpath(request.path[len(settings.STATIC_URL):]).lstrip('/')
+        try:
+            file_path = safe_join(settings.STATIC_ROOT, path)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(file_path):
+            return None
+
+        encoding, served_path = self._encoding(request, file_path)
+        content_type, _ = mimetypes.guess_type(path)
+
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if path in self.hashed_paths else REVALIDATED_CACHE_CONTROL
+        return response
@@ -0,0 +1,16 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from .. import staticFiles
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def scriptBundle(name):
+    """ the script tags of a page, see staticFiles.pageScripts """
+    return format_html_join(
+        '\n', '<script src="{}" type="text/javascript"></script>', ((static(script),) for script in staticFiles.pageScripts(name))
+    )
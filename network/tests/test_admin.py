@@ -0,0 +1,43 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import User, Post, Follower
+
+
+class TimelinesOfTheAdmin(TestCase):
+	def setUp(self):
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.follower = User.objects.create_user(username='follower', password='12345')
+		self.admin = User.objects.create_superuser(username='admin', password='12345')
+		self.post = Post.objects.create(poster=self.poster, content='older post')
+
+		self.client = Client()
+		self.client.force_login(self.admin)
+
+	def follow(self):
+		self.client.post(reverse('admin:network_follower_add'), {
+			'user_follower': self.follower.id, 'user_being_followed': self.poster.id
+		})
+		return Follower.objects.get(user_follower=self.follower)
+
+	def test_follow_is_backfilled_and_pruned(self):
+		follow = self.follow()
+		self.assertEqual(list(self.follower.timeline_entries.values_list('post_id', flat=True)), [self.post.id])
+
+		self.client.post(reverse('admin:network_follower_delete', args=[follow.id]), {'post': 'yes'})
+		self.assertFalse(Follower.objects.exists())
+		self.assertFalse(self.follower.timeline_entries.exists())
+
+	def test_bulk_delete_prunes(self):
+		follow = self.follow()
+		self.client.post(reverse('admin:network_follower_changelist'), {
+			'action': 'delete_selected', '_selected_action': [follow.id], 'post': 'yes'
+		})
+		self.assertFalse(self.follower.timeline_entries.exists())
+
+	def test_new_post_is_fanned_out(self):
+		self.follow()
+		self.client.post(reverse('admin:network_post_add'), {'poster': self.poster.id, 'content': 'from the admin', 'like_count': 0})
+
+		new_post = Post.objects.get(content='from the admin')
+		self.assertTrue(self.follower.timeline_entries.filter(post=new_post).exists())
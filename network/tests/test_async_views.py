@@ -0,0 +1,172 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, Client, AsyncClient, override_settings
+from django.urls import reverse
+
+import json
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from ..models import User, Follower, Post, Like
+from .. import benchmarking, counters, export
+from ..asgi import AsyncViewsASGIHandler
+
+
+@override_settings(ROOT_URLCONF='project4.asyncUrls')
+class AsyncApiViews(TestCase):
+	""" The async views answer exactly like the sync ones """
+	def setUp(self):
+		cache.clear()
+
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.visitor = User.objects.create_user(username='visitor', password='12345')
+		self.posts = [Post.objects.create(poster=self.poster, content=f'post {i}') for i in range(15)]
+		Like.objects.create(liker=self.visitor, post=self.posts[-1])
+
+		self.async_client = AsyncClient()
+		self.sync_client = Client()
+
+	async def login(self):
+		await self.async_client.aforce_login(self.visitor)
+		await self.sync_client.aforce_login(self.visitor)
+
+	async def assertSameAsSync(self, url, data=None):
+		from asgiref.sync import sync_to_async
+
+		response = await self.async_client.get(url, data)
+		# the sync views, through the regular url configuration and without the cached pages
+		with override_settings(ROOT_URLCONF='project4.urls'):
+			cache.clear()
+			sync_response = await sync_to_async(self.sync_client.get)(url, data)
+
+		self.assertEqual(response.status_code, sync_response.status_code)
+		self.assertEqual(response.json(), sync_response.json())
+		return response
+
+	def pageUrl(self, templatePageName='index', pageNumber=1):
+		return reverse('getPostsPageGivenTemplate', kwargs={'templatePageName': templatePageName, 'pageNumber': pageNumber})
+
+	async def test_get_posts_page(self):
+		await self.login()
+
+		response = await self.assertSameAsSync(self.pageUrl())
+		self.assertEqual(len(response.json()['currentPagePosts']), 10)
+		self.assertTrue(response.json()['currentPagePosts'][0]['does_current_visitor_like_this_post'])
+
+		second_page = await self.assertSameAsSync(self.pageUrl(pageNumber=2))
+		self.assertFalse(second_page.json()['hasNext'])
+		await self.assertSameAsSync(self.pageUrl(pageNumber=2), {'cursor': response.json()['nextCursor'], 'includeLikes': '0'})
+		await self.assertSameAsSync(reverse('getPostsPageGivenUserId', kwargs={'filterUserId': self.poster.id, 'pageNumber': 1}))
+
+	async def test_get_posts_page_errors(self):
+		self.assertEqual((await self.async_client.get(self.pageUrl(pageNumber=3))).status_code, 404)
+		self.assertEqual((await self.async_client.get(self.pageUrl('following'))).status_code, 403)
+		self.assertEqual((await self.async_client.get(self.pageUrl(), {'cursor': 'garbage'})).status_code, 400)
+
+	async def test_not_modified(self):
+		response = await self.async_client.get(self.pageUrl())
+		response = await self.async_client.get(self.pageUrl(), headers={'if-none-match': response['ETag']})
+
+		self.assertEqual(response.status_code, 304)
+
+	async def test_like_and_dislike(self):
+		await self.login()
+		url = reverse('handleLikeDislike', kwargs={'postId': self.posts[0].id})
+
+		response = await self.async_client.put(url, json.dumps({'does_current_visitor_like_this_post': True}))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()['number_likes'], 1)
+
+		response = await self.async_client.put(url, json.dumps({'does_current_visitor_like_this_post': True}))
+		self.assertEqual(response.status_code, 400)
+
+		response = await self.async_client.put(url, json.dumps({'does_current_visitor_like_this_post': False}))
+		self.assertEqual(response.json()['number_likes'], 0)
+		self.assertFalse(await Like.objects.filter(liker=self.visitor, post=self.posts[0]).aexists())
+
+	async def test_save_new_post_content(self):
+		url = reverse('handleSaveNewPostContent', kwargs={'postId': self.posts[0].id})
+
+		await self.login()
+		response = await self.async_client.put(url, json.dumps({'newContent': 'not mine'}))
+		self.assertEqual(response.status_code, 302)
+
+		await self.async_client.aforce_login(self.poster)
+		response = await self.async_client.put(url, json.dumps({'newContent': 'edited'}))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()['content'], 'edited')
+
+	async def test_save_keeps_a_like_taken_after_loading_the_post(self):
+		await self.async_client.aforce_login(self.poster)
+		save = Post.save
+
+		def likeThenSave(post, *args, **kwargs):
+			counters.incrementLikeCount(post, 1)
+			return save(post, *args, **kwargs)
+
+		with mock.patch.object(Post, 'save', likeThenSave):
+			await self.async_client.put(reverse('handleSaveNewPostContent', kwargs={'postId': self.posts[1].id}), json.dumps({'newContent': 'edited'}))
+		self.assertEqual((await Post.objects.aget(id=self.posts[1].id)).like_count, 1)
+
+	async def test_failed_save_is_logged(self):
+		await self.async_client.aforce_login(self.poster)
+
+		with mock.patch.object(Post, 'save', side_effect=RuntimeError('disk full')), \
+			 self.assertLogs('network.asyncViews', 'ERROR') as logs:
+			response = await self.async_client.put(
+				reverse('handleSaveNewPostContent', kwargs={'postId': self.posts[1].id}), json.dumps({'newContent': 'edited'})
+			)
+
+		self.assertEqual(response.status_code, 500)
+		self.assertIn('disk full', logs.output[0])
+
+	async def test_export_streams_from_an_async_iterator(self):
+		for url in (reverse('exportPosts'), reverse('exportProfilePosts', kwargs={'profileId': self.poster.id})):
+			response = await self.async_client.get(url)
+			# a sync iterator would be read whole into memory before the first byte is sent
+			self.assertTrue(response.is_async)
+
+			content = b''.join([chunk async for chunk in response.streaming_content])
+			with override_settings(ROOT_URLCONF='project4.urls'):
+				sync_content = await sync_to_async(lambda: b''.join(self.sync_client.get(url).streaming_content))()
+			self.assertEqual(content, sync_content)
+
+		self.assertEqual((await self.async_client.get(reverse('exportProfilePosts', kwargs={'profileId': 10 ** 6}))).status_code, 404)
+
+	async def test_async_export_reads_chunk_by_chunk(self):
+		with benchmarking.countFetchedRows() as fetched:
+			lines = export.andjsonLines(export.exportedPosts(), chunk_size=2)
+			await anext(lines)
+			self.assertEqual(fetched.rows, 2)
+			self.assertEqual(len([line async for line in lines]), len(self.posts) - 1)
+
+	async def test_follow_and_unfollow(self):
+		await self.login()
+		url = reverse('profilePage', kwargs={'profileId': self.poster.id})
+
+		response = await self.async_client.put(url, json.dumps({'visitor_is_following': True}))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual((await User.objects.aget(id=self.poster.id)).followers_count, 1)
+		self.assertEqual(await self.visitor.timeline_entries.acount(), 15)
+
+		response = await self.async_client.put(url, json.dumps({'visitor_is_following': False}))
+		self.assertEqual(response.status_code, 200)
+		self.assertFalse(await Follower.objects.aexists())
+
+		response = await self.async_client.put(url, json.dumps({'visitor_is_following': False}))
+		self.assertEqual(response.status_code, 400)
+
+		response = await self.async_client.get(url)
+		self.assertEqual(response.status_code, 200)
+
+
+# Django only logs the adaptations with DEBUG
+@override_settings(DEBUG=True, NETWORK_PERFORMANCE_INSTRUMENTATION=True, NETWORK_SERVE_STATIC=True)
+class AsgiMiddlewareChain(SimpleTestCase):
+	def test_the_middleware_chain_stays_async(self):
+		# a sync-only middleware would have every request hop to a worker thread, Django
+		# logs each adaptation of the chain around it
+		with self.assertNoLogs('django.request', 'DEBUG'):
+			application = AsyncViewsASGIHandler()
+		self.assertTrue(iscoroutinefunction(application._middleware_chain))
+
@@ -0,0 +1,173 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from io import StringIO
+
+from ..models import User, Post, Follower, Like
+from .. import feedCache
+
+
+class RecountCounters(TestCase):
+	def setUp(self):
+		self.poster = User.objects.create(username='poster')
+		self.likers = User.objects.bulk_create([User(username=f'liker{i}') for i in range(3)])
+
+		self.post = Post.objects.create(poster=self.poster, content='post with drifted counter')
+		Like.objects.bulk_create([Like(liker=liker, post=self.post) for liker in self.likers])
+		Follower.objects.bulk_create([
+			Follower(user_follower=liker, user_being_followed=self.poster) for liker in self.likers
+		])
+
+	def test_recount_fixes_drifted_like_count(self):
+		out = StringIO()
+		call_command('recount_counters', stdout=out)
+
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 3)
+		self.assertIn('like_count fixed on 1 post(s)', out.getvalue())
+
+	def test_recount_drops_the_cached_feed_pages(self):
+		version = feedCache.getFeedVersion()
+		call_command('recount_counters', stdout=StringIO())
+		self.assertNotEqual(feedCache.getFeedVersion(), version)
+
+		# nothing was wrong anymore
+		version = feedCache.getFeedVersion()
+		call_command('recount_counters', stdout=StringIO())
+		self.assertEqual(feedCache.getFeedVersion(), version)
+
+	def test_recount_fixes_drifted_follow_counts(self):
+		out = StringIO()
+		call_command('recount_counters', stdout=out)
+
+		self.poster.refresh_from_db()
+		self.assertEqual(self.poster.followers_count, 3)
+		self.assertEqual([User.objects.get(id=liker.id).following_count for liker in self.likers], [1, 1, 1])
+		self.assertIn('fixed on 4 user(s)', out.getvalue())
+
+	def test_recount_leaves_right_counters_alone(self):
+		call_command('recount_counters', stdout=StringIO())
+		out = StringIO()
+		call_command('recount_counters', stdout=out)
+
+		self.assertIn('like_count fixed on 0 post(s)', out.getvalue())
+		self.assertIn('fixed on 0 user(s)', out.getvalue())
+
+
+class RebuildTimelines(TestCase):
+	def test_delivers_the_posts_of_follows_written_without_fan_out(self):
+		poster, follower = User.objects.bulk_create([User(username='poster'), User(username='follower')])
+		Post.objects.bulk_create([Post(poster=poster, content=f'post {i}') for i in range(3)])
+		Follower.objects.bulk_create([Follower(user_follower=follower, user_being_followed=poster)])
+
+		out = StringIO()
+		call_command('rebuild_timelines', stdout=out)
+
+		self.assertEqual(follower.timeline_entries.count(), 3)
+		self.assertIn('3 timeline entries written', out.getvalue())
+
+
+class SeedNetwork(TestCase):
+	def seed(self, prefix, seed=1):
+		call_command(
+			'seed_network', users=30, posts=200, likes=300, seed=seed, prefix=prefix, chunk_size=50, stdout=StringIO()
+		)
+		users = User.objects.filter(username__startswith=f'{prefix}_').order_by('id')
+		return [(user.followers_count, user.following_count, user.posts.count()) for user in users]
+
+	def test_creates_a_consistent_network(self):
+		self.seed('a')
+
+		self.assertEqual(User.objects.count(), 30)
+		self.assertEqual(Post.objects.count(), 200)
+		self.assertTrue(Follower.objects.exists())
+		self.assertTrue(Like.objects.exists())
+		# the posts are spread over time, not all stamped with the same instant
+		self.assertGreater(Post.objects.values('timestamp').distinct().count(), 1)
+
+		out = StringIO()
+		call_command('recount_counters', stdout=out)
+		self.assertIn('like_count fixed on 0 post(s)', out.getvalue())
+		self.assertIn('fixed on 0 user(s)', out.getvalue())
+
+		for user in User.objects.all():
+			followed_posts = Post.objects.filter(poster__followers__user_follower=user).count()
+			self.assertEqual(user.timeline_entries.count(), followed_posts)
+
+	def test_is_deterministic_for_a_seed(self):
+		self.assertEqual(self.seed('a'), self.seed('b'))
+
+	def test_bad_seed_twice_with_the_same_prefix(self):
+		from django.core.management.base import CommandError
+
+		self.seed('a')
+		with self.assertRaises(CommandError):
+			self.seed('a')
+
+
+class BenchmarkEndpoints(TestCase):
+	def setUp(self):
+		call_command('seed_network', users=10, posts=30, likes=40, prefix='bench', stdout=StringIO())
+
+	def test_benchmarks_every_endpoint_and_rolls_back(self):
+		import json
+		import os
+		import tempfile
+
+		posts_before, likes_before = Post.objects.count(), Like.objects.count()
+		out = StringIO()
+
+		with tempfile.TemporaryDirectory() as directory:
+			baseline = os.path.join(directory, 'baseline.json')
+			call_command('benchmark_endpoints', iterations=2, warmup=0, baseline=baseline, save_baseline=True, stdout=out)
+
+			with open(baseline) as f:
+				results = json.load(f)
+
+		self.assertIn('handleLikeDislike[like/unlike]', results)
+		self.assertEqual(results['getPostsPageGivenTemplate[index page 1]']['statuses'], [200])
+		self.assertGreater(results['getPostsPageGivenTemplate[index page 1]']['queries'], 0)
+		self.assertEqual((Post.objects.count(), Like.objects.count()), (posts_before, likes_before))
+
+	def test_compare_with_baseline(self):
+		from ..benchmarking import compareWithBaseline, percentile
+
+		self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+		self.assertEqual(percentile([5, 1, 4, 2, 3], 99), 5)
+
+		baseline = {'a': {'p50_ms': 10, 'queries': 3}}
+		self.assertEqual(compareWithBaseline({'a': {'p50_ms': 12.5, 'queries': 3}}, baseline, 0.2), [])
+		self.assertEqual(
+			compareWithBaseline({'a': {'p50_ms': 10, 'queries': 4}}, baseline, 0.2),
+			['a: queries went from 3 to 4']
+		)
+
+
+class ExportPosts(TestCase):
+	def setUp(self):
+		self.poster = User.objects.create(username='poster')
+		self.other = User.objects.create(username='other')
+		self.posts = [Post.objects.create(poster=poster, content=f'post {i}') for i, poster in enumerate([self.poster, self.other] * 3)]
+
+	def test_export_to_stdout(self):
+		import json
+
+		out = StringIO()
+		call_command('export_posts', '--chunk-size', '2', stdout=out)
+
+		self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [post.id for post in self.posts])
+
+	def test_export_a_profile_to_a_file(self):
+		import json
+		import os
+		import tempfile
+
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'posts.ndjson')
+			call_command('export_posts', '--profile', str(self.poster.id), '--output', path, stdout=StringIO())
+
+			with open(path) as f:
+				lines = [json.loads(line) for line in f]
+
+		self.assertEqual([line['id'] for line in lines], [post.id for post in self.posts if post.poster == self.poster])
+		self.assertEqual(lines[0]['poster'], {'id': self.poster.id, 'username': 'poster'})
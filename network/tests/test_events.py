@@ -0,0 +1,180 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, AsyncClient, override_settings
+from django.urls import reverse
+
+import asyncio
+import contextlib
+import json
+import threading
+from unittest import mock
+
+from ..models import User, Post
+from .. import events
+
+
+def parseFrames(frames):
+	""" [(event, data)] of encoded server-sent events """
+	parsed = []
+	for frame in frames:
+		fields = dict(line.split(': ', 1) for line in frame.decode().strip().split('\n'))
+		parsed.append((fields['event'], json.loads(fields['data'])))
+	return parsed
+
+
+class Listener:
+	""" a subscription on its own event loop, like a stream of an ASGI server """
+	def __init__(self):
+		self.loop = asyncio.new_event_loop()
+		self.subscription = self.loop.run_until_complete(self._subscribe())
+
+	async def _subscribe(self):
+		return events.subscribe()
+
+	def received(self):
+		# runs the deliveries handed to the loop
+		self.loop.run_until_complete(asyncio.sleep(0))
+		frames = []
+		while not self.subscription.queue.empty():
+			frames.append(self.subscription.queue.get_nowait())
+		return parseFrames(frames)
+
+	def close(self):
+		events.unsubscribe(self.subscription)
+		self.loop.close()
+
+
+class PubSub(TestCase):
+	def setUp(self):
+		self.listener = Listener()
+		self.addCleanup(self.listener.close)
+
+	def test_every_subscriber_gets_the_events_of_any_thread(self):
+		other = Listener()
+		self.addCleanup(other.close)
+
+		publisher = threading.Thread(target=events.broadcast, args=('test', lambda: {'n': 1}))
+		publisher.start()
+		publisher.join()
+
+		self.assertEqual(self.listener.received(), [('test', {'n': 1})])
+		self.assertEqual(other.received(), [('test', {'n': 1})])
+
+	def test_payload_only_built_for_open_streams(self):
+		self.listener.close()
+		events.broadcast('test', lambda: self.fail('no stream is open'))
+
+	def test_rolled_back_writes_are_not_published(self):
+		with self.captureOnCommitCallbacks(execute=False):
+			events.publish('test', lambda: {})
+		self.assertEqual(self.listener.received(), [])
+
+	@override_settings(NETWORK_EVENTS_QUEUE_SIZE=3)
+	def test_slow_client_is_told_to_resync(self):
+		slow = Listener()
+		self.addCleanup(slow.close)
+
+		for i in range(4):
+			events.broadcast('test', lambda: {'n': i})
+		events.broadcast('test', lambda: {'n': 4})
+
+		self.assertEqual(slow.received(), [('resync', {}), ('test', {'n': 4})])
+		# the default queue of the other stream kept up
+		self.assertEqual(len(self.listener.received()), 5)
+
+
+class PublishingViews(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.post = Post.objects.create(poster=self.poster, content='first post')
+
+		self.client = Client()
+		self.client.force_login(self.poster)
+
+		self.listener = Listener()
+		self.addCleanup(self.listener.close)
+
+	def test_new_post(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.post(reverse('index'), {'newPostContent': 'live post'})
+
+		[(event, data)] = self.listener.received()
+		self.assertEqual(event, 'newPost')
+		self.assertEqual(data['content'], 'live post')
+		self.assertEqual(data['poster'], {'id': self.poster.id, 'username': 'poster'})
+		self.assertNotIn('likes', data)
+
+	def test_post_edited(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.put(reverse('handleSaveNewPostContent', kwargs={'postId': self.post.id}), json.dumps({'newContent': 'edited'}))
+
+		[(event, data)] = self.listener.received()
+		self.assertEqual((event, data['id'], data['content']), ('postEdited', self.post.id, 'edited'))
+
+	def test_like_count_changed(self):
+		url = reverse('handleLikeDislike', kwargs={'postId': self.post.id})
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.put(url, json.dumps({'does_current_visitor_like_this_post': True}))
+			self.client.put(url, json.dumps({'does_current_visitor_like_this_post': False}))
+			# refused, nothing changed
+			self.client.put(url, json.dumps({'does_current_visitor_like_this_post': False}))
+
+		self.assertEqual(self.listener.received(), [
+			('likeCountChanged', {'id': self.post.id, 'number_likes': 1}),
+			('likeCountChanged', {'id': self.post.id, 'number_likes': 0}),
+		])
+
+	def test_no_stream_without_asgi(self):
+		self.assertEqual(self.client.get(reverse('streamEvents')).status_code, 204)
+
+
+@override_settings(ROOT_URLCONF='project4.asyncUrls')
+class EventStream(TestCase):
+	def setUp(self):
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.post = Post.objects.create(poster=self.poster, content='first post')
+
+	async def disconnect(self, frames):
+		reading = asyncio.ensure_future(anext(frames))
+		await asyncio.sleep(0)
+		reading.cancel()
+		with contextlib.suppress(asyncio.CancelledError):
+			await reading
+
+	async def test_stream(self):
+		response = await AsyncClient().get(reverse('streamEvents'))
+		self.assertEqual(response['Content-Type'], 'text/event-stream')
+		self.assertEqual(response['Cache-Control'], 'no-cache')
+
+		frames = aiter(response.streaming_content)
+		self.assertEqual(await anext(frames), b'retry: 3000\n\n')
+
+		events.broadcast(events.LIKE_COUNT_CHANGED, lambda: {'id': self.post.id, 'number_likes': 3})
+		self.assertEqual(parseFrames([await anext(frames)]), [('likeCountChanged', {'id': self.post.id, 'number_likes': 3})])
+
+		# the client went away, the ASGI handler cancels the stream
+		await self.disconnect(frames)
+		self.assertFalse(events._subscribers)
+
+	@override_settings(NETWORK_EVENTS_KEEPALIVE=0.01)
+	async def test_keepalive(self):
+		response = await AsyncClient().get(reverse('streamEvents'))
+		frames = aiter(response.streaming_content)
+		await anext(frames)
+
+		self.assertEqual(await anext(frames), events.KEEPALIVE_FRAME)
+		await self.disconnect(frames)
+
+	async def test_async_like_is_published(self):
+		client = AsyncClient()
+		await client.aforce_login(self.poster)
+
+		response = await client.get(reverse('streamEvents'))
+		frames = aiter(response.streaming_content)
+		await anext(frames)
+
+		# the transaction of the test never commits
+		with mock.patch.object(events, 'publish', events.broadcast):
+			await client.put(reverse('handleLikeDislike', kwargs={'postId': self.post.id}), json.dumps({'does_current_visitor_like_this_post': True}))
+		self.assertEqual(parseFrames([await anext(frames)]), [('likeCountChanged', {'id': self.post.id, 'number_likes': 1})])
+		await self.disconnect(frames)
@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+import random
+
+from ..models import User, Follower
+from .. import graph
+
+
+class FollowerGraph(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.users = User.objects.bulk_create([User(username=f'user{i}') for i in range(5)])
+		self.a, self.b, self.c, self.d, self.e = self.users
+
+		for follower, followed in [(self.a, self.b), (self.a, self.c), (self.b, self.c), (self.d, self.c)]:
+			Follower.objects.create(user_follower=follower, user_being_followed=followed)
+
+	def test_answers_from_the_index(self):
+		follower_graph = graph.getGraph()
+
+		self.assertTrue(follower_graph.isFollowing(self.a.id, self.b.id))
+		self.assertFalse(follower_graph.isFollowing(self.b.id, self.a.id))
+		self.assertEqual(list(follower_graph.followersOf(self.c.id)), [self.a.id, self.b.id, self.d.id])
+		self.assertEqual(list(follower_graph.followeesOf(self.a.id)), [self.b.id, self.c.id])
+		self.assertEqual(follower_graph.countFollowers(self.c.id), 3)
+		self.assertEqual(follower_graph.countFollowing(self.e.id), 0)
+		# ids the graph has never seen
+		self.assertEqual(follower_graph.countFollowers(10 ** 6), 0)
+		self.assertFalse(follower_graph.isFollowing(10 ** 6, self.a.id))
+
+	def test_follows_are_applied_without_reading_the_table(self):
+		graph.getGraph()
+
+		with self.assertNumQueries(0):
+			graph.getGraph()
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Follower.objects.create(user_follower=self.e, user_being_followed=self.a)
+		with self.assertNumQueries(0):
+			self.assertTrue(graph.getGraph().isFollowing(self.e.id, self.a.id))
+			self.assertEqual(graph.getGraph().countFollowers(self.a.id), 1)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Follower.objects.filter(user_follower=self.e).delete()
+		with self.assertNumQueries(0):
+			self.assertFalse(graph.getGraph().isFollowing(self.e.id, self.a.id))
+
+	def test_another_process_replays_the_changes(self):
+		graph.getGraph()
+		with self.captureOnCommitCallbacks(execute=True):
+			Follower.objects.create(user_follower=self.e, user_being_followed=self.a)
+
+		# a process that only has the snapshot
+		graph._local_graph.update(version=None, changes=0, graph=None)
+		with self.assertNumQueries(0):
+			self.assertTrue(graph.getGraph().isFollowing(self.e.id, self.a.id))
+
+	def test_rolled_back_follow_is_not_applied(self):
+		graph.getGraph()
+		with self.captureOnCommitCallbacks(execute=False):
+			Follower.objects.create(user_follower=self.e, user_being_followed=self.a)
+
+		self.assertFalse(graph.getGraph().isFollowing(self.e.id, self.a.id))
+
+	def test_bulk_writes_rebuild_it(self):
+		graph.getGraph()
+		Follower.objects.bulk_create([Follower(user_follower=self.e, user_being_followed=self.b)])
+		graph.invalidate()
+
+		self.assertTrue(graph.getGraph().isFollowing(self.e.id, self.b.id))
+
+	def test_not_shared_through_a_cache_of_the_process(self):
+		self.assertFalse(graph.isShared())
+
+	def test_changes_give_the_graph_read_from_the_table(self):
+		rng = random.Random(6)
+		edges = {(rng.randrange(30), rng.randrange(30)) for _ in range(100)}
+		follower_graph = graph.FollowerGraph(list(edges))
+
+		for _ in range(5):
+			changes = [(rng.randrange(40), rng.randrange(40), rng.random() < 0.5) for _ in range(20)]
+			follower_graph = follower_graph.withChanges(changes)
+			for follower_id, followed_id, following in changes:
+				(edges.add if following else edges.discard)((follower_id, followed_id))
+
+			expected = graph.FollowerGraph(list(edges))
+			for user_id in range(41):
+				self.assertEqual(list(follower_graph.followeesOf(user_id)), list(expected.followeesOf(user_id)))
+				self.assertEqual(list(follower_graph.followersOf(user_id)), list(expected.followersOf(user_id)))
+				self.assertEqual(follower_graph.countFollowing(user_id), expected.countFollowing(user_id))
@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import json
+
+from ..models import User, Follower, Post
+from .. import postCounts
+
+
+class PostCounts(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.viewer = User.objects.create_user(username='viewer', password='12345')
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.client = Client()
+		self.client.force_login(self.poster)
+
+		self.viewer_client = Client()
+		self.viewer_client.force_login(self.viewer)
+		self.viewer_client.put(reverse('profilePage', kwargs={'profileId': self.poster.id}), json.dumps({'visitor_is_following': True}))
+
+	def newPosts(self, n):
+		# the counts are updated on commit
+		with self.captureOnCommitCallbacks(execute=True):
+			for i in range(n):
+				self.client.post(reverse('index'), {'newPostContent': f'post {i}'})
+
+	def pageRanges(self):
+		return (
+			list(self.client.get(reverse('index')).context['page_range']),
+			list(self.client.get(reverse('profilePage', kwargs={'profileId': self.poster.id})).context['page_range']),
+			list(self.viewer_client.get(reverse('followingPage')).context['page_range'])
+		)
+
+	def test_page_ranges_follow_creates_and_deletes(self):
+		self.assertEqual(self.pageRanges(), ([1], [1], [1]))
+
+		self.newPosts(11)
+		self.assertEqual(self.pageRanges(), ([1, 2], [1, 2], [1, 2]))
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Post.objects.filter(poster=self.poster).order_by('id').first().delete()
+		self.assertEqual(self.pageRanges(), ([1], [1], [1]))
+
+	def test_following_count_follows_unfollows(self):
+		self.newPosts(11)
+		self.assertEqual(self.pageRanges()[2], [1, 2])
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.viewer_client.put(reverse('profilePage', kwargs={'profileId': self.poster.id}), json.dumps({'visitor_is_following': False}))
+		self.assertEqual(self.pageRanges()[2], [1])
+
+	def test_cached_counts_do_not_touch_the_posts_table(self):
+		self.newPosts(3)
+		self.pageRanges()
+
+		for makeRequest in (
+			lambda: self.client.get(reverse('index')),
+			lambda: self.client.get(reverse('profilePage', kwargs={'profileId': self.poster.id})),
+			lambda: self.viewer_client.get(reverse('followingPage')),
+		):
+			with CaptureQueriesContext(connection) as captured:
+				makeRequest()
+
+			# the session, the user and the profile only
+			self.assertFalse([
+				query['sql'] for query in captured.captured_queries
+				if 'COUNT' in query['sql'] or 'network_post' in query['sql'] or 'network_timelineentry' in query['sql']
+			])
+
+	def test_reset_after_bulk_writes(self):
+		self.pageRanges()
+		Post.objects.bulk_create([Post(poster=self.poster, content=f'bulk {i}') for i in range(10)])
+		self.newPosts(1)
+		# the bulk insert is not counted
+		self.assertEqual(self.pageRanges()[0], [1])
+
+		postCounts.resetCounts()
+		self.assertEqual(self.pageRanges()[0], [1, 2])
@@ -0,0 +1,175 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import json
+
+from ..models import User, Follower, Post, Like
+from .. import counters, search, serializers, timeline
+
+
+# the most queries each view may run with cold caches, whatever the amount of likes and
+# follows (the session and the user are 2 of them). Raising one of these must be a
+# deliberate choice, never the side effect of an N+1
+QUERY_BUDGETS = {
+	'serializePosts': 2,
+	'getPostsPage index': 7,
+	'getPostsPage profile': 8,
+	'getPostsPage following': 7,
+	'handleLikeDislike': 9,
+	'handleSaveNewPostContent': 7,
+	'handleBatch': 10,
+	'searchPosts': 6,
+	'exportPosts': 3,
+	'exportProfilePosts': 4,
+	'ProfilePage.get': 5,
+	'ProfilePage.put': 10,
+	'followingPage': 3,
+}
+
+LIKES_PER_POST = [10, 100, 1000]
+FOLLOWEES = [10, 1000]
+
+
+def streamed(response):
+	""" reads a streaming response whole, so the queries of its rows are captured too """
+	b''.join(response.streaming_content)
+	return response
+
+
+class QueryBudgetTestCase(TestCase):
+	def setUp(self):
+		self.viewer = User.objects.create_user(username='viewer', password='12345')
+		self.client = Client()
+		self.client.force_login(self.viewer)
+
+	def createUsers(self, prefix, n):
+		return User.objects.bulk_create([User(username=f'{prefix}{i}') for i in range(n)])
+
+	def assertWithinBudget(self, name, makeRequest):
+		""" runs makeRequest with cold caches, so the budget holds for the first visitor too """
+		cache.clear()
+
+		with CaptureQueriesContext(connection) as captured:
+			response = makeRequest()
+
+		if response is not None:
+			self.assertLess(response.status_code, 400)
+
+		queries = '\n'.join(query['sql'] for query in captured.captured_queries)
+		self.assertLessEqual(
+			len(captured), QUERY_BUDGETS[name], f'{name} ran {len(captured)} queries:\n{queries}'
+		)
+
+
+class LikesDoNotGrowTheQueries(QueryBudgetTestCase):
+	""" a page of posts whose likes grow from 10 to 1000 per post """
+	def setUp(self):
+		super().setUp()
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.posts = Post.objects.bulk_create([Post(poster=self.poster, content=f'post {i}') for i in range(10)])
+		Follower.objects.create(user_follower=self.viewer, user_being_followed=self.poster)
+		Post.objects.create(poster=self.viewer, content='post of the viewer')
+
+		self.likers = []
+
+	def growLikes(self, likes_per_post):
+		self.likers += self.createUsers(f'liker{len(self.likers)}_', likes_per_post - len(self.likers))
+		Like.objects.bulk_create(
+			[Like(liker=liker, post=post) for liker in self.likers for post in self.posts], ignore_conflicts=True
+		)
+		counters.recountLikes()
+		counters.recountFollows()
+		timeline.rebuildTimelines()
+		search.rebuildIndex()
+
+	def test_budgets(self):
+		post = self.posts[0]
+		own_post = Post.objects.get(poster=self.viewer)
+		pageUrl = lambda templatePageName: reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': templatePageName, 'pageNumber': 1
+		})
+
+		for likes_per_post in LIKES_PER_POST:
+			self.growLikes(likes_per_post)
+
+			with self.subTest(likes_per_post=likes_per_post):
+				self.assertWithinBudget('serializePosts', lambda: serializers.serializePosts(Post.objects.all()) and None)
+				self.assertWithinBudget('getPostsPage index', lambda: self.client.get(pageUrl('index')))
+				self.assertWithinBudget('getPostsPage following', lambda: self.client.get(pageUrl('following')))
+				self.assertWithinBudget('getPostsPage profile', lambda: self.client.get(reverse(
+					'getPostsPageGivenUserId', kwargs={'filterUserId': self.poster.id, 'pageNumber': 1}
+				)))
+
+				self.assertWithinBudget('searchPosts', lambda: self.client.get(reverse('searchPosts'), {'q': 'post'}))
+				self.assertWithinBudget('exportPosts', lambda: streamed(self.client.get(reverse('exportPosts'))))
+				self.assertWithinBudget('exportProfilePosts', lambda: streamed(self.client.get(reverse(
+					'exportProfilePosts', kwargs={'profileId': self.poster.id}
+				))))
+
+				for does_like in (True, False):
+					self.assertWithinBudget('handleLikeDislike', lambda: self.client.put(
+						reverse('handleLikeDislike', kwargs={'postId': post.id}),
+						json.dumps({'does_current_visitor_like_this_post': does_like})
+					))
+
+				for op in ('like', 'unlike'):
+					self.assertWithinBudget('handleBatch', lambda: self.client.post(reverse('handleBatch'), json.dumps({
+						'operations': [{'op': op, 'postId': post.id} for post in self.posts]
+					}), content_type='application/json'))
+
+				self.assertWithinBudget('handleSaveNewPostContent', lambda: self.client.put(
+					reverse('handleSaveNewPostContent', kwargs={'postId': own_post.id}),
+					json.dumps({'newContent': f'edited with {likes_per_post} likes around'})
+				))
+
+
+class FollowsDoNotGrowTheQueries(QueryBudgetTestCase):
+	""" a viewer following 10 then 1000 profiles, each with a post """
+	def setUp(self):
+		super().setUp()
+		self.followees = []
+
+	def growFollowees(self, n_followees):
+		new_followees = self.createUsers(f'followee{len(self.followees)}_', n_followees - len(self.followees))
+		self.followees += new_followees
+
+		Follower.objects.bulk_create([
+			Follower(user_follower=self.viewer, user_being_followed=followee) for followee in new_followees
+		])
+		# the followees follow the viewer back, so both of its counts grow
+		Follower.objects.bulk_create([
+			Follower(user_follower=followee, user_being_followed=self.viewer) for followee in new_followees
+		])
+		Post.objects.bulk_create([Post(poster=followee, content=f'post of {followee.username}') for followee in new_followees])
+		counters.recountFollows()
+		timeline.rebuildTimelines()
+
+	def test_budgets(self):
+		profile = User.objects.create_user(username='profile', password='12345')
+		others = self.createUsers('other', 10)
+
+		for n_followees in FOLLOWEES:
+			self.growFollowees(n_followees)
+
+			with self.subTest(followees=n_followees):
+				self.assertWithinBudget('followingPage', lambda: self.client.get(reverse('followingPage')))
+				self.assertWithinBudget('getPostsPage following', lambda: self.client.get(reverse(
+					'getPostsPageGivenTemplate', kwargs={'templatePageName': 'following', 'pageNumber': 1}
+				)))
+				self.assertWithinBudget('ProfilePage.get', lambda: self.client.get(reverse(
+					'profilePage', kwargs={'profileId': self.viewer.id}
+				)))
+
+				for op in ('follow', 'unfollow'):
+					self.assertWithinBudget('handleBatch', lambda: self.client.post(reverse('handleBatch'), json.dumps({
+						'operations': [{'op': op, 'profileId': followee.id} for followee in others]
+					}), content_type='application/json'))
+
+				for visitor_is_following in (True, False):
+					self.assertWithinBudget('ProfilePage.put', lambda: self.client.put(
+						reverse('profilePage', kwargs={'profileId': profile.id}),
+						json.dumps({'visitor_is_following': visitor_is_following})
+					))
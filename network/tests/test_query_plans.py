@@ -0,0 +1,64 @@
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from unittest import skipUnless
+
+from ..models import User, Follower, Post, Like
+from .. import pagination, timeline
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class FeedQueriesUseIndexes(TestCase):
+	""" The hot queries must be answered from an index, never by scanning a whole table
+		or by sorting it in a temporary b-tree """
+	def setUp(self):
+		self.users = User.objects.bulk_create([User(username=f'user{i}') for i in range(3)])
+		self.viewer = self.users[0]
+
+	def explain(self, queryset):
+		sql, params = queryset.query.sql_with_params()
+
+		with connection.cursor() as cursor:
+			cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+			return '\n'.join(row[-1] for row in cursor.fetchall())
+
+	def assertUsesIndex(self, queryset, index_name):
+		plan = self.explain(queryset)
+
+		self.assertIn(index_name, plan)
+		self.assertNotIn('TEMP B-TREE', plan)
+		self.assertNotRegex(plan, r'SCAN \w+$')
+
+	def keysetPage(self, queryset, idField='id'):
+		cursor = pagination.encodeCursor(timezone.now(), 100, pagination.NEXT)
+
+		return pagination.keysetQueryset(queryset, cursor, idField=idField)[:11]
+
+	def test_index_feed(self):
+		posts = Post.objects.order_by('-timestamp', '-id')
+
+		self.assertUsesIndex(posts[:10], 'post_timestamp_idx')
+		self.assertUsesIndex(self.keysetPage(posts), 'post_timestamp_idx')
+
+	def test_profile_feed(self):
+		posts = Post.objects.order_by('-timestamp', '-id').filter(poster=self.viewer)
+
+		self.assertUsesIndex(posts[:10], 'post_poster_ts_idx')
+		self.assertUsesIndex(self.keysetPage(posts), 'post_poster_ts_idx')
+
+	def test_following_feed(self):
+		entries = timeline.getTimeline(self.viewer)
+
+		self.assertUsesIndex(entries[:10], 'timeline_owner_ts_idx')
+		self.assertUsesIndex(self.keysetPage(entries, 'post_id'), 'timeline_owner_ts_idx')
+
+	def test_fan_out_of_a_new_post(self):
+		followers = Follower.objects.filter(user_being_followed=self.viewer).values_list('user_follower_id')
+
+		self.assertUsesIndex(followers, 'follower_followed_idx')
+
+	def test_likes_of_a_page(self):
+		likes = Like.objects.filter(post_id__in=[1, 2, 3])
+
+		self.assertUsesIndex(likes, 'like_post_liker_idx')
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+
+import json
+import unittest
+from unittest import mock
+
+from ..models import User, Post
+from .. import renderers
+
+
+class ReprRenderer:
+	""" a plugged in renderer """
+	content_type = 'text/x-python-repr'
+
+	def isAvailable(self):
+		return True
+
+	def render(self, data):
+		return repr(data).encode()
+
+
+@override_settings(NETWORK_API_RENDERERS=[
+	'network.renderers.JsonRenderer', 'network.renderers.MsgpackRenderer', 'network.tests.test_renderers.ReprRenderer'
+])
+class ApiRenderers(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='test_user', password='12345')
+		self.post = Post.objects.create(poster=self.user, content='rendered post')
+
+		self.client = Client()
+		self.client.force_login(self.user)
+
+	def pageUrl(self):
+		return reverse('getPostsPageGivenTemplate', kwargs={'templatePageName': 'index', 'pageNumber': 1})
+
+	def test_json_by_default_with_iso_timestamps(self):
+		response = self.client.get(self.pageUrl())
+
+		self.assertEqual(response['Content-Type'], 'application/json')
+		self.assertIn('Accept', response['Vary'])
+
+		post = response.json()['currentPagePosts'][0]
+		self.assertEqual(parse_datetime(post['timestamp']), self.post.timestamp)
+
+	def test_same_json_without_orjson(self):
+		fast = self.client.get(self.pageUrl()).json()
+
+		with mock.patch.object(renderers, 'orjson', None):
+			cache.clear()
+			self.assertEqual(self.client.get(self.pageUrl()).json(), fast)
+
+	def test_accept_picks_the_renderer(self):
+		response = self.client.get(self.pageUrl(), HTTP_ACCEPT='text/x-python-repr, application/json;q=0.5')
+		self.assertEqual(response['Content-Type'], 'text/x-python-repr')
+		self.assertIn('rendered post', response.content.decode())
+
+		# nothing acceptable, the default
+		response = self.client.get(self.pageUrl(), HTTP_ACCEPT='text/html')
+		self.assertEqual(response['Content-Type'], 'application/json')
+
+	def test_each_format_has_its_own_etag(self):
+		json_response = self.client.get(self.pageUrl())
+		repr_response = self.client.get(self.pageUrl(), HTTP_ACCEPT='text/x-python-repr')
+		self.assertNotEqual(json_response['ETag'], repr_response['ETag'])
+
+		response = self.client.get(self.pageUrl(), HTTP_ACCEPT='text/x-python-repr', HTTP_IF_NONE_MATCH=json_response['ETag'])
+		self.assertEqual(response.status_code, 200)
+
+	def test_like_and_edit_responses(self):
+		response = self.client.put(
+			reverse('handleLikeDislike', kwargs={'postId': self.post.id}),
+			json.dumps({'does_current_visitor_like_this_post': True}), HTTP_ACCEPT='text/x-python-repr'
+		)
+		self.assertEqual(response['Content-Type'], 'text/x-python-repr')
+
+		response = self.client.put(
+			reverse('handleSaveNewPostContent', kwargs={'postId': self.post.id}), json.dumps({'newContent': 'edited'})
+		)
+		self.assertEqual(response.json()['content'], 'edited')
+
+	def test_msgpack_only_when_installed(self):
+		with mock.patch.object(renderers, 'msgpack', None):
+			response = self.client.get(self.pageUrl(), HTTP_ACCEPT='application/msgpack')
+		self.assertEqual(response['Content-Type'], 'application/json')
+
+	@unittest.skipIf(renderers.msgpack is None, 'msgpack is not installed')
+	def test_msgpack(self):
+		expected = self.client.get(self.pageUrl()).json()
+		response = self.client.get(self.pageUrl(), HTTP_ACCEPT='application/msgpack, application/json;q=0.9')
+
+		self.assertEqual(response['Content-Type'], 'application/msgpack')
+		self.assertEqual(renderers.msgpack.unpackb(response.content), expected)
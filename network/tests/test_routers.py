@@ -0,0 +1,106 @@
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+import json
+from unittest import mock
+
+from ..models import User, Post
+from .. import routers, views
+
+
+@override_settings(NETWORK_REPLICA_DATABASE='replica', NETWORK_REPLICA_STICKY_SECONDS=10)
+class ReadReplica(TestCase):
+	""" In the tests the replica alias mirrors the default database, and shares its
+		connection, so the reads routed to the replica are counted at the router """
+	def setUp(self):
+		cache.clear()
+
+		replica_connection = connections['replica']
+		connections['replica'] = connections['default']
+		self.addCleanup(connections.__setitem__, 'replica', replica_connection)
+
+		self.user = User.objects.create_user(username='test_user', password='12345')
+		self.post = Post.objects.create(poster=self.user, content='replicated post')
+
+		self.client = Client()
+		self.client.force_login(self.user)
+
+	def pageUrl(self):
+		return reverse('getPostsPageGivenTemplate', kwargs={'templatePageName': 'index', 'pageNumber': 1})
+
+	def routedReads(self, makeRequest):
+		""" returns the (model, alias) of each queryset read by makeRequest """
+		reads = []
+		db_for_read = routers.ReplicaRouter.db_for_read
+
+		def spy(router, model, **hints):
+			reads.append((model, db_for_read(router, model, **hints)))
+			return reads[-1][1]
+
+		with mock.patch.object(routers.ReplicaRouter, 'db_for_read', spy):
+			response = makeRequest()
+
+		self.assertEqual(response.status_code, 200)
+		return reads
+
+	def replicaQueries(self, makeRequest):
+		""" returns how many querysets were routed to the replica by makeRequest """
+		return [alias for _, alias in self.routedReads(makeRequest)].count('replica')
+
+	def test_router(self):
+		self.assertEqual(Post.objects.all().db, 'default')
+
+		readPosts = routers.readsFromReplica(lambda request: Post.objects.all().db)
+		self.assertEqual(readPosts(Client().get(self.pageUrl()).wsgi_request), 'replica')
+		self.assertEqual(Post.objects.all().db, 'default')
+
+		with override_settings(NETWORK_REPLICA_DATABASE=None):
+			self.assertEqual(readPosts(Client().get(self.pageUrl()).wsgi_request), 'default')
+
+	def test_read_only_views_read_from_the_replica(self):
+		self.assertGreater(self.replicaQueries(lambda: self.client.get(self.pageUrl())), 0)
+		self.assertGreater(self.replicaQueries(lambda: self.client.get(reverse('followingPage'))), 0)
+		self.assertGreater(self.replicaQueries(
+			lambda: self.client.get(reverse('profilePage', kwargs={'profileId': self.user.id}))
+		), 0)
+		# not a read-only view
+		self.assertEqual(self.replicaQueries(lambda: self.client.get(reverse('index'))), 0)
+
+	def test_sticky_after_write(self):
+		response = self.client.put(
+			reverse('handleLikeDislike', kwargs={'postId': self.post.id}),
+			json.dumps({'does_current_visitor_like_this_post': True})
+		)
+		self.assertIn(routers.STICKY_COOKIE, response.cookies)
+
+		self.assertEqual(self.replicaQueries(lambda: self.client.get(self.pageUrl())), 0)
+		# other browsers still read from the replica
+		self.assertGreater(self.replicaQueries(lambda: Client().get(self.pageUrl())), 0)
+
+	def test_failed_write_is_not_sticky(self):
+		response = self.client.put(
+			reverse('handleLikeDislike', kwargs={'postId': self.post.id}),
+			json.dumps({'does_current_visitor_like_this_post': False})
+		)
+
+		self.assertEqual(response.status_code, 400)
+		self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+	def test_pinned_browser_skips_what_was_cached_from_the_replica(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.post(reverse('index'), {'newPostContent': 'my own post'})
+		profile_url = reverse('profilePage', kwargs={'profileId': self.user.id})
+
+		# another browser caches the page and the post count, read from the lagging replica
+		other_browser = Client()
+		self.assertGreater(self.replicaQueries(lambda: other_browser.get(self.pageUrl())), 0)
+		self.assertGreater(self.replicaQueries(lambda: other_browser.get(profile_url)), 0)
+
+		# the writer reads them again from the primary
+		with mock.patch.object(views, '_buildPostsPage', wraps=views._buildPostsPage) as buildPostsPage:
+			self.assertEqual(self.replicaQueries(lambda: self.client.get(self.pageUrl())), 0)
+		buildPostsPage.assert_called_once()
+		self.assertIn((Post, 'default'), self.routedReads(lambda: self.client.get(profile_url)))
+
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+import json
+from unittest import mock
+
+from ..models import User, Post
+from .. import search
+
+
+class SearchPosts(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='test_user', password='12345')
+		self.client = Client()
+		self.client.force_login(self.user)
+
+	def newPost(self, content):
+		""" posts through the index view, which indexes the post """
+		self.client.post(reverse('index'), {'newPostContent': content})
+		return Post.objects.filter(poster=self.user).latest('id')
+
+	def searchIds(self, query, **params):
+		response = self.client.get(reverse('searchPosts'), {'q': query, **params})
+		self.assertEqual(response.status_code, 200)
+		return [post['id'] for post in response.json()['currentPagePosts']]
+
+	def test_ranked_matches(self):
+		once = self.newPost('a walk in the park today')
+		twice = self.newPost('park, park and the park again')
+		self.newPost('nothing to see here')
+
+		self.assertEqual(self.searchIds('park'), [twice.id, once.id])
+		# every term is required, the last one is a prefix only when asked for
+		self.assertEqual(self.searchIds('walk pa'), [])
+		self.assertEqual(self.searchIds('walk pa', prefix=1), [once.id])
+		self.assertEqual(self.searchIds('"walk" (*'), [once.id])
+		self.assertEqual(self.searchIds('elephant'), [])
+
+	def test_same_serialization_as_the_feeds(self):
+		post = self.newPost('searchable post')
+		feed_post = self.client.get(reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index', 'pageNumber': 1
+		})).json()['currentPagePosts'][0]
+
+		self.assertEqual(self.client.get(reverse('searchPosts'), {'q': 'searchable'}).json()['currentPagePosts'], [feed_post])
+		self.assertEqual(feed_post['id'], post.id)
+
+	def test_index_follows_edits_and_deletes(self):
+		post = self.newPost('the first version')
+
+		self.client.put(
+			reverse('handleSaveNewPostContent', kwargs={'postId': post.id}),
+			json.dumps({'newContent': 'the second version'})
+		)
+		self.assertEqual(self.searchIds('first'), [])
+		self.assertEqual(self.searchIds('second'), [post.id])
+
+		post.delete()
+		self.assertEqual(self.searchIds('second'), [])
+
+	def test_cursor_pagination(self):
+		posts = [self.newPost(f'paged post {i}') for i in range(25)]
+
+		pages = []
+		cursor = ''
+		while True:
+			page = self.client.get(reverse('searchPosts'), {'q': 'paged', 'cursor': cursor}).json()
+			pages.append([post['id'] for post in page['currentPagePosts']])
+			if not page['hasNext']:
+				break
+			cursor = page['nextCursor']
+
+		self.assertEqual([len(page) for page in pages], [10, 10, 5])
+		self.assertEqual(sorted(sum(pages, [])), sorted(post.id for post in posts))
+
+	def test_bulk_created_posts_after_a_rebuild(self):
+		Post.objects.bulk_create([Post(poster=self.user, content=f'bulk post {i}') for i in range(3)])
+		self.assertEqual(self.searchIds('bulk'), [])
+
+		search.rebuildIndex()
+		self.assertEqual(len(self.searchIds('bulk')), 3)
+
+	def test_without_the_index(self):
+		""" the fallback of the backends without FTS5 """
+		old = self.newPost('an old match')
+		new = self.newPost('a new match')
+
+		with mock.patch.object(search, '_usesFts', return_value=False):
+			self.assertEqual(self.searchIds('match'), [new.id, old.id])
+			self.assertEqual(self.searchIds('old match'), [old.id])
+
+	def test_bad_requests(self):
+		self.assertEqual(self.client.get(reverse('searchPosts'), {'q': ' ?! '}).status_code, 400)
+		self.assertEqual(self.client.get(reverse('searchPosts'), {'q': 'post', 'cursor': 'garbage'}).status_code, 400)
@@ -0,0 +1,37 @@
+from django.test import TestCase
+
+from ..models import User, Post, Like
+from ..serializers import serializePosts
+
+
+class SerializePosts(TestCase):
+	def setUp(self):
+		self.posters = User.objects.bulk_create([User(username=f'poster{i}') for i in range(5)])
+		self.likers = User.objects.bulk_create([User(username=f'liker{i}') for i in range(20)])
+
+		for poster in self.posters:
+			for i in range(2):
+				Post.objects.create(poster=poster, content=f'content {i}')
+
+		for i, post in enumerate(Post.objects.all()):
+			Like.objects.bulk_create([Like(liker=liker, post=post) for liker in self.likers[:i * 2]])
+
+	def test_same_output_as_post_serialize(self):
+		posts = Post.objects.order_by('-timestamp', '-id')
+
+		self.assertEqual(serializePosts(posts), [post.serialize() for post in posts])
+
+	def test_given_post_ids_keeps_their_order(self):
+		post_ids = list(Post.objects.order_by('?').values_list('id', flat=True))
+
+		self.assertEqual([post['id'] for post in serializePosts(post_ids)], post_ids)
+
+	def test_constant_number_of_queries(self):
+		posts = list(Post.objects.all())
+
+		# one for the posters, one for the likes of every post
+		with self.assertNumQueries(2):
+			serializePosts(posts)
+
+		with self.assertNumQueries(2):
+			serializePosts(Post.objects.all())
@@ -0,0 +1,71 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, Client, AsyncClient, override_settings
+from django.urls import reverse
+
+import gzip
+import shutil
+import tempfile
+from io import StringIO
+
+from ..models import User
+from .. import staticFiles
+
+
+class StaticFilesPipeline(TestCase):
+	""" collects the static files once into a temporary STATIC_ROOT """
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.static_root = tempfile.mkdtemp()
+		cls.addClassCleanup(shutil.rmtree, cls.static_root)
+
+		cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root))
+		call_command('collectstatic', interactive=False, stdout=StringIO())
+
+	def staticUrl(self, path):
+		return staticfiles_storage.url(path)
+
+	def test_pages_load_their_fingerprinted_bundle(self):
+		user = User.objects.create_user(username='test_user', password='12345')
+		self.client.force_login(user)
+
+		html = self.client.get(reverse('profilePage', kwargs={'profileId': user.id})).content.decode()
+		bundle_url = self.staticUrl('network/JS/bundles/profilePage.js')
+
+		self.assertRegex(bundle_url, r'/profilePage\.[0-9a-f]{12}\.js$')
+		self.assertIn(f'<script src="{bundle_url}"', html)
+		self.assertNotIn('relatedToPosts.js', html)
+
+	def test_bundle_concatenates_the_scripts_of_the_page(self):
+		with staticfiles_storage.open(staticfiles_storage.stored_name('network/JS/bundles/profilePage.js')) as f:
+			bundle = f.read().decode()
+
+		positions = [bundle.index(f'/* {script} */') for script in staticFiles.bundles()['profilePage']]
+		self.assertEqual(positions, sorted(positions))
+		self.assertIn('function handleLikeDislike', bundle)
+		self.assertIn('function decodeMsgpack', bundle)
+
+	def test_served_precompressed_and_immutable(self):
+		url = self.staticUrl('network/JS/bundles/index.js')
+
+		response = Client().get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+		self.assertEqual(response['Content-Type'], 'text/javascript')
+		self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+		self.assertIn('Accept-Encoding', response['Vary'])
+
+		plain = Client().get(url)
+		self.assertNotIn('Content-Encoding', plain)
+		self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(plain.streaming_content))
+
+	async def test_served_by_the_async_middleware_chain(self):
+		response = await AsyncClient().get(self.staticUrl('network/JS/bundles/index.js'), headers={'accept-encoding': 'gzip'})
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+		self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+	def test_unfingerprinted_names_are_revalidated(self):
+		response = Client().get('/static/network/JS/bundles/index.js')
+		self.assertEqual(response['Cache-Control'], 'no-cache')
+
+		self.assertEqual(Client().get('/static/../manage.py').status_code, 404)
@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import json
+from unittest import mock
+
+from ..models import User
+from .. import userCache
+
+
+class CachedSessionsAndUsers(TestCase):
+	def setUp(self):
+		cache.clear()
+		userCache.clear()
+
+		self.user = User.objects.create_user(username='test_user', password='12345')
+		self.other = User.objects.create_user(username='other_user', password='12345')
+		self.client = Client()
+		self.client.force_login(self.user)
+
+	def profileUrl(self, user):
+		return reverse('profilePage', kwargs={'profileId': user.id})
+
+	def authQueries(self, makeRequest):
+		""" the queries of the session and user tables run by makeRequest """
+		with CaptureQueriesContext(connection) as captured:
+			response = makeRequest()
+		return response, [
+			query['sql'] for query in captured.captured_queries
+			if 'django_session' in query['sql'] or 'network_user' in query['sql']
+		]
+
+	def test_warm_request_reads_neither_session_nor_user(self):
+		self.client.get(reverse('index'))
+
+		response, queries = self.authQueries(lambda: self.client.get(reverse('index')))
+		self.assertEqual(response.context['user'], self.user)
+		self.assertEqual(queries, [])
+
+		# nor is the visitor fetched again as the profile of their own page
+		response, queries = self.authQueries(lambda: self.client.get(self.profileUrl(self.user)))
+		self.assertEqual(response.context['username'], 'test_user')
+		self.assertEqual(queries, [])
+
+	def test_saved_user_is_read_again(self):
+		self.client.get(reverse('index'))
+
+		self.user.username = 'renamed_user'
+		self.user.save()
+		self.assertContains(self.client.get(reverse('index')), 'renamed_user')
+
+		self.user.is_active = False
+		self.user.save()
+		self.assertFalse(self.client.get(reverse('index')).context['user'].is_authenticated)
+
+	def test_follow_counts_of_the_own_profile(self):
+		self.client.get(self.profileUrl(self.user))
+
+		other_client = Client()
+		other_client.force_login(self.other)
+		with self.captureOnCommitCallbacks(execute=True):
+			other_client.put(self.profileUrl(self.user), json.dumps({'visitor_is_following': True}))
+
+		self.assertEqual(self.client.get(self.profileUrl(self.user)).context['n_of_followers'], 1)
+
+	def test_each_request_gets_its_own_copy(self):
+		self.client.get(reverse('index'))
+
+		cached = userCache.getUser(self.user.id)
+		cached.username = 'changed by a view'
+		self.assertEqual(userCache.getUser(self.user.id).username, 'test_user')
+
+	def test_sessions_of_the_model_backend_stay_logged_in(self):
+		client = Client()
+		client.force_login(self.other, backend='django.contrib.auth.backends.ModelBackend')
+
+		self.assertEqual(client.get(reverse('index')).context['user'], self.other)
+
+	def test_wrong_password_is_hashed_once(self):
+		with mock.patch.object(User, 'check_password', autospec=True, return_value=False) as check_password:
+			self.assertFalse(Client().login(username='test_user', password='wrong'))
+		self.assertEqual(check_password.call_count, 1)
+
+	@override_settings(NETWORK_USER_CACHE_TIMEOUT=0)
+	def test_disabled(self):
+		self.client.get(reverse('index'))
+
+		_, queries = self.authQueries(lambda: self.client.get(reverse('index')))
+		self.assertEqual(len([query for query in queries if 'network_user' in query]), 1)
@@ -1,10 +1,13 @@
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 
 import json
+from unittest import mock
 
-from ..models import User, Follower, Post
+from ..models import User, Follower, Post, Like
+from .. import counters
 
 
 class Index(TestCase):
@@ -48,6 +51,9 @@ class Index(TestCase):
 
 class GetPostsPage(TestCase):
 	def setUp(self):
+		# pages cached by another test would hide the posts of this one
+		cache.clear()
+
 		self.mock_user1 = {
 			'username': 'test_user1',
 			'password': '12345',
@@ -163,6 +169,193 @@ class GetPostsPage(TestCase):
 		self.assertTrue(result)
 		self.assertEqual(response.status_code, 200)
 	
+	def test_walk_index_pages_by_cursor(self):
+		""" walking the feed by cursors gives the same pages as the page numbers """
+		url = reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index',
+			'pageNumber': 1
+		})
+
+		pages_by_number = []
+		for pageNumber in range(1, 4):
+			response = self.client.get(reverse('getPostsPageGivenTemplate', kwargs={
+				'templatePageName': 'index',
+				'pageNumber': pageNumber
+			}))
+			pages_by_number.append([post['id'] for post in response.json()['currentPagePosts']])
+
+		pages_by_cursor = []
+		response = self.client.get(url, {'cursor': ''}).json()
+		pages_by_cursor.append([post['id'] for post in response['currentPagePosts']])
+		while response['hasNext']:
+			response = self.client.get(url, {'cursor': response['nextCursor']}).json()
+			pages_by_cursor.append([post['id'] for post in response['currentPagePosts']])
+
+		self.assertEqual(pages_by_cursor, pages_by_number)
+		self.assertTrue(response['hasPrevious'])
+
+		# and walking back from the last page gives the middle one
+		response = self.client.get(url, {'cursor': response['prevCursor']}).json()
+		self.assertEqual([post['id'] for post in response['currentPagePosts']], pages_by_number[1])
+
+	def test_visitor_likes_are_resolved_for_the_page(self):
+		self.client.login(
+			username=self.mock_user1['username'],
+			password=self.mock_user1['password']
+		)
+		liked_post = Post.objects.order_by('-timestamp', '-id').first()
+		Like.objects.create(liker=self.mock_User1, post=liked_post)
+
+		response = self.client.get(reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index',
+			'pageNumber': 1
+		}))
+		posts = response.json()['currentPagePosts']
+
+		self.assertEqual(
+			[post['id'] for post in posts if post['does_current_visitor_like_this_post']],
+			[liked_post.id]
+		)
+
+	def test_get_posts_page_without_the_likes_list(self):
+		response = self.client.get(reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index',
+			'pageNumber': 1
+		}), {'includeLikes': '0'})
+		posts = response.json()['currentPagePosts']
+
+		self.assertTrue(all('likes' not in post for post in posts))
+		self.assertTrue(all('number_likes' in post for post in posts))
+
+	def test_index_page_is_cached_and_invalidated_by_a_like(self):
+		url = reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index',
+			'pageNumber': 1
+		})
+		first_post = self.client.get(url).json()['currentPagePosts'][0]
+
+		# an anonymous visitor only reads the page validators, the body comes from the cache
+		with self.assertNumQueries(1):
+			self.client.get(url)
+
+		self.client.login(
+			username=self.mock_user1['username'],
+			password=self.mock_user1['password']
+		)
+		self.client.put(reverse('handleLikeDislike', kwargs={'postId': first_post['id']}), json.dumps({
+			'does_current_visitor_like_this_post': True
+		}))
+		post = self.client.get(url).json()['currentPagePosts'][0]
+
+		self.assertEqual(post['number_likes'], first_post['number_likes'] + 1)
+		self.assertTrue(post['does_current_visitor_like_this_post'])
+
+	def test_unchanged_page_is_answered_with_a_304(self):
+		url = reverse('getPostsPageGivenUserId', kwargs={
+			'pageNumber': 1,
+			'filterUserId': self.mock_User1.id
+		})
+		etag = self.client.get(url)['ETag']
+
+		# one query reads the ETag, nothing is serialized
+		with self.assertNumQueries(1):
+			response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual(response.content, b'')
+
+		post = Post.objects.filter(poster=self.mock_User1).order_by('-timestamp', '-id').first()
+		Like.objects.create(liker=self.mock_User2, post=post)
+		Post.objects.filter(id=post.id).update(like_count=1)
+
+		response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+		self.assertEqual(response.json()['currentPagePosts'][0]['number_likes'], 1)
+
+	def test_cached_page_of_older_rows_is_not_served(self):
+		""" a write that didn't bump the feed version, like an update from the admin """
+		url = reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index',
+			'pageNumber': 1
+		})
+		post = self.client.get(url).json()['currentPagePosts'][0]
+
+		Post.objects.filter(id=post['id']).update(like_count=7)
+
+		response = self.client.get(url)
+		self.assertEqual(response.json()['currentPagePosts'][0]['number_likes'], 7)
+
+		# the 304 keeps the body the ETag was sent with
+		etag = response['ETag']
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		self.assertEqual(self.client.get(url).json()['currentPagePosts'][0]['number_likes'], 7)
+
+	def test_likes_are_not_hidden_by_if_modified_since(self):
+		url = reverse('getPostsPageGivenUserId', kwargs={
+			'pageNumber': 1,
+			'filterUserId': self.mock_User1.id
+		})
+		response = self.client.get(url)
+		# the newest timestamp of the page doesn't change with its likes
+		self.assertNotIn('Last-Modified', response)
+
+		post = Post.objects.filter(poster=self.mock_User1).order_by('-timestamp', '-id').first()
+		Like.objects.create(liker=self.mock_User2, post=post)
+		Post.objects.filter(id=post.id).update(like_count=1)
+
+		response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+		self.assertEqual(response.status_code, 200)
+
+	def test_bad_get_posts_page_with_an_invalid_cursor(self):
+		response = self.client.get(reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index',
+			'pageNumber': 1
+		}), {'cursor': 'not a cursor'})
+
+		self.assertEqual(response.status_code, 400)
+
+	def test_following_page_is_read_from_the_timeline(self):
+		""" following through the profile page backfills the timeline, new posts are
+			fanned out to it and unfollowing prunes it """
+		self.client.login(
+			username=self.mock_user1['username'],
+			password=self.mock_user1['password']
+		)
+		url = reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'following',
+			'pageNumber': 1
+		})
+
+		self.client.put(reverse('profilePage', kwargs={'profileId': self.mock_User2.id}), json.dumps({
+			'visitor_is_following': True
+		}))
+		posts = self.client.get(url).json()['currentPagePosts']
+
+		self.assertEqual(len(posts), 10)
+		self.assertTrue(self.are_all_these_posts_from_this_user(posts, self.mock_User2))
+
+		self.client.login(
+			username=self.mock_user2['username'],
+			password=self.mock_user2['password']
+		)
+		self.client.post(reverse('index'), {'newPostContent': 'brand new post'})
+		self.client.login(
+			username=self.mock_user1['username'],
+			password=self.mock_user1['password']
+		)
+		posts = self.client.get(url).json()['currentPagePosts']
+
+		self.assertEqual(posts[0]['content'], 'brand new post')
+
+		self.client.put(reverse('profilePage', kwargs={'profileId': self.mock_User2.id}), json.dumps({
+			'visitor_is_following': False
+		}))
+		response = self.client.get(url)
+
+		self.assertEqual(response.json()['currentPagePosts'], [])
+
 	def test_get_first_posts_page_from_a_profile(self):
 		# mock_user2 requests some posts from mock_user1
 		self.client.login(
@@ -329,6 +522,26 @@ class HandleLikeDislike(TestCase):
 
 		self.assertEqual(response.status_code, 200)
 	
+	def test_like_counter_follows_likes_and_dislikes(self):
+		self.client.login(
+			username=self.mock_user1['username'],
+			password=self.mock_user1['password']
+		)
+		post = Post.objects.get(id=1)
+		url = reverse('handleLikeDislike', kwargs={'postId': post.id})
+
+		response = self.client.put(url, json.dumps({'does_current_visitor_like_this_post': True}))
+		post.refresh_from_db()
+
+		self.assertEqual(post.like_count, 1)
+		self.assertEqual(response.json()['number_likes'], 1)
+
+		response = self.client.put(url, json.dumps({'does_current_visitor_like_this_post': False}))
+		post.refresh_from_db()
+
+		self.assertEqual(post.like_count, 0)
+		self.assertEqual(response.json()['number_likes'], 0)
+
 	def test_bad_dislike_a_particular_post_when_the_visitor_already_dislike_it(self):
 		self.client.login(
 			username=self.mock_user1['username'],
@@ -378,6 +591,24 @@ class HandleSaveNewPostContent(TestCase):
 		data = json.dumps({'newContent': 'new content for tests'})
 		response = self.client.put(reverse('handleSaveNewPostContent', kwargs={'postId': self.test_post.id}), data)
 		self.assertEqual(response.status_code, 200)
+
+	def test_save_keeps_a_like_taken_after_loading_the_post(self):
+		self.client.force_login(self.mock_User)
+		save = Post.save
+
+		def likeThenSave(post, *args, **kwargs):
+			# a like commits between the read of the post and its save
+			counters.incrementLikeCount(post, 1)
+			return save(post, *args, **kwargs)
+
+		with mock.patch.object(Post, 'save', likeThenSave):
+			response = self.client.put(
+				reverse('handleSaveNewPostContent', kwargs={'postId': self.test_post.id}), json.dumps({'newContent': 'edited'})
+			)
+		self.assertEqual(response.status_code, 200)
+
+		self.test_post.refresh_from_db()
+		self.assertEqual((self.test_post.content, self.test_post.like_count), ('edited', 1))
 	
 	def test_bad_save_new_post_content_when_wrong_post_id(self):
 		""" This case should fail because the post id doesn't exist """
@@ -411,6 +642,8 @@ class HandleSaveNewPostContent(TestCase):
 
 class ProfilePage(TestCase):
 	def setUp(self):
+		# don't let a follower graph cached by another test leak into this one
+		cache.clear()
 		self.client = Client()
 
 		self.mock_user1 = {
@@ -466,6 +699,36 @@ class ProfilePage(TestCase):
 		self.assertEqual(visitor_is_following_this_profile, response.context['visitor_is_following'])
 		self.assertEqual(response.status_code, 200)
 
+	def test_follow_served_by_another_process_with_a_local_cache(self):
+		from .. import graph
+
+		visitor = self.createUser(self.mock_user1)
+		profile = self.createUser(self.mock_user2)
+		self.client.login(username=self.mock_user1['username'], password=self.mock_user1['password'])
+		graph.getGraph()
+
+		# logged in the cache of the process that served it, never in the one of this process
+		Follower.objects.create(user_follower=visitor, user_being_followed=profile)
+		self.assertFalse(graph.getGraph().isFollowing(visitor.id, profile.id))
+
+		response = self.client.get(reverse('profilePage', kwargs={'profileId': profile.id}))
+		self.assertTrue(response.context['visitor_is_following'])
+
+	def test_get_reads_the_follower_graph_of_a_shared_cache(self):
+		from .. import graph
+
+		visitor = self.createUser(self.mock_user1)
+		profile = self.createUser(self.mock_user2)
+		Follower.objects.create(user_follower=visitor, user_being_followed=profile)
+		self.client.login(username=self.mock_user1['username'], password=self.mock_user1['password'])
+
+		with mock.patch.object(graph, 'isShared', return_value=True), \
+			 mock.patch.object(graph, 'getGraph', wraps=graph.getGraph) as getGraph:
+			response = self.client.get(reverse('profilePage', kwargs={'profileId': profile.id}))
+
+		self.assertTrue(response.context['visitor_is_following'])
+		getGraph.assert_called_once()
+
 	def test_bad_get(self):
 		""" This case should fail because this profile id doesn't exist in the database """
 		response = self.client.get(reverse('profilePage', kwargs={'profileId': 0}))
@@ -517,6 +780,28 @@ class ProfilePage(TestCase):
 
 		self.assertEqual(response.status_code, 200)
 
+	def test_follow_counters_follow_the_put_requests(self):
+		mock_User1 = self.createUser(self.mock_user1)
+		mock_User2 = self.createUser(self.mock_user2)
+
+		self.client.login(
+			username=self.mock_user1['username'],
+			password=self.mock_user1['password']
+		)
+		url = reverse('profilePage', kwargs={'profileId': mock_User2.id})
+
+		self.client.put(url, json.dumps({'visitor_is_following': True}))
+		response = self.client.get(url)
+
+		self.assertEqual(response.context['n_of_followers'], 1)
+		self.assertEqual(User.objects.get(id=mock_User1.id).following_count, 1)
+
+		self.client.put(url, json.dumps({'visitor_is_following': False}))
+		response = self.client.get(url)
+
+		self.assertEqual(response.context['n_of_followers'], 0)
+		self.assertEqual(User.objects.get(id=mock_User1.id).following_count, 0)
+
 	def test_bad_put_when_request_for_visitor_to_unfollow_the_current_profile(self):
 		""" The visitor IS NOT following the current profile, then he makes a PUT request
 		 	for profilePage to make it UNFOLLOW this profile """
@@ -703,3 +988,277 @@ class Register(TestCase):
 		warning_message = self.hasWarning(response)
 
 		self.assertTrue(warning_message)
+
+
+@override_settings(NETWORK_PERFORMANCE_INSTRUMENTATION=True)
+class PerformanceInstrumentation(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='test_user', password='12345')
+		Post.objects.create(poster=self.user, content='timed post')
+
+	def test_server_timing_and_log_line(self):
+		with self.assertLogs('network.performance', level='INFO') as logs:
+			response = Client().get(reverse('getPostsPageGivenTemplate', kwargs={
+				'templatePageName': 'index', 'pageNumber': 1
+			}))
+
+		self.assertEqual(response.status_code, 200)
+		self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, encode;dur=[\d.]+, total;dur=[\d.]+$')
+
+		line = json.loads(logs.records[0].getMessage())
+		self.assertEqual(line['url_name'], 'getPostsPageGivenTemplate')
+		self.assertEqual(line['status'], 200)
+		self.assertGreater(line['db_queries'], 0)
+		self.assertIn('serialize_ms', line)
+
+	def test_render_time_of_a_template_view(self):
+		response = Client().get(reverse('profilePage', kwargs={'profileId': self.user.id}))
+
+		self.assertIn('render;dur=', response['Server-Timing'])
+
+	def test_disabled(self):
+		with override_settings(NETWORK_PERFORMANCE_INSTRUMENTATION=False):
+			response = Client().get(reverse('index'))
+
+		self.assertNotIn('Server-Timing', response)
+
+	def test_off_by_default(self):
+		from project4 import settings as project_settings
+
+		self.assertFalse(project_settings.NETWORK_PERFORMANCE_INSTRUMENTATION)
+
+
+class HandleBatch(TestCase):
+	def setUp(self):
+		cache.clear()
+
+		self.visitor = User.objects.create_user(username='visitor', password='12345')
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.posts = [Post.objects.create(poster=self.poster, content=f'post {i}') for i in range(3)]
+		Like.objects.create(liker=self.visitor, post=self.posts[2])
+		Post.objects.filter(id=self.posts[2].id).update(like_count=1)
+
+		self.client = Client()
+		self.client.force_login(self.visitor)
+
+	def postBatch(self, operations):
+		return self.client.post(reverse('handleBatch'), json.dumps({'operations': operations}), content_type='application/json')
+
+	def test_likes_and_unlikes(self):
+		response = self.postBatch([
+			{'op': 'like', 'postId': self.posts[0].id},
+			{'op': 'like', 'postId': self.posts[0].id},
+			{'op': 'like', 'postId': self.posts[1].id},
+			{'op': 'unlike', 'postId': self.posts[1].id},
+			{'op': 'unlike', 'postId': self.posts[2].id},
+			{'op': 'like', 'postId': 9999},
+			{'op': 'dance', 'postId': self.posts[0].id},
+		])
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual([result['status'] for result in response.json()['results']], [200, 400, 200, 200, 200, 404, 400])
+		self.assertEqual(response.json()['results'][0]['number_likes'], 1)
+
+		self.assertEqual(list(Like.objects.values_list('post_id', flat=True)), [self.posts[0].id])
+		self.assertEqual(
+			[post.like_count for post in Post.objects.order_by('id')], [1, 0, 0]
+		)
+
+	def test_follows_and_unfollows(self):
+		other = User.objects.create_user(username='other', password='12345')
+		Follower.objects.create(user_follower=self.visitor, user_being_followed=other)
+
+		response = self.postBatch([
+			{'op': 'follow', 'profileId': self.poster.id},
+			{'op': 'unfollow', 'profileId': other.id},
+			{'op': 'unfollow', 'profileId': other.id},
+		])
+
+		self.assertEqual([result['status'] for result in response.json()['results']], [200, 200, 400])
+		self.assertEqual(response.json()['results'][0]['n_of_followers'], 1)
+
+		self.poster.refresh_from_db()
+		self.visitor.refresh_from_db()
+		self.assertEqual((self.poster.followers_count, self.visitor.following_count), (1, 1))
+		self.assertEqual(self.visitor.timeline_entries.count(), 3)
+
+		# the profile page sees the follow
+		response = self.client.get(reverse('profilePage', kwargs={'profileId': self.poster.id}))
+		self.assertTrue(response.context['visitor_is_following'])
+
+	def test_bad_batches(self):
+		self.assertEqual(self.client.post(reverse('handleBatch'), 'nope', content_type='application/json').status_code, 400)
+		self.assertEqual(self.postBatch([{'op': 'like', 'postId': self.posts[0].id}] * 101).status_code, 400)
+		self.assertEqual(self.client.get(reverse('handleBatch')).status_code, 405)
+		self.assertEqual(
+			Client().post(reverse('handleBatch'), json.dumps({'operations': []}), content_type='application/json').status_code, 403
+		)
+		self.assertFalse(Like.objects.exclude(post=self.posts[2]).exists())
+
+
+class WriteBehindLikes(TestCase):
+	def setUp(self):
+		import tempfile
+		from django.test import override_settings
+
+		cache.clear()
+		self.journal_dir = tempfile.TemporaryDirectory()
+		self.settings = override_settings(
+			NETWORK_LIKE_WRITE_BEHIND=True, NETWORK_LIKE_FLUSH_INTERVAL=None, NETWORK_LIKE_JOURNAL_DIR=self.journal_dir.name
+		)
+		self.settings.enable()
+
+		self.visitor = User.objects.create_user(username='visitor', password='12345')
+		self.post = Post.objects.create(poster=self.visitor, content='viral post')
+
+		self.client = Client()
+		self.client.force_login(self.visitor)
+
+	def tearDown(self):
+		self.forgetBuffer()
+		self.settings.disable()
+		self.journal_dir.cleanup()
+
+	def forgetBuffer(self):
+		""" what a crash does to the buffer of a process """
+		from .. import likeBuffer
+
+		likeBuffer._pending.clear()
+		likeBuffer._flushing.clear()
+		for journal in likeBuffer._journal['sealed'] + [likeBuffer._journal['file']]:
+			if journal is not None:
+				journal.close()
+		likeBuffer._journal.update({'file': None, 'sealed': []})
+
+	def like(self, does_like):
+		return self.client.put(
+			reverse('handleLikeDislike', kwargs={'postId': self.post.id}),
+			json.dumps({'does_current_visitor_like_this_post': does_like})
+		)
+
+	def getPage(self, **headers):
+		return self.client.get(reverse('getPostsPageGivenTemplate', kwargs={
+			'templatePageName': 'index', 'pageNumber': 1
+		}), headers=headers)
+
+	def test_buffered_like_is_seen_before_the_flush(self):
+		from .. import likeBuffer
+
+		etag = self.getPage()['ETag']
+
+		response = self.like(True)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()['number_likes'], 1)
+		self.assertFalse(Like.objects.exists())
+
+		response = self.getPage(if_none_match=etag)
+		self.assertEqual(response.status_code, 200)
+		post = response.json()['currentPagePosts'][0]
+		self.assertEqual(post['number_likes'], 1)
+		self.assertTrue(post['does_current_visitor_like_this_post'])
+		self.assertEqual(post['likes'], [{'liker_id': self.visitor.id, 'post_id': self.post.id}])
+
+		self.assertEqual(likeBuffer.flush(), 1)
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 1)
+		self.assertTrue(Like.objects.filter(liker=self.visitor, post=self.post).exists())
+		self.assertEqual(self.getPage().json()['currentPagePosts'][0]['number_likes'], 1)
+
+	def test_app_imports_without_fcntl(self):
+		""" fcntl, which locks the journals, only exists on POSIX """
+		import os
+		import subprocess
+		import sys
+		from django.conf import settings
+
+		code = (
+			"import sys; sys.modules['fcntl'] = None; import django; django.setup(); "
+			"import network.views, network.asyncViews, network.batch"
+		)
+		subprocess.run(
+			[sys.executable, '-c', code], check=True, cwd=settings.BASE_DIR,
+			env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'project4.settings'}
+		)
+
+	def test_toggles_collapse(self):
+		from .. import likeBuffer
+
+		self.assertEqual(self.like(True).status_code, 200)
+		self.assertEqual(self.like(True).status_code, 400)
+		self.assertEqual(self.like(False).json()['number_likes'], 0)
+		self.assertEqual(self.like(False).status_code, 400)
+		self.assertEqual(self.like(True).status_code, 200)
+
+		with self.assertNumQueries(6):
+			likeBuffer.flush()
+
+		self.assertEqual(Like.objects.count(), 1)
+		self.assertEqual(self.like(False).status_code, 200)
+		likeBuffer.flush()
+		self.assertFalse(Like.objects.exists())
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 0)
+
+	def test_journal_replayed_after_a_crash(self):
+		from django.core.management import call_command
+		from io import StringIO
+
+		self.like(True)
+		self.forgetBuffer()
+		self.assertFalse(Like.objects.exists())
+
+		out = StringIO()
+		call_command('flush_likes', stdout=out)
+
+		self.assertIn('1 journal(s) replayed', out.getvalue())
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 1)
+		# replaying is idempotent, and the journal is gone
+		call_command('flush_likes', stdout=out)
+		self.assertEqual(Like.objects.count(), 1)
+
+
+class ExportPosts(TestCase):
+	def setUp(self):
+		self.poster = User.objects.create_user(username='poster', password='12345')
+		self.other = User.objects.create_user(username='other', password='12345')
+		self.posts = [Post.objects.create(poster=poster, content=f'post {i}') for i, poster in enumerate([self.poster, self.other] * 3)]
+		Post.objects.filter(id=self.posts[0].id).update(like_count=2)
+
+	def exportedLines(self, response):
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.streaming)
+		self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+		return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+	def test_export_every_post(self):
+		lines = self.exportedLines(self.client.get(reverse('exportPosts')))
+
+		self.assertEqual([line['id'] for line in lines], [post.id for post in self.posts])
+		self.assertEqual(lines[0], {
+			'id': self.posts[0].id,
+			'poster': {'id': self.poster.id, 'username': 'poster'},
+			'content': 'post 0',
+			'timestamp': self.posts[0].timestamp.isoformat(),
+			'like_count': 2
+		})
+
+	def test_export_the_posts_of_a_profile(self):
+		lines = self.exportedLines(self.client.get(reverse('exportProfilePosts', kwargs={'profileId': self.other.id})))
+
+		self.assertEqual([line['id'] for line in lines], [post.id for post in self.posts if post.poster == self.other])
+
+	def test_rows_are_read_chunk_by_chunk(self):
+		from .. import benchmarking, export
+
+		with benchmarking.countFetchedRows() as fetched:
+			lines = export.ndjsonLines(export.exportedPosts(), chunk_size=2)
+			next(lines)
+			self.assertEqual(fetched.rows, 2)
+
+			self.assertEqual(len(list(lines)), len(self.posts) - 1)
+
+	def test_bad_exports(self):
+		self.assertEqual(self.client.get(reverse('exportProfilePosts', kwargs={'profileId': 10 ** 6})).status_code, 404)
+		self.assertEqual(self.client.post(reverse('exportPosts')).status_code, 405)
@@ -0,0 +1,100 @@
+""" Materialized home timelines for the "following" feed.
+
+    Every post is copied (fan-out-on-write) into a TimelineEntry for each follower
+    of its poster, so reading a page of the following feed is one indexed range
+    over (owner, timestamp) instead of a scan over every post of the site.
+
+    The views and the admin (admin.py) keep the timelines up to date. Posts or follows
+    written any other way are repaired by the rebuild_timelines command. """
+from django.db import connection
+
+from .models import Follower, Post, TimelineEntry
+from . import postCounts
+
+
+FAN_OUT_BATCH_SIZE = 500
+
+
+def _backfillSql(where):
+    """ INSERT ... SELECT copying posts into timelines without materializing them in Python """
+    return f'''
+        INSERT INTO {TimelineEntry._meta.db_table} (owner_id, post_id, timestamp)
+        SELECT DISTINCT follow.user_follower_id, post.id, post.timestamp
+        FROM {Follower._meta.db_table} follow
+        INNER JOIN {Post._meta.db_table} post ON post.poster_id = follow.user_being_followed_id
+        WHERE {where}
+    '''
+
+
+def getTimeline(user):
+    """ returns the timeline entries of this user, newest first """
+    return TimelineEntry.objects.filter(owner=user).order_by('-timestamp', '-post_id')
+
+
+def fanOutPost(post):
+    """ delivers a new post into the timeline of each follower of its poster, returns their ids """
+    follower_ids = list(Follower.objects.filter(
+        user_being_followed_id=post.poster_id
+    ).values_list('user_follower_id', flat=True))
+
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(owner_id=follower_id, post=post, timestamp=post.timestamp) for follower_id in follower_ids),
+        batch_size=FAN_OUT_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return follower_ids
+
+
+def touchPost(post):
+    """ keeps the timeline copies of an edited post in the right position """
+    TimelineEntry.objects.filter(post=post).update(timestamp=post.timestamp)
+
+
+def backfillFollow(follower, followee):
+    """ copies the existing posts of followee into the timeline of follower """
+    backfillFollows(follower, [followee.id])
+
+
+def backfillFollows(follower, followee_ids):
+    """ copies the existing posts of the followees into the timeline of follower, in one query """
+    followee_ids = list(followee_ids)
+    if not followee_ids:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _backfillSql(f'''
+                follow.user_follower_id = %s AND follow.user_being_followed_id IN ({', '.join(['%s'] * len(followee_ids))})
+                AND NOT EXISTS (
+                    SELECT 1 FROM {TimelineEntry._meta.db_table} entry
+                    WHERE entry.owner_id = follow.user_follower_id AND entry.post_id = post.id
+                )
+            '''),
+            [follower.id, *followee_ids]
+        )
+    postCounts.followsChanged(follower.id)
+
+
+def pruneFollow(follower, followee):
+    """ removes the posts of followee from the timeline of follower """
+    pruneFollows(follower, [followee.id])
+
+
+def pruneFollows(follower, followee_ids):
+    """ removes the posts of the followees from the timeline of follower """
+    followee_ids = list(followee_ids)
+    if followee_ids:
+        TimelineEntry.objects.filter(owner=follower, post__poster_id__in=followee_ids).delete()
+        postCounts.followsChanged(follower.id)
+
+
+def rebuildTimelines():
+    """ rebuilds every timeline from the Follower and Post tables, returns how many entries
+        it holds """
+    TimelineEntry.objects.all().delete()
+
+    with connection.cursor() as cursor:
+        cursor.execute(_backfillSql('1 = 1'))
+        n_entries = cursor.rowcount
+    postCounts.resetCounts()
+    return n_entries
@@ -2,21 +2,32 @@ from django.urls import path
 
 from . import views
 
-urlpatterns = [
-    # ------------------------ API URLS ------------------------
-    path('getPostsProfilePage/<int:filterUserId>/<int:pageNumber>', views.getPostsPage, name='getPostsPageGivenUserId'),
-    path('getPostsPage/<str:templatePageName>/<int:pageNumber>', views.getPostsPage, name='getPostsPageGivenTemplate'),
 
-    path('handleLikeDislike/<int:postId>', views.handleLikeDislike, name='handleLikeDislike'),
-    path('handleSaveNewPostContent/<int:postId>', views.handleSaveNewPostContent, name='handleSaveNewPostContent'),
+def buildUrlpatterns(api):
+    """ api is the module serving the JSON API views, views or asyncViews """
+    return [
+        # ------------------------ API URLS ------------------------
+        path('getPostsProfilePage/<int:filterUserId>/<int:pageNumber>', api.getPostsPage, name='getPostsPageGivenUserId'),
+        path('getPostsPage/<str:templatePageName>/<int:pageNumber>', api.getPostsPage, name='getPostsPageGivenTemplate'),
 
-    # ------------------------ NORMAL URLS ------------------------
-    path("", views.index, name="index"),
+        path('handleLikeDislike/<int:postId>', api.handleLikeDislike, name='handleLikeDislike'),
+        path('handleSaveNewPostContent/<int:postId>', api.handleSaveNewPostContent, name='handleSaveNewPostContent'),
+        path('handleBatch', views.handleBatch, name='handleBatch'),
+        path('search', views.searchPosts, name='searchPosts'),
+        path('exportPosts', api.exportPosts, name='exportPosts'),
+        path('exportProfilePosts/<int:profileId>', api.exportProfilePosts, name='exportProfilePosts'),
+        path('events', api.streamEvents, name='streamEvents'),
 
-    path("profile/<int:profileId>", views.ProfilePage.as_view(), name="profilePage"),
-    path('following/', views.followingPage, name='followingPage'),
+        # ------------------------ NORMAL URLS ------------------------
+        path("", views.index, name="index"),
 
-    path("login", views.login_view, name="login"),
-    path("logout", views.logout_view, name="logout"),
-    path("register", views.register, name="register")
-]
+        path("profile/<int:profileId>", api.ProfilePage.as_view(), name="profilePage"),
+        path('following/', views.followingPage, name='followingPage'),
+
+        path("login", views.login_view, name="login"),
+        path("logout", views.logout_view, name="logout"),
+        path("register", views.register, name="register")
+    ]
+
+
+urlpatterns = buildUrlpatterns(views)
@@ -0,0 +1,106 @@
+""" Per-process cache of the authenticated users.
+
+    AuthenticationMiddleware loads request.user with a query on every request.
+    CachedUserBackend (settings.AUTHENTICATION_BACKENDS) keeps each user it loaded in this
+    process for NETWORK_USER_CACHE_TIMEOUT seconds, and hands every request its own copy,
+    so a view setting attributes on request.user doesn't leak them into other requests.
+
+    A save or delete of a user (signals.py) and the follow counter updates of counters.py
+    drop it, right away and again on commit. Another process only notices after the
+    timeout, which is kept short: a password changed or a user deactivated through another
+    process still authenticates its old sessions here for at most that many seconds. """
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+
+
+DEFAULT_TIMEOUT = 5
+# past this many users the expired ones are dropped, the cache of a process stays small
+MAX_USERS = 10000
+
+_lock = threading.Lock()
+# {user id: (expires at, user)}
+_users = {}
+
+
+def _timeout():
+    return getattr(settings, 'NETWORK_USER_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def getUser(user_id):
+    """ a copy of the cached user, None when it isn't cached or has expired """
+    with _lock:
+        entry = _users.get(user_id)
+    if entry is None or entry[0] <= time.monotonic():
+        return None
+    return copy.copy(entry[1])
+
+
+def rememberUser(user):
+    timeout = _timeout()
+    if not timeout:
+        return
+
+    now = time.monotonic()
+    with _lock:
+        if len(_users) >= MAX_USERS:
+            for user_id in [user_id for user_id, (expires_at, _) in _users.items() if expires_at <= now]:
+                del _users[user_id]
+        if len(_users) < MAX_USERS:
+            _users[user.pk] = (now + timeout, copy.copy(user))
+
+
+def _drop(user_ids):
+    with _lock:
+        for user_id in user_ids:
+            _users.pop(user_id, None)
+
+
+def invalidate(*user_ids):
+    """ drops the users now, and once the current transaction commits, since a request
+        racing the transaction could cache their previous state in between """
+    _drop(user_ids)
+    transaction.on_commit(lambda: _drop(user_ids))
+
+
+def clear():
+    with _lock:
+        _users.clear()
+
+
+def invalidateAll():
+    """ invalidate, of every user """
+    clear()
+    transaction.on_commit(clear)
+
+
+class CachedUserBackend(ModelBackend):
+    """ ModelBackend, with request.user read from the cache of this process """
+    def authenticate(self, request, **credentials):
+        user = super().authenticate(request, **credentials)
+        if user is None:
+            # the ModelBackend listed after this one, for the older sessions, would
+            # refuse them too, after hashing the password once more
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        user = getUser(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                rememberUser(user)
+        return user
+
+    async def aget_user(self, user_id):
+        user = getUser(user_id)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                rememberUser(user)
+        return user
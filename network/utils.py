@@ -1,5 +1,32 @@
-def doesThisUserLikeThisPost(user, post):
-    for like in post['likes']:
-        if user.id == like['liker_id']:
-            return True
-    return False
\ No newline at end of file
+from django.conf import settings
+
+
+def getLikedPostIds(user, post_ids):
+    """ returns the set of ids, among post_ids, of the posts this user likes,
+        with a single query restricted to those posts """
+    from .models import Like
+
+    if not user.is_authenticated or not post_ids:
+        return set()
+
+    return set(Like.objects.filter(liker=user, post_id__in=post_ids).values_list('post_id', flat=True))
+
+
+async def agetLikedPostIds(user, post_ids):
+    """ getLikedPostIds for async views """
+    from .models import Like
+
+    if not user.is_authenticated or not post_ids:
+        return set()
+
+    return {post_id async for post_id in Like.objects.filter(liker=user, post_id__in=post_ids).values_list('post_id', flat=True)}
+
+
+def shouldIncludeLikesList(request):
+    """ the full 'likes' list of each post is only sent when asked for, since the client
+        just needs 'number_likes' and 'does_current_visitor_like_this_post' """
+    include_likes = request.GET.get('includeLikes')
+
+    if include_likes is None:
+        return getattr(settings, 'NETWORK_INCLUDE_LIKES_LIST', True)
+    return include_likes.lower() not in ('0', 'false', 'no')
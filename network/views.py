@@ -1,98 +1,312 @@
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.core.exceptions import ObjectDoesNotExist
 
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
-from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import condition
 
 from .models import User, Post, Follower, Like
-from . import utils
+from . import batch, counters, events, export, feedCache, graph, likeBuffer, pagination, postCounts, renderers, routers, search, serializers, timeline, utils
+# django.shortcuts.render, timed by the performance middleware
+from .instrumentation import render
 
 
 # ------------------------ API VIEWS ------------------------
-def getPostsPage(request, templatePageName=None, pageNumber=1, filterUserId=None):
+POSTS_PER_PAGE = 10
+
+
+def _postsPageQueryset(request, templatePageName, filterUserId):
+    """ Returns (rows newest first, whether the rows are timeline entries) """
+    if filterUserId:
+        return Post.objects.order_by('-timestamp', '-id').filter(poster_id=filterUserId), False
+    elif templatePageName == 'following':
+        # the posts from the profiles the current user follows were already delivered to its timeline
+        return timeline.getTimeline(request.user), True
+    else:
+        return Post.objects.order_by('-timestamp', '-id').all(), False
+
+
+def _postsPageEtagQuery(request, templatePageName=None, pageNumber=1, filterUserId=None):
+    """ Returns the query reading the id, timestamp and like count of the rows of a posts
+        page (and whether the visitor likes them), or None when the page has no ETag """
+    from django.db.models import Exists, OuterRef
+
+    if pageNumber < 1:
+        return None
+    if templatePageName == 'following' and not filterUserId and not request.user.is_authenticated:
+        return None
+
+    rows, reading_timeline = _postsPageQueryset(request, templatePageName, filterUserId)
+    id_field = 'post_id' if reading_timeline else 'id'
+    like_count_field = 'post__like_count' if reading_timeline else 'like_count'
+    fields = [id_field, 'timestamp', like_count_field]
+
+    if request.user.is_authenticated:
+        rows = rows.annotate(visitor_likes=Exists(Like.objects.filter(liker=request.user, post_id=OuterRef(id_field))))
+        fields.append('visitor_likes')
+
+    if 'cursor' in request.GET:
+        try:
+            rows = pagination.keysetQueryset(rows, request.GET['cursor'], idField=id_field)[:POSTS_PER_PAGE + 1]
+        except pagination.InvalidCursor:
+            return None
+    else:
+        first_row = (pageNumber - 1) * POSTS_PER_PAGE
+        rows = rows[first_row:first_row + POSTS_PER_PAGE + 1]
+
+    # the extra row tells whether there is a next page
+    return rows.values_list(*fields)
+
+
+def _postsPageEtagFromRows(request, rows):
+    """ Returns the ETag of the rows read by _postsPageEtagQuery. There is no
+        Last-Modified: the newest timestamp of a page doesn't change with its likes, so
+        If-Modified-Since would answer 304 for a page whose like counts changed """
+    from hashlib import sha1
+
+    if not rows:
+        return None
+
+    # the same rows rendered in another format are another representation
+    page_identity = (request.get_full_path(), request.user.id, renderers.negotiate(request).content_type, rows)
+    if likeBuffer.enabled():
+        page_identity += (likeBuffer.pendingState([row[0] for row in rows], request.user.id),)
+    return sha1(repr(page_identity).encode()).hexdigest()
+
+
+def _readPostsPageRows(request, rows):
+    """ keeps the ETag of the rows read by _postsPageEtagQuery on the request, and the
+        digest of their shared columns: a cached page built from other rows is stale, and
+        would go out under an ETag that doesn't describe it """
+    request._posts_page_rows_digest = feedCache.rowsDigest([row[:3] for row in rows])
+    request._posts_page_etag = _postsPageEtagFromRows(request, rows)
+
+
+def _postsPageEtag(request, templatePageName=None, pageNumber=1, filterUserId=None):
+    """ Returns the ETag of a posts page, from one query reading the id,
+        timestamp and like count of its rows (and whether the visitor likes them),
+        so an unchanged page is answered with a 304 before any serialization """
+    if not hasattr(request, '_posts_page_etag'):
+        query = _postsPageEtagQuery(request, templatePageName, pageNumber, filterUserId)
+        _readPostsPageRows(request, list(query) if query is not None else [])
+
+    return request._posts_page_etag
+
+
+def _postsPageRows(request, templatePageName, filterUserId):
+    """ Returns (rows newest first, with their posts and posters, name of their post id field) """
+    rows, reading_timeline = _postsPageQueryset(request, templatePageName, filterUserId)
+
+    # timeline entries are ordered by the id of the post they hold
+    if reading_timeline:
+        return rows.select_related('post__poster'), 'post_id'
+    return rows.select_related('poster'), 'id'
+
+
+def _rowsPosts(rows, id_field):
+    if id_field == 'post_id':
+        return [entry.post for entry in rows]
+    return rows
+
+
+def _postsPageDict(has_next, has_previous, next_cursor, prev_cursor, current_page_posts):
+    return {
+        'hasNext': has_next,
+        'hasPrevious': has_previous,
+        'nextCursor': next_cursor,
+        'prevCursor': prev_cursor,
+        'currentPagePosts': current_page_posts
+    }
+
+
+def _buildPostsPage(request, templatePageName, pageNumber, filterUserId):
+    """ Returns (posts page, error response). The posts page has no per-visitor fields,
+        so it can be shared by every visitor """
     from django.core.paginator import Paginator, EmptyPage
 
     if filterUserId:
         # try to filter the posts given the user id
+        if not User.objects.filter(id=filterUserId).exists():
+            return None, JsonResponse({'msg': 'This user doesn\'t exist'}, status=404)
+    elif templatePageName == 'following':
+        if not request.user.is_authenticated:
+            return None, JsonResponse({'msg': 'You must be logged in to see this page'}, status=403)
+
+    posts, id_field = _postsPageRows(request, templatePageName, filterUserId)
+
+    if 'cursor' in request.GET:
         try:
-            filtered_user = User.objects.get(id=filterUserId)
-        except ObjectDoesNotExist:
-            return JsonResponse({'msg': 'This user doesn\'t exist'}, status=404)
+            page = pagination.cursorPaginate(posts, request.GET['cursor'], POSTS_PER_PAGE, idField=id_field)
+        except pagination.InvalidCursor:
+            return None, JsonResponse({'msg': 'Invalid cursor'}, status=400)
 
-        posts = Post.objects.order_by('-timestamp').filter(poster=filtered_user)
-    elif templatePageName == 'following':
-        # filter the posts by the profiles the current user follows
-        current_user = request.user
-        # get a list of users being followed by the current user
-        followed_by_current_user = [follower.user_being_followed for follower in current_user.users_being_followed.all()]
-        # get a list of posts made by the users that the current user follow
-        posts = [post for post in Post.objects.order_by('-timestamp').all() if post.poster in followed_by_current_user]
+        page_rows = page.object_list
+        has_next, has_previous = page.hasNext, page.hasPrevious
+        next_cursor, prev_cursor = page.nextCursor, page.prevCursor
     else:
-        posts = Post.objects.order_by('-timestamp').all()
+        paginator = Paginator(posts, POSTS_PER_PAGE)
 
-    POSTS_PER_PAGE = 10
-    paginator = Paginator(posts, POSTS_PER_PAGE)
+        try:
+            page = paginator.page(pageNumber)
+        except EmptyPage:
+            return None, JsonResponse({'msg': 'This page doesn\'t exist'}, status=404)
 
-    try:
-        page = paginator.page(pageNumber)
-    except EmptyPage:
-        return JsonResponse({'msg': 'This page doesn\'t exist'}, status=404)
-    
-    current_page_posts = [post.serialize() for post in page.object_list]
-    
-    for post in current_page_posts:
-        post['does_current_visitor_like_this_post'] = utils.doesThisUserLikeThisPost(request.user, post)
+        page_rows = list(page.object_list)
+        has_next, has_previous = page.has_next(), page.has_previous()
+        # hand out cursors too, so the client can keep walking with cheap keyset reads
+        next_cursor, prev_cursor = pagination.cursorsForPage(page_rows, has_next, has_previous, idField=id_field)
 
-    posts_page = {
-        'hasNext': page.has_next(),
-        'hasPrevious': page.has_previous(),
-        'currentPagePosts': current_page_posts
-    }
-    return JsonResponse(posts_page)
+    current_page_posts = serializers.serializePosts(_rowsPosts(page_rows, id_field), utils.shouldIncludeLikesList(request))
+    return _postsPageDict(has_next, has_previous, next_cursor, prev_cursor, current_page_posts), None
+
+
+def _postsPageFeedScope(request, templatePageName, pageNumber, filterUserId):
+    """ Returns (feed cache scope, page) of a posts page, or None for the following
+        page, which is a different timeline for each visitor """
+    if not filterUserId and templatePageName == 'following':
+        return None
+
+    scope = f'profile:{filterUserId}' if filterUserId else 'index'
+    page = f'cursor:{request.GET["cursor"]}' if 'cursor' in request.GET else f'page:{pageNumber}'
+    return scope, page
+
+
+def _overlayVisitorLikes(posts_page, liked_post_ids, visitor):
+    """ lays the per-visitor fields, and the buffered likes, over a shared page """
+    for post in posts_page['currentPagePosts']:
+        post['does_current_visitor_like_this_post'] = post['id'] in liked_post_ids
+
+    if likeBuffer.enabled():
+        likeBuffer.overlay(posts_page['currentPagePosts'], visitor)
+
+
+@routers.readsFromReplica
+@condition(etag_func=_postsPageEtag)
+def getPostsPage(request, templatePageName=None, pageNumber=1, filterUserId=None):
+    """ Returns a page of posts. With a 'cursor' query parameter (empty for the first page)
+        the page is read by keyset pagination and pageNumber is ignored.
+        Index and profile pages come from the versioned feed cache, as long as they were
+        built from the rows the ETag was read from """
+    posts_page = None
+    cache_key = None
+
+    scope_page = _postsPageFeedScope(request, templatePageName, pageNumber, filterUserId)
+    if scope_page is not None:
+        cache_key = feedCache.pageKey(*scope_page, utils.shouldIncludeLikesList(request))
+        posts_page = feedCache.getPage(cache_key, request._posts_page_rows_digest)
+
+    if posts_page is None:
+        posts_page, error_response = _buildPostsPage(request, templatePageName, pageNumber, filterUserId)
+        if error_response is not None:
+            return error_response
+
+        if cache_key is not None:
+            feedCache.setPage(cache_key, posts_page, request._posts_page_rows_digest)
+
+    post_ids = [post['id'] for post in posts_page['currentPagePosts']]
+    _overlayVisitorLikes(posts_page, utils.getLikedPostIds(request.user, post_ids), request.user)
+
+    return renderers.respond(request, posts_page)
+
+
+def _likePost(visitor, post):
+    """ a second like of the same post is refused by the unique (liker, post) constraint
+        with an IntegrityError """
+    with transaction.atomic():
+        Like.objects.create(liker=visitor, post=post)
+        counters.incrementLikeCount(post, 1)
+
+
+def _dislikePost(visitor, post):
+    """ returns whether the visitor liked the post """
+    with transaction.atomic():
+        n_deleted, _ = post.likes.filter(liker=visitor).delete()
+
+        if n_deleted:
+            counters.incrementLikeCount(post, -1)
+    return bool(n_deleted)
 
 
 def handleLikeDislike(request, postId):
     import json
     
     try:
-        post = Post.objects.get(id=postId)
+        post = Post.objects.select_related('poster').get(id=postId)
     except ObjectDoesNotExist:
         return JsonResponse({'msg': 'No post found with this id'}, status=404)
     
     data = json.loads(request.body)
     visitor = request.user
 
+    if likeBuffer.enabled():
+        return _bufferLikeDislike(request, post, data)
+
     if data['does_current_visitor_like_this_post']:
         try:
-            # verify if the user is trying to like for the second time
-            like = post.likes.get(liker=visitor)
-            if like:
-                return JsonResponse({'msg': 'Error: You can\'t like the same post two times'}, status=400)
-        except ObjectDoesNotExist:
-            like = Like.objects.create(liker=visitor, post=post)
-            like.save()
-            return JsonResponse(post.serialize(), status=200)
+            _likePost(visitor, post)
+        except IntegrityError:
+            return JsonResponse({'msg': 'Error: You can\'t like the same post two times'}, status=400)
     else:
         # dislike
-        try:
-            like = post.likes.get(liker=visitor)
-            like.delete()
-            return JsonResponse(post.serialize(), status=200)
-        except ObjectDoesNotExist:
+        if not _dislikePost(visitor, post):
             return JsonResponse({'msg': 'Error: You tried to dislike someone you don\'t like'}, status=400)
 
+    feedCache.bumpFeedVersion()
+    post.refresh_from_db(fields=['like_count'])
+    events.likeCountChanged(post.id, post.like_count)
+
+    serialized_post = serializers.serializePosts([post], utils.shouldIncludeLikesList(request))[0]
+    serialized_post['does_current_visitor_like_this_post'] = bool(data['does_current_visitor_like_this_post'])
+    return renderers.respond(request, serialized_post)
+
+
+def _bufferedIntentError(wants_like, liked):
+    """ Returns the error response of a like of an already liked post (or the dislike of
+        a post not liked) in write-behind mode, None when the intent is valid """
+    if wants_like and liked:
+        return JsonResponse({'msg': 'Error: You can\'t like the same post two times'}, status=400)
+    if not wants_like and not liked:
+        return JsonResponse({'msg': 'Error: You tried to dislike someone you don\'t like'}, status=400)
+    return None
+
+
+def _bufferLikeDislike(request, post, data):
+    """ handleLikeDislike in write-behind mode: the intent is buffered (see likeBuffer.py)
+        and the answer has it laid over the post """
+    visitor = request.user
+    if not visitor.is_authenticated:
+        return JsonResponse({'msg': 'You must be logged in to do this'}, status=403)
+
+    wants_like = bool(data['does_current_visitor_like_this_post'])
+    liked = likeBuffer.currentIntent(visitor.id, post.id)
+    if liked is None:
+        liked = Like.objects.filter(liker=visitor, post=post).exists()
+
+    error_response = _bufferedIntentError(wants_like, liked)
+    if error_response is not None:
+        return error_response
+
+    likeBuffer.recordIntent(visitor.id, post.id, wants_like, liked)
+
+    serialized_post = serializers.serializePosts([post], utils.shouldIncludeLikesList(request))[0]
+    likeBuffer.overlay([serialized_post], visitor)
+    events.likeCountBuffered(post.id, serialized_post['number_likes'])
+    serialized_post['does_current_visitor_like_this_post'] = wants_like
+    return renderers.respond(request, serialized_post)
+
 
 def handleSaveNewPostContent(request, postId):
     import json
 
     try:
-        post = Post.objects.get(id=postId)
+        post = Post.objects.select_related('poster').get(id=postId)
     except ObjectDoesNotExist:
         return JsonResponse({'msg': 'No post found with this id'}, status=404)
     
@@ -104,8 +318,12 @@ def handleSaveNewPostContent(request, postId):
     if data['newContent']:
         try:
             post.content = data['newContent']
-            post.save()
-            return JsonResponse(post.serialize(), status=200)
+            post.save(update_fields=['content', 'timestamp'])
+            timeline.touchPost(post)
+            search.indexPost(post)
+            feedCache.bumpFeedVersion()
+            events.postEdited(post)
+            return renderers.respond(request, serializers.serializePosts([post], utils.shouldIncludeLikesList(request))[0])
         except Exception as e:
             print(e)
             return JsonResponse({'msg': 'Something went wrong...'}, status=500)
@@ -113,10 +331,87 @@ def handleSaveNewPostContent(request, postId):
         return JsonResponse({'msg': 'The new content is blank'}, status=400)
 
 
+@routers.readsFromReplica
+def searchPosts(request):
+    """ Returns a page of the posts matching the 'q' query parameter, best match first.
+        With 'prefix=1' the last term also matches the words it begins. The next page is
+        asked for with the 'cursor' query parameter set to the nextCursor of the previous
+        one, see search.py """
+    query = request.GET.get('q', '')
+    if not search.terms(query):
+        return JsonResponse({'msg': 'The search query is blank'}, status=400)
+
+    try:
+        page = search.findPosts(query, request.GET.get('cursor', ''), POSTS_PER_PAGE, request.GET.get('prefix') == '1')
+    except pagination.InvalidCursor:
+        return JsonResponse({'msg': 'Invalid cursor'}, status=400)
+
+    current_page_posts = serializers.serializePosts(page.object_list, utils.shouldIncludeLikesList(request))
+    posts_page = _postsPageDict(page.hasNext, page.hasPrevious, page.nextCursor, page.prevCursor, current_page_posts)
+    _overlayVisitorLikes(posts_page, utils.getLikedPostIds(request.user, page.object_list), request.user)
+
+    return renderers.respond(request, posts_page)
+
+
+def _exportResponse(lines, filename):
+    response = StreamingHttpResponse(lines, content_type=export.NDJSON_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@routers.readsFromReplica
+def exportPosts(request):
+    """ Streams every post as NDJSON (see export.py), oldest first """
+    if request.method != 'GET':
+        return JsonResponse({'msg': 'Only GET is allowed'}, status=405)
+
+    # the rows are read while the response streams, after the view has returned
+    posts = Post.objects.using(routers.currentReadDatabase())
+    return _exportResponse(export.ndjsonLines(export.exportedPosts(posts)), 'posts.ndjson')
+
+
+@routers.readsFromReplica
+def exportProfilePosts(request, profileId):
+    """ Streams the posts of a profile as NDJSON (see export.py), oldest first """
+    if request.method != 'GET':
+        return JsonResponse({'msg': 'Only GET is allowed'}, status=405)
+    if not User.objects.filter(id=profileId).exists():
+        return JsonResponse({'msg': 'This user doesn\'t exist'}, status=404)
+
+    posts = Post.objects.using(routers.currentReadDatabase()).filter(poster_id=profileId)
+    return _exportResponse(export.ndjsonLines(export.exportedPosts(posts)), f'posts-{profileId}.ndjson')
+
+
+def streamEvents(request):
+    """ The server-sent events are streamed by asyncViews.streamEvents, under ASGI only: a
+        worker thread can't be held by each open stream. 204 tells EventSource to stop """
+    if request.method != 'GET':
+        return JsonResponse({'msg': 'Only GET is allowed'}, status=405)
+    return HttpResponse(status=204)
+
+
+def handleBatch(request):
+    """ Applies a list of like, unlike, follow and unfollow operations of the visitor in
+        one transaction, e.g. {"operations": [{"op": "like", "postId": 1},
+        {"op": "unfollow", "profileId": 2}]}, and answers one compact result per operation """
+    import json
+
+    if request.method != 'POST':
+        return JsonResponse({'msg': 'Only POST is allowed'}, status=405)
+    if not request.user.is_authenticated:
+        return JsonResponse({'msg': 'You must be logged in to do this'}, status=403)
+
+    try:
+        results = batch.applyOperations(request.user, json.loads(request.body)['operations'])
+    except (ValueError, KeyError, TypeError, batch.InvalidBatch):
+        return JsonResponse({'msg': f'The body must be {{"operations": [...]}} with at most {batch.MAX_OPERATIONS} operations'}, status=400)
+
+    return JsonResponse({'results': results}, status=200)
+
+
 # ------------------------ NORMAL VIEWS ------------------------
 def index(request):
     from .forms import NewPostForm
-    from django.core.paginator import Paginator
 
     if request.method == 'POST':
         if request.user.is_authenticated:
@@ -125,80 +420,78 @@ def index(request):
             if newPostForm.is_valid():
                 newPostContent = newPostForm.cleaned_data['newPostContent']
 
-                newPost = Post.objects.create(
-                    poster=request.user,
-                    content=newPostContent
-                )
-                newPost.save()
+                with transaction.atomic():
+                    newPost = Post.objects.create(
+                        poster=request.user,
+                        content=newPostContent
+                    )
+                    follower_ids = timeline.fanOutPost(newPost)
+                    search.indexPost(newPost)
+                    postCounts.postCreated(newPost, follower_ids)
+                    events.postCreated(newPost)
+                    feedCache.bumpFeedVersion()
         else:
             return HttpResponse(status=403)
 
-    allPosts = Post.objects.order_by('-timestamp').all()
-    paginator = Paginator(allPosts, 10)
-
+    # the posts themselves are fetched page by page by the JS client
     return render(request, "network/index.html", {
         'new_post_form': NewPostForm(),
-        'page_range': paginator.page_range
+        'page_range': postCounts.pageRange(postCounts.countPosts(), POSTS_PER_PAGE)
     })
 
 
 class ProfilePage(View):
     template_name = 'network/profilePage.html'
 
-    def _checkVisitorIsFollowingThisProfile(self, request, profile_followers):
+    def _checkVisitorIsFollowingThisProfile(self, request, profile):
         """ In case of a visitor authenticated, this should tell if the visitor
             of this page is following this profile """
-        from django.contrib.auth.models import AnonymousUser
-
-        if isinstance(request.user, AnonymousUser):
+        if not request.user.is_authenticated:
             return False
 
-        visitor = User.objects.get(id=request.user.id)
-
-        if visitor.id in map(lambda profile_follower: profile_follower.id, profile_followers):
-            return True
-        return False
+        if graph.isShared():
+            return graph.getGraph().isFollowing(request.user.id, profile.id)
+        # the graph of this process would miss the follows served by the others
+        return Follower.objects.filter(user_follower_id=request.user.id, user_being_followed_id=profile.id).exists()
 
+    @method_decorator(routers.readsFromReplica)
     def get(self, request, profileId):
-        from django.core.paginator import Paginator
-        
-        try:
-            profile = User.objects.get(id=profileId)
-        except ObjectDoesNotExist:
-            return HttpResponse(status=404)
-
-        profile_posts = Post.objects.order_by('-timestamp').filter(poster=profile)
-        # get a list of profile followers from each Follower that is related to this profile
-        profile_followers = [profile_follower.user_follower for profile_follower in profile.followers.all()]
-        profile_following = profile.users_being_followed.all()
+        if request.user.is_authenticated and request.user.id == profileId:
+            # the visitor's own profile, already loaded by the authentication
+            profile = request.user
+        else:
+            try:
+                profile = User.objects.get(id=profileId)
+            except ObjectDoesNotExist:
+                return HttpResponse(status=404)
 
-        visitor_is_following = self._checkVisitorIsFollowingThisProfile(request, profile_followers)
+        # the follow is answered by the in-memory follower graph, the counts are kept on the profile
+        visitor_is_following = self._checkVisitorIsFollowingThisProfile(request, profile)
 
-        paginator = Paginator(profile_posts, 10)
-        
         context = {
             'profile_id': profile.id,
             'username': profile.username,
-            'n_of_followers': len(profile_followers),
-            'n_following': len(profile_following),
-            'profile_posts': profile_posts,
+            'n_of_followers': profile.followers_count,
+            'n_following': profile.following_count,
             'visitor_is_following': visitor_is_following,
-            'page_range': paginator.page_range
+            'page_range': postCounts.pageRange(postCounts.countPostsBy(profile.id), POSTS_PER_PAGE)
         }
 
         return render(request, self.template_name, context)
 
-    def _getFollowerObject(self, profile, visitor):
-        return Follower.objects.get(
+    def _createFollowerObject(self, profile, visitor):
+        return Follower.objects.create(
             user_follower = visitor,
             user_being_followed = profile
         )
 
-    def _createFollowerObject(self, profile, visitor):
-        return Follower.objects.create(
+    def _deleteFollowerObject(self, profile, visitor):
+        """ returns how many Follower objects were deleted """
+        n_deleted, _ = Follower.objects.filter(
             user_follower = visitor,
             user_being_followed = profile
-        )
+        ).delete()
+        return n_deleted
 
     def put(self, request, profileId):
         import json
@@ -213,40 +506,41 @@ class ProfilePage(View):
 
         if data['visitor_is_following']:
             try:
-                self._getFollowerObject(profile, visitor)
-            except ObjectDoesNotExist:
-                # create Follower, making the visitor follow this profile
-                follower = self._createFollowerObject(profile, visitor)
-                follower.save()
-                return JsonResponse({'msg': 'Success! Now the visitor is following this profile'}, status=200)
-            else:
+                self._follow(profile, visitor)
+            except IntegrityError:
                 return JsonResponse({'msg': 'This visitor is already following this profile!'}, status=400)
+            return JsonResponse({'msg': 'Success! Now the visitor is following this profile'}, status=200)
         else:
-            # delete Follower
-            try:
-                follower = self._getFollowerObject(profile, visitor)
-                follower.delete()
-                return JsonResponse({'msg': 'Success! Now the visitor is no longer following this profile'}, status=200)
-            except ObjectDoesNotExist:
+            if not self._unfollow(profile, visitor):
                 return JsonResponse({'msg': 'Error: the object does not exist'}, status=400)
+            return JsonResponse({'msg': 'Success! Now the visitor is no longer following this profile'}, status=200)
 
+    def _follow(self, profile, visitor):
+        """ create Follower, making the visitor follow this profile. Following twice
+            is refused by the unique (user_follower, user_being_followed) constraint
+            with an IntegrityError """
+        with transaction.atomic():
+            self._createFollowerObject(profile, visitor)
+            counters.incrementFollowCounts(visitor, profile, 1)
+            timeline.backfillFollow(visitor, profile)
 
-@login_required
-def followingPage(request):
-    from django.core.paginator import Paginator
-    
-    current_user = request.user
+    def _unfollow(self, profile, visitor):
+        """ delete Follower, returns whether the visitor was following this profile """
+        with transaction.atomic():
+            if not self._deleteFollowerObject(profile, visitor):
+                return False
 
-    # get a list of users being followed by the current user
-    followed_by_current_user = [follower.user_being_followed for follower in current_user.users_being_followed.all()]
-    # get a list of posts made by the users that the current user follow
-    posts_from_users_followed = [post for post in Post.objects.order_by('-timestamp').all() if post.poster in followed_by_current_user]
+            counters.incrementFollowCounts(visitor, profile, -1)
+            timeline.pruneFollow(visitor, profile)
+        return True
 
-    paginator = Paginator(posts_from_users_followed, 10)
 
+@login_required
+@routers.readsFromReplica
+def followingPage(request):
+    # the posts themselves are fetched page by page from the timeline by the JS client
     return render(request, 'network/followingPage.html', {
-        'posts_from_users_followed': posts_from_users_followed,
-        'page_range': paginator.page_range
+        'page_range': postCounts.pageRange(postCounts.countFollowingPosts(request.user), POSTS_PER_PAGE)
     })
 
 
@@ -296,7 +590,8 @@ def register(request):
             return render(request, "network/register.html", {
                 "message": "Username already taken."
             })
-        login(request, user)
+        # the first backend, ModelBackend is only listed for the older sessions
+        login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
         return HttpResponseRedirect(reverse("index"))
     else:
         return render(request, "network/register.html")
@@ -9,8 +9,10 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from network.asgi import getAsgiApplication
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project4.settings')
 
-application = get_asgi_application()
+# the network API is served by its async views, see network/asyncViews.py, along with the
+# server-sent events of network/events.py, which need an ASGI server
+application = getAsgiApplication()
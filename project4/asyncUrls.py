@@ -0,0 +1,8 @@
+""" project4 URL configuration under ASGI, see network/asgi.py """
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("", include("network.asyncUrls")),
+]
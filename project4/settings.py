@@ -41,13 +41,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the other middleware too
+    'network.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # answers the static files before the session and the user are loaded
+    'network.staticFiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'network.routers.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'project4.urls'
@@ -78,11 +83,90 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # read replica of 'default', see network/routers.py. Locally a copy refreshed by
+    # manage.py sync_replica
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['network.routers.ReplicaRouter']
+
 AUTH_USER_MODEL = "network.User"
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# The follower graph snapshot and its changes (network/graph.py) are shared through this
+# cache. With a process-local backend like this one the profile pages read the follows from
+# the database instead; use a shared backend (memcached, redis...) to answer them in memory
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Sessions and authentication, without a query per request for either once warm.
+# 'cached_db' reads the sessions from CACHES and writes them through to the database: with
+# more than one worker process it needs the shared cache backend too, or a logout made
+# through one process isn't seen by the others. 'django.contrib.sessions.backends.signed_cookies'
+# keeps the whole session in the signed cookie instead, with no session storage at all, but
+# then a logout can't revoke a copy of the cookie. request.user is read from a per-process
+# cache (network/userCache.py) for at most NETWORK_USER_CACHE_TIMEOUT seconds, 0 disables it.
+# ModelBackend stays listed for the sessions logged in before CachedUserBackend, which
+# name it: without it they would all be logged out. They read their user from the
+# database until they log in again
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['network.userCache.CachedUserBackend', 'django.contrib.auth.backends.ModelBackend']
+NETWORK_USER_CACHE_TIMEOUT = 5
+
+# Send the full list of likes of each post in the JSON API, unless a request asks
+# otherwise with ?includeLikes=0. The JS client never needs it
+NETWORK_INCLUDE_LIKES_LIST = True
+
+# Time the queries, serialization, template rendering and the whole of each request,
+# sent back in a Server-Timing header and logged as JSON on the 'network.performance'
+# logger (at INFO level, so it needs a LOGGING entry to be seen). Off unless profiling:
+# the timing wrappers cost every request, and Server-Timing tells any visitor how long
+# the queries took
+NETWORK_PERFORMANCE_INSTRUMENTATION = False
+
+# The URL configuration of the requests served through ASGI (project4/asgi.py), routing
+# the JSON API to its async views
+NETWORK_ASYNC_URLCONF = 'project4.asyncUrls'
+
+# Server-sent events of the new posts, edits and like counts (network/events.py), streamed
+# under ASGI. A stream more than NETWORK_EVENTS_QUEUE_SIZE events behind is told to reload
+# its page instead, an idle one gets a keepalive comment every NETWORK_EVENTS_KEEPALIVE seconds
+NETWORK_EVENTS_QUEUE_SIZE = 100
+NETWORK_EVENTS_KEEPALIVE = 15
+
+# Write-behind likes (network/likeBuffer.py): likes and unlikes are buffered and journaled,
+# then written in bulk every NETWORK_LIKE_FLUSH_INTERVAL seconds by a background thread
+NETWORK_LIKE_WRITE_BEHIND = False
+NETWORK_LIKE_FLUSH_INTERVAL = 1.0
+NETWORK_LIKE_JOURNAL_DIR = os.path.join(BASE_DIR, 'like-journal')
+NETWORK_LIKE_JOURNAL_FSYNC = True
+
+# The read-only feed views read from this DATABASES alias (None: everything reads from
+# 'default'). A browser reads from 'default' for NETWORK_REPLICA_STICKY_SECONDS after each
+# of its writes, and the feed pages read from the replica are cached for
+# NETWORK_REPLICA_PAGE_TIMEOUT seconds only. Run manage.py sync_replica before setting it
+NETWORK_REPLICA_DATABASE = None
+NETWORK_REPLICA_STICKY_SECONDS = 10
+NETWORK_REPLICA_PAGE_TIMEOUT = 5
+
+# The formats of the JSON API responses, picked by the Accept header, the first one by
+# default (network/renderers.py). JSON is encoded with orjson when installed, MessagePack
+# needs the msgpack package
+NETWORK_API_RENDERERS = [
+    'network.renderers.JsonRenderer',
+    'network.renderers.MsgpackRenderer',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -120,3 +204,32 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic bundles the scripts of each page, fingerprints the file names and writes
+# precompressed variants (network/staticFiles.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'network.staticFiles.BundlingManifestStaticFilesStorage',
+    },
+}
+
+# The scripts of each page, concatenated in this order into network/JS/bundles/<page>.js
+_PAGE_SCRIPTS = [
+    'network/JS/utilityFunctions.js',
+    'network/JS/relatedToPagination.js',
+    'network/JS/msgpack.js',
+    'network/JS/relatedToPosts.js',
+]
+NETWORK_STATIC_BUNDLES = {
+    'index': _PAGE_SCRIPTS,
+    'followingPage': _PAGE_SCRIPTS,
+    'profilePage': _PAGE_SCRIPTS + ['network/JS/relatedToFollowUnfollow.js'],
+}
+
+# Serve the collected files of STATIC_ROOT with immutable cache headers, precompressed
+# (runserver serves the source files itself while DEBUG is on)
+NETWORK_SERVE_STATIC = True